@@ -4,19 +4,29 @@ Inicializacion de la aplicacion Flask.
 Aqui se configuran todas las extensiones y se registran las rutas.
 """
 
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from flask_socketio import SocketIO
 from config import config
 
 # Inicializar extensiones (sin asignar a la app todavia)
 db = SQLAlchemy()
 login_manager = LoginManager()
-migrate = Migrate()
 socketio = SocketIO(cors_allowed_origins="*")  # Permitir WebSocket desde cualquier origen
 
+
+def registrar_migraciones(app):
+    """
+    Registra Flask-Migrate en la app (si no estaba registrado).
+    Importa Alembic, asi que solo se hace al usar los comandos `flask ...`
+    o al preparar el esquema, no al arrancar un worker.
+    """
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
 def create_app(config_name='development'):
     """
     Factory para crear la aplicacion Flask.
@@ -37,8 +47,14 @@ def create_app(config_name='development'):
     # Inicializar extensiones con la app
     db.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
-    socketio.init_app(app)
+    
+    # Migraciones solo desde la consola (`flask db ...`, `flask preparar-base`)
+    if click.get_current_context(silent=True) is not None:
+        registrar_migraciones(app)
+    
+    # Cola de mensajes de Socket.IO (solo si se corren varios procesos)
+    from app.eventos import opciones_cola_mensajes
+    socketio.init_app(app, **opciones_cola_mensajes(app.config))
     
     # Configuracion de Flask-Login
     login_manager.login_view = 'auth.login'  # Ruta para login
@@ -50,10 +66,25 @@ def create_app(config_name='development'):
     from app.routes.auth import auth_bp
     from app.routes.ventas import ventas_bp
     from app.routes.fabrica import fabrica_bp
+    from app.routes.estado import estado_bp, metricas_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(ventas_bp, url_prefix='/ventas')
     app.register_blueprint(fabrica_bp, url_prefix='/fabrica')
+    app.register_blueprint(estado_bp, url_prefix='/estado')
+    app.register_blueprint(metricas_bp)
+    
+    # Conteo de consultas, Server-Timing y metricas de /metrics
+    from app.instrumentacion import registrar_instrumentacion
+    registrar_instrumentacion(app)
+    
+    # Registrar comandos de consola (flask limpiar-pedidos, etc.)
+    from app.cli import registrar_comandos
+    registrar_comandos(app)
+    
+    # Salas de Socket.IO por rol y ruta
+    from app.eventos import registrar_eventos
+    registrar_eventos()
     
     # Ruta principal (redirecciona segun el rol del usuario)
     from flask import redirect, url_for
@@ -79,20 +110,19 @@ def create_app(config_name='development'):
     def internal_server_error(e):
         return {'error': 'Error interno del servidor'}, 500
     
-    # Crear tablas si no existen (solo en desarrollo)
-    with app.app_context():
-        db.create_all()
+    # Sin consultas a la base al crear la app: el esquema se maneja con
+    # `flask preparar-base` (una vez por despliegue), no en cada arranque
     
     return app
 
 
 # Funcion para cargar usuario (requerida por Flask-Login)
-from app.models.usuario import Usuario
-
 @login_manager.user_loader
 def load_user(user_id):
     """
-    Carga un usuario desde la base de datos.
-    Flask-Login usa esto para mantener la sesion.
+    Carga el usuario de la sesion.
+    Flask-Login lo llama en cada peticion, asi que usa la cache de
+    identidades en lugar de ir a la base cada vez.
     """
-    return Usuario.query.get(int(user_id))
\ No newline at end of file
+    from app.services.usuarios import cargar_usuario
+    return cargar_usuario(user_id)
\ No newline at end of file
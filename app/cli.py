@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Comandos de consola de la aplicacion (se ejecutan con `flask <comando>`).
+"""
+
+import click
+
+
+def registrar_comandos(app):
+    """Registra los comandos de consola en la app"""
+
+    @app.cli.command('preparar-base')
+    def preparar_base():
+        """Crea el esquema si la base esta vacia, o aplica las migraciones pendientes."""
+        from app.services.esquema import preparar_esquema
+
+        if preparar_esquema() == 'creada':
+            click.echo('Base vacia: esquema creado con las migraciones.')
+        else:
+            click.echo('Migraciones aplicadas.')
+
+    @app.cli.command('limpiar-pedidos')
+    @click.option('--dias', type=int, default=None,
+                  help='Dias de historial a conservar (por defecto DIAS_RETENCION_ARCHIVO).')
+    @click.option('--lote', type=int, default=None,
+                  help='Pedidos eliminados por cada DELETE (por defecto TAMANO_LOTE_PURGA).')
+    @click.option('--simular', is_flag=True,
+                  help='Muestra que se eliminaria sin borrar nada.')
+    def limpiar_pedidos(dias, lote, simular):
+        """Elimina pedidos archivados antiguos en lotes."""
+        from app.services.purga import purgar_pedidos_antiguos
+
+        resultado = purgar_pedidos_antiguos(dias_retencion=dias, tamano_lote=lote, simular=simular)
+
+        click.echo(f"Pedidos archivados antes de: {resultado['fecha_limite'].strftime('%Y-%m-%d %H:%M:%S')}")
+
+        if not resultado['total']:
+            click.echo('No hay pedidos antiguos para eliminar.')
+            return
+
+        for semana, cantidad in resultado['semanas'].items():
+            click.echo(f'   - {semana}: {cantidad} pedidos')
+
+        if simular:
+            click.echo(f"Simulacion: se eliminarian {resultado['total']} pedidos.")
+        else:
+            click.echo(f"Se eliminaron {resultado['total_eliminados']} pedidos antiguos.")
+
+    @app.cli.command('importar-csv')
+    @click.argument('tipo', type=click.Choice(['clientes', 'pedidos']))
+    @click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--usuario', default=None,
+                  help='Usuario (vendedor) que figura como creador de los clientes.')
+    @click.option('--lote', type=int, default=None,
+                  help='Filas por cada COPY/INSERT (por defecto TAMANO_LOTE_IMPORTACION).')
+    @click.option('--simular', is_flag=True,
+                  help='Solo valida el archivo, sin insertar nada.')
+    def importar_csv(tipo, archivo, usuario, lote, simular):
+        """Importa clientes o pedidos desde un CSV (COPY en PostgreSQL)."""
+        from app.models.usuario import Usuario
+        from app.services.importacion import importar_csv as importar
+
+        creado_por_id = None
+        if tipo == 'clientes':
+            if not usuario:
+                raise click.UsageError('Para importar clientes hay que indicar --usuario.')
+            vendedor = Usuario.query.filter_by(username=usuario).first()
+            if vendedor is None:
+                raise click.BadParameter(f'No existe el usuario "{usuario}".', param_hint='--usuario')
+            creado_por_id = vendedor.id
+
+        with open(archivo, encoding='utf-8-sig', newline='') as entrada:
+            try:
+                resultado = importar(tipo, entrada, creado_por_id=creado_por_id,
+                                     tamano_lote=lote, simular=simular)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+
+        for error in resultado['errores']:
+            click.echo(f"   - linea {error['linea']}: {'; '.join(error['errores'])}")
+
+        if simular:
+            click.echo(f"Simulacion: {resultado['importadas']} de {resultado['leidas']} filas son validas.")
+        else:
+            click.echo(f"Se importaron {resultado['importadas']} de {resultado['leidas']} {tipo}"
+                       f" ({resultado['metodo'] or 'sin cambios'}).")
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Bus de eventos en tiempo real (Socket.IO).
+
+Al conectarse, cada socket entra en la sala de su rol, o en la de su rol
+en una sola ruta si el dashboard se abrio con ?ruta=... (tablets dedicadas
+a una ruta), y ademas en la sala general del rol.
+
+Los eventos de un pedido se envian solo a las salas que los usan, con los
+campos que cambiaron y la version del pedido, en una sola llamada a emit:
+el paquete se codifica una sola vez para todos los destinatarios.
+
+Con varios procesos, los emit pasan por una cola de mensajes compartida
+(SOCKETIO_MESSAGE_QUEUE) y cada proceso los reparte a sus propios sockets.
+"""
+
+import os
+import socketio as socketio_base
+from flask import request
+from flask_login import current_user
+from flask_socketio import join_room
+from sqlalchemy import inspect
+from app import socketio
+
+
+ROLES = ('vendedor', 'operario')
+
+# Evento -> roles que lo escuchan
+DESTINATARIOS = {
+    'pedidos_creados': ('vendedor', 'operario'),
+    'pedido_modificado': ('vendedor', 'operario'),
+    'pedido_actualizado': ('vendedor', 'operario'),
+    'pedido_asignado': ('vendedor', 'operario'),
+    'pedido_eliminado': ('vendedor', 'operario'),
+    'pedido_visto_por_fabrica': ('vendedor',),
+    'semana_cerrada': ('vendedor', 'operario'),
+}
+
+# Campos de Pedido.to_dict que se envian siempre, y los que dependen de otra columna
+CAMPOS_SIEMPRE = ('id', 'cliente_id', 'version', 'fecha_actualizacion')
+CAMPOS_DERIVADOS = {
+    'cliente_id': ('cliente_nombre',),
+    'operario_id': ('operario_nombre',),
+}
+
+
+def sala(rol, ruta=None):
+    """Nombre de la sala de un rol (todas las rutas) o de un rol en una ruta"""
+    return f'{rol}:{ruta}' if ruta else rol
+
+
+def sala_general(rol):
+    """Sala de todos los sockets de un rol, sin importar la ruta"""
+    return f'{rol}:*'
+
+
+def salas_destino(evento, ruta):
+    """
+    Salas que reciben un evento de un pedido de la ruta indicada.
+    Un socket de ruta no esta en la sala del rol, asi que no recibe los
+    eventos de las otras rutas.
+    """
+    salas = []
+    for rol in DESTINATARIOS[evento]:
+        salas.append(sala(rol))
+        if ruta:
+            salas.append(sala(rol, ruta))
+    return salas
+
+
+def campos_modificados(pedido):
+    """
+    Columnas del pedido con cambios sin confirmar.
+    Hay que llamarla antes del commit (despues el historial se limpia).
+    """
+    estado = inspect(pedido)
+    return {
+        atributo.key for atributo in estado.mapper.column_attrs
+        if estado.attrs[atributo.key].history.has_changes()
+    }
+
+
+def publicar_pedido(evento, pedido, campos=None, **extra):
+    """
+    Envia un evento de pedido a las salas interesadas.
+
+    Args:
+        evento: Nombre del evento (clave de DESTINATARIOS)
+        pedido: Pedido ya confirmado en la base
+        campos: Columnas que cambiaron (ver campos_modificados). Si es None
+                se envia el pedido completo (por ejemplo, al crearlo)
+        **extra: Datos adicionales del evento (mensaje, etc.)
+
+    Returns:
+        dict: El pedido completo serializado, para reutilizarlo en la respuesta
+    """
+    datos = pedido.to_dict()
+
+    if campos is None:
+        # Pedido completo ('cambios' en None)
+        enviado = datos
+        cambios = None
+    else:
+        claves = set(CAMPOS_SIEMPRE)
+        for campo in campos:
+            claves.add(campo)
+            claves.update(CAMPOS_DERIVADOS.get(campo, ()))
+        enviado = {clave: datos[clave] for clave in claves if clave in datos}
+        cambios = sorted(clave for clave in enviado if clave not in CAMPOS_SIEMPRE)
+
+    ruta = pedido.cliente.ruta if pedido.cliente else None
+    socketio.emit(evento, {
+        'pedido': enviado,
+        'cambios': cambios,
+        'ruta': ruta,
+        **extra
+    }, to=salas_destino(evento, ruta), namespace='/')
+
+    return datos
+
+
+def serializar_pedidos_creados(cliente, pedidos):
+    """
+    Serializa las lineas de un alta sin consultas extra: el cliente ya esta
+    cargado y los pedidos nuevos todavia no tienen operario. Hay que llamarla
+    antes del commit (despues los atributos expiran y cada pedido se recarga).
+    """
+    return [pedido.to_dict(cliente_nombre=cliente.nombre) for pedido in pedidos]
+
+
+def publicar_pedidos_creados(cliente, pedidos):
+    """
+    Envia todas las lineas de un mismo alta en un solo evento.
+
+    Args:
+        cliente: Cliente de las lineas
+        pedidos: Lineas ya serializadas (ver serializar_pedidos_creados)
+    """
+    if not pedidos:
+        return
+
+    socketio.emit('pedidos_creados', {
+        'cliente_id': cliente.id,
+        'cliente_nombre': cliente.nombre,
+        'ruta': cliente.ruta,
+        'pedidos': pedidos
+    }, to=salas_destino('pedidos_creados', cliente.ruta), namespace='/')
+
+
+def publicar_eliminado(pedido_id, cliente_id, ruta):
+    """Envia el evento de pedido eliminado a las salas interesadas"""
+    socketio.emit('pedido_eliminado', {
+        'pedido_id': pedido_id,
+        'cliente_id': cliente_id,
+        'ruta': ruta
+    }, to=salas_destino('pedido_eliminado', ruta), namespace='/')
+
+
+def publicar_general(evento, datos):
+    """Envia un evento que afecta a todas las rutas (por ejemplo, el cierre de semana)"""
+    salas = [sala_general(rol) for rol in DESTINATARIOS[evento]]
+    socketio.emit(evento, datos, to=salas, namespace='/')
+
+
+def opciones_cola_mensajes(config):
+    """
+    Opciones de SocketIO.init_app para compartir los eventos entre procesos.
+
+    Redis, AMQP y demas URLs se pasan tal cual a Flask-SocketIO. Para
+    filesystem:///carpeta se arma el gestor de Kombu a mano, porque la carpeta
+    va en las opciones de transporte y no en la URL.
+
+    Returns:
+        dict: Opciones para init_app (vacio si se corre un solo proceso)
+    """
+    url = config.get('SOCKETIO_MESSAGE_QUEUE')
+    canal = config.get('SOCKETIO_CHANNEL', 'flask-socketio')
+
+    if not url:
+        return {}
+
+    if url.startswith('filesystem://'):
+        carpeta = url[len('filesystem://'):]
+        if not carpeta:
+            raise ValueError('SOCKETIO_MESSAGE_QUEUE=filesystem:// necesita una carpeta (filesystem:///tmp/cola)')
+        os.makedirs(carpeta, exist_ok=True)
+        return {
+            'client_manager': socketio_base.KombuManager(
+                'filesystem://',
+                channel=canal,
+                connection_options={'transport_options': {
+                    'data_folder_in': carpeta,
+                    'data_folder_out': carpeta,
+                    'control_folder': carpeta
+                }}
+            )
+        }
+
+    return {'message_queue': url, 'channel': canal}
+
+
+def registrar_eventos():
+    """Registra los manejadores de conexion de Socket.IO"""
+
+    @socketio.on('connect')
+    def conectar(auth=None):
+        """Une el socket a la sala de su rol (o de su ruta, si la pidio)"""
+        if not current_user.is_authenticated or current_user.rol not in ROLES:
+            return False
+
+        ruta = request.args.get('ruta') or None
+        join_room(sala(current_user.rol, ruta))
+        join_room(sala_general(current_user.rol))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Formulario para la importacion masiva desde CSV.
+"""
+
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import SelectField, BooleanField, SubmitField
+from wtforms.validators import DataRequired
+
+
+class ImportarCSVForm(FlaskForm):
+    """
+    Formulario para subir un CSV de clientes o de pedidos.
+    """
+
+    tipo = SelectField(
+        'Tipo de archivo',
+        choices=[
+            ('clientes', 'Clientes'),
+            ('pedidos', 'Pedidos')
+        ],
+        validators=[
+            DataRequired(message='Debes seleccionar el tipo de archivo')
+        ],
+        render_kw={
+            'class': 'form-select'
+        }
+    )
+
+    archivo = FileField(
+        'Archivo CSV',
+        validators=[
+            FileRequired(message='Debes seleccionar un archivo'),
+            FileAllowed(['csv', 'txt'], message='El archivo debe ser .csv')
+        ],
+        render_kw={
+            'class': 'form-control',
+            'accept': '.csv,text/csv'
+        }
+    )
+
+    simular = BooleanField(
+        'Solo validar (no importar)',
+        render_kw={
+            'class': 'form-check-input'
+        }
+    )
+
+    submit = SubmitField(
+        'Importar',
+        render_kw={
+            'class': 'btn btn-primary'
+        }
+    )
@@ -4,8 +4,9 @@ Formularios para gestión de pedidos.
 """
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, DecimalField, SelectField, TextAreaField, SubmitField, HiddenField
-from wtforms.validators import DataRequired, NumberRange, Length, Optional
+from wtforms import StringField, DecimalField, SelectField, TextAreaField, SubmitField, HiddenField, IntegerField
+from wtforms.validators import DataRequired, NumberRange, Length, Optional, ValidationError
+from wtforms.widgets import HiddenInput
 from app.models.cliente import Cliente
 from app.models.usuario import Usuario
 from app import db
@@ -16,15 +17,13 @@ class PedidoForm(FlaskForm):
     Formulario para crear pedidos (versión simplificada para múltiples pedidos).
     """
     
-    cliente_id = SelectField(
+    # Se elige con el buscador de clientes (/ventas/api/clientes/buscar)
+    cliente_id = IntegerField(
         'Cliente',
-        coerce=int,
         validators=[
             DataRequired(message='Debes seleccionar un cliente')
         ],
-        render_kw={
-            'class': 'form-select'
-        }
+        widget=HiddenInput()
     )
     
     submit = SubmitField(
@@ -36,12 +35,14 @@ class PedidoForm(FlaskForm):
     
     def __init__(self, *args, **kwargs):
         super(PedidoForm, self).__init__(*args, **kwargs)
-        # Cargar clientes activos
-        self.cliente_id.choices = [
-            (c.id, f"{c.nombre} - {c.ruta}") 
-            for c in Cliente.query.filter_by(activo=True).order_by(Cliente.ruta, Cliente.nombre).all()
-        ]
-        self.cliente_id.choices.insert(0, (0, 'Selecciona un cliente...'))
+        self.cliente = None  # Cliente elegido, una vez validado
+    
+    def validate_cliente_id(self, field):
+        """El cliente debe existir y estar activo (una consulta por clave primaria)"""
+        cliente = db.session.get(Cliente, field.data)
+        if cliente is None or not cliente.activo:
+            raise ValidationError('El cliente no existe o no está activo')
+        self.cliente = cliente
 
 
 class ActualizarPedidoFabricaForm(FlaskForm):
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentacion de peticiones y consultas SQL.
+
+Cada peticion cuenta sus consultas (eventos before/after_cursor_execute de
+SQLAlchemy), el tiempo total en la base y guarda las mas lentas con su
+origen: la ruta, la plantilla que se estaba renderizando (consultas
+perezosas desde Jinja) y la linea de la aplicacion que la disparo.
+
+Con eso:
+- la respuesta lleva un encabezado Server-Timing (visible en las
+  herramientas de desarrollo del navegador);
+- las peticiones que superan los umbrales se registran en el log con sus
+  consultas mas lentas;
+- se acumulan metricas del proceso que /metrics expone en el formato de
+  Prometheus, y las consultas mas lentas vistas desde el arranque.
+
+Las metricas son de cada proceso: con varios workers cada uno informa las
+suyas (etiqueta 'pid').
+"""
+
+import heapq
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from flask import g, request, has_request_context, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Limites de los histogramas (segundos y cantidad de consultas)
+LIMITES_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Largo maximo del SQL guardado de cada consulta lenta
+LARGO_SQL = 300
+
+# Carpeta de la aplicacion, para encontrar la linea que disparo una consulta
+CARPETA_APP = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(CARPETA_APP)
+
+
+# ============================================================
+# METRICAS DEL PROCESO
+# ============================================================
+
+class Metricas:
+    """Acumulados de todas las peticiones del proceso"""
+
+    def __init__(self, consultas_guardadas):
+        self._candado = threading.Lock()
+        self.consultas_guardadas = consultas_guardadas
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._candado:
+            self.peticiones = defaultdict(int)          # (endpoint, metodo, estado) -> n
+            self.duracion = defaultdict(lambda: [0] * (len(LIMITES_DURACION) + 1))
+            self.duracion_total = defaultdict(float)    # endpoint -> segundos
+            self.consultas = defaultdict(lambda: [0] * (len(LIMITES_CONSULTAS) + 1))
+            self.consultas_total = defaultdict(int)     # endpoint -> consultas
+            self.tiempo_sql = defaultdict(float)        # endpoint -> segundos en la base
+            self.lentas = defaultdict(int)              # endpoint -> peticiones lentas
+            self.peores = []                            # heap de (ms, n, consulta)
+            self._orden = 0
+
+    @staticmethod
+    def _bucket(limites, valor):
+        for posicion, limite in enumerate(limites):
+            if valor <= limite:
+                return posicion
+        return len(limites)
+
+    def registrar(self, endpoint, metodo, estado, segundos, datos, lenta):
+        with self._candado:
+            self.peticiones[(endpoint, metodo, estado)] += 1
+            self.duracion[endpoint][self._bucket(LIMITES_DURACION, segundos)] += 1
+            self.duracion_total[endpoint] += segundos
+            self.consultas[endpoint][self._bucket(LIMITES_CONSULTAS, datos['consultas'])] += 1
+            self.consultas_total[endpoint] += datos['consultas']
+            self.tiempo_sql[endpoint] += datos['tiempo']
+            if lenta:
+                self.lentas[endpoint] += 1
+
+            for consulta in datos['lentas']:
+                self._orden += 1
+                entrada = (consulta['ms'], self._orden, consulta)
+                if len(self.peores) < self.consultas_guardadas:
+                    heapq.heappush(self.peores, entrada)
+                elif entrada[0] > self.peores[0][0]:
+                    heapq.heapreplace(self.peores, entrada)
+
+    def consultas_mas_lentas(self):
+        with self._candado:
+            return [consulta for _, _, consulta in sorted(self.peores, key=lambda e: e[0], reverse=True)]
+
+    def prometheus(self, extra=()):
+        """Texto en el formato de exposicion de Prometheus"""
+        pid = os.getpid()
+        lineas = []
+
+        def etiquetas(**valores):
+            valores['pid'] = pid
+            texto = ','.join(
+                '{}="{}"'.format(clave, str(valor).replace('\\', '\\\\').replace('"', '\\"'))
+                for clave, valor in valores.items()
+            )
+            return '{' + texto + '}'
+
+        def histograma(nombre, ayuda, limites, buckets, sumas):
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} histogram')
+            for endpoint, conteos in sorted(buckets.items()):
+                acumulado = 0
+                for limite, conteo in zip(list(limites) + ['+Inf'], conteos):
+                    acumulado += conteo
+                    lineas.append(f'{nombre}_bucket{etiquetas(endpoint=endpoint, le=limite)} {acumulado}')
+                lineas.append(f'{nombre}_sum{etiquetas(endpoint=endpoint)} {sumas[endpoint]}')
+                lineas.append(f'{nombre}_count{etiquetas(endpoint=endpoint)} {acumulado}')
+
+        with self._candado:
+            lineas.append('# HELP http_requests_total Peticiones atendidas')
+            lineas.append('# TYPE http_requests_total counter')
+            for (endpoint, metodo, estado), cantidad in sorted(self.peticiones.items()):
+                lineas.append(f'http_requests_total{etiquetas(endpoint=endpoint, method=metodo, status=estado)} {cantidad}')
+
+            histograma('http_request_duration_seconds', 'Duracion de las peticiones',
+                       LIMITES_DURACION, self.duracion, self.duracion_total)
+            histograma('db_queries_per_request', 'Consultas SQL por peticion',
+                       LIMITES_CONSULTAS, self.consultas, self.consultas_total)
+
+            lineas.append('# HELP db_query_seconds_total Tiempo total en la base por endpoint')
+            lineas.append('# TYPE db_query_seconds_total counter')
+            for endpoint, segundos in sorted(self.tiempo_sql.items()):
+                lineas.append(f'db_query_seconds_total{etiquetas(endpoint=endpoint)} {round(segundos, 6)}')
+
+            lineas.append('# HELP http_slow_requests_total Peticiones que superaron los umbrales')
+            lineas.append('# TYPE http_slow_requests_total counter')
+            for endpoint, cantidad in sorted(self.lentas.items()):
+                lineas.append(f'http_slow_requests_total{etiquetas(endpoint=endpoint)} {cantidad}')
+
+        for nombre, tipo, ayuda, valor in extra:
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            lineas.append(f'{nombre}{etiquetas()} {valor}')
+
+        return '\n'.join(lineas) + '\n'
+
+
+# ============================================================
+# CONSULTAS DE LA PETICION
+# ============================================================
+
+def _datos_peticion():
+    """Datos SQL de la peticion en curso (None fuera de una peticion instrumentada)"""
+    if not has_request_context():
+        return None
+    return g.get('_instrumentacion')
+
+
+def _origen_consulta():
+    """Primera linea de la aplicacion (fuera de este modulo) en la pila actual"""
+    marco = sys._getframe(2)
+    while marco is not None:
+        archivo = marco.f_code.co_filename
+        if archivo.startswith(CARPETA_APP) and archivo != __file__:
+            return f'{os.path.relpath(archivo, RAIZ)}:{marco.f_lineno}'
+        marco = marco.f_back
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _datos_peticion() is not None:
+        conn.info.setdefault('_inicio_consultas', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    datos = _datos_peticion()
+    inicios = conn.info.get('_inicio_consultas')
+    if datos is None or not inicios:
+        return
+
+    segundos = time.perf_counter() - inicios.pop()
+    datos['consultas'] += 1
+    datos['tiempo'] += segundos
+
+    # Solo se arma el detalle si entra entre las mas lentas de la peticion
+    lentas = datos['lentas']
+    ms = round(segundos * 1000, 2)
+    if len(lentas) >= datos['maximo'] and ms <= lentas[-1]['ms']:
+        return
+
+    lentas.append({
+        'ms': ms,
+        'sql': ' '.join(statement.split())[:LARGO_SQL],
+        'endpoint': request.endpoint,
+        'plantilla': datos['plantilla'],
+        'origen': _origen_consulta(),
+    })
+    lentas.sort(key=lambda consulta: consulta['ms'], reverse=True)
+    del lentas[datos['maximo']:]
+
+
+# ============================================================
+# CICLO DE LA PETICION
+# ============================================================
+
+def _server_timing(datos, segundos, detalle):
+    """
+    Valor del encabezado Server-Timing. Con detalle (modo debug) agrega las
+    consultas mas lentas con la linea de codigo que las disparo.
+    """
+    partes = [
+        f'app;dur={segundos * 1000:.1f}',
+        f'db;dur={datos["tiempo"] * 1000:.1f};desc="{datos["consultas"]} consultas"',
+    ]
+    if not detalle:
+        return ', '.join(partes)
+    for numero, consulta in enumerate(datos['lentas'], start=1):
+        descripcion = (consulta['origen'] or consulta['plantilla'] or 'sql').replace('"', "'")
+        partes.append(f'sql{numero};dur={consulta["ms"]};desc="{descripcion}"')
+    return ', '.join(partes)
+
+
+def registrar_instrumentacion(app):
+    """
+    Instala la instrumentacion en la app (si INSTRUMENTACION_ACTIVA).
+    Los eventos de SQLAlchemy son globales; solo registran algo dentro de
+    una peticion de una app instrumentada.
+    """
+    if not app.config.get('INSTRUMENTACION_ACTIVA', True):
+        return
+
+    metricas = Metricas(app.config['CONSULTAS_LENTAS_GUARDADAS'])
+    app.extensions['instrumentacion'] = metricas
+
+    @app.before_request
+    def iniciar_medicion():
+        g._instrumentacion = {
+            'inicio': time.perf_counter(),
+            'consultas': 0,
+            'tiempo': 0.0,
+            'lentas': [],
+            'maximo': app.config['CONSULTAS_LENTAS_POR_PETICION'],
+            'plantilla': None,
+            'estado': None,
+        }
+
+    @app.after_request
+    def agregar_server_timing(respuesta):
+        datos = g.get('_instrumentacion')
+        if datos is None:
+            return respuesta
+        datos['estado'] = respuesta.status_code
+        if app.config['SERVER_TIMING']:
+            respuesta.headers['Server-Timing'] = _server_timing(
+                datos, time.perf_counter() - datos['inicio'], app.debug
+            )
+        return respuesta
+
+    @app.teardown_request
+    def registrar_peticion(error=None):
+        # Despues de enviar la respuesta (incluye las respuestas en streaming)
+        datos = g.pop('_instrumentacion', None)
+        if datos is None:
+            return
+
+        segundos = time.perf_counter() - datos['inicio']
+        endpoint = request.endpoint or 'sin_ruta'
+        if endpoint == 'static':
+            return
+
+        lenta = (
+            segundos * 1000 >= app.config['UMBRAL_PETICION_LENTA_MS']
+            or datos['consultas'] >= app.config['UMBRAL_CONSULTAS_PETICION']
+        )
+        estado = 500 if error is not None else (datos['estado'] or 500)
+        metricas.registrar(endpoint, request.method, estado, segundos, datos, lenta)
+
+        if lenta:
+            detalle = '; '.join(
+                f"{consulta['ms']} ms {consulta['origen'] or consulta['plantilla'] or ''} {consulta['sql'][:120]}"
+                for consulta in datos['lentas']
+            )
+            app.logger.warning(
+                'Peticion lenta: %s %s %.0f ms, %d consultas (%.0f ms en la base). Mas lentas: %s',
+                request.method, request.path, segundos * 1000, datos['consultas'],
+                datos['tiempo'] * 1000, detalle
+            )
+
+    def al_renderizar(sender, template, context, **extra):
+        datos = _datos_peticion()
+        if datos is not None:
+            datos['plantilla'] = template.name
+
+    def al_terminar_render(sender, template, context, **extra):
+        datos = _datos_peticion()
+        if datos is not None:
+            datos['plantilla'] = None
+
+    before_render_template.connect(al_renderizar, app, weak=False)
+    template_rendered.connect(al_terminar_render, app, weak=False)
@@ -7,6 +7,8 @@ Aqui se importan todos los modelos para facilitar su uso.
 from app.models.usuario import Usuario
 from app.models.cliente import Cliente
 from app.models.pedido import Pedido
+from app.models.pedido_archivado import PedidoArchivado
 from app.models.producto import Producto
+from app.models.resumen_semana import ResumenSemana
 
-__all__ = ['Usuario', 'Cliente', 'Pedido', 'Producto']
\ No newline at end of file
+__all__ = ['Usuario', 'Cliente', 'Pedido', 'PedidoArchivado', 'Producto', 'ResumenSemana']
\ No newline at end of file
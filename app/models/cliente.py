@@ -51,8 +51,21 @@ class Cliente(db.Model):
         """Retorna pedidos completados del cliente"""
         return self.pedidos.filter_by(estado='completado').count()
     
-    def to_dict(self):
-        """Convierte el cliente a diccionario"""
+    def to_dict(self, contadores=None):
+        """
+        Convierte el cliente a diccionario.
+        
+        Args:
+            contadores: dict con 'total_pedidos', 'pedidos_pendientes' y
+                'pedidos_completados' ya calculados (evita tres COUNT)
+        """
+        if contadores is None:
+            contadores = {
+                'total_pedidos': self.total_pedidos(),
+                'pedidos_pendientes': self.pedidos_pendientes(),
+                'pedidos_completados': self.pedidos_completados()
+            }
+        
         return {
             'id': self.id,
             'nombre': self.nombre,
@@ -62,7 +75,7 @@ class Cliente(db.Model):
             'notas': self.notas,
             'activo': self.activo,
             'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
-            'total_pedidos': self.total_pedidos(),
-            'pedidos_pendientes': self.pedidos_pendientes(),
-            'pedidos_completados': self.pedidos_completados()
+            'total_pedidos': contadores['total_pedidos'],
+            'pedidos_pendientes': contadores['pedidos_pendientes'],
+            'pedidos_completados': contadores['pedidos_completados']
         }
\ No newline at end of file
@@ -15,6 +15,23 @@ class Pedido(db.Model):
     
     __tablename__ = 'pedidos'
     
+    # Índices compuestos según las consultas de los dashboards. La tabla
+    # solo tiene pedidos activos (el cierre los mueve a pedidos_archivo).
+    __table_args__ = (
+        db.Index('ix_pedidos_activos_modificados', 'modificado', 'visto_por_fabrica'),
+        db.Index('ix_pedidos_activos_cliente_fecha', 'cliente_id', 'fecha_creacion'),
+        db.Index(
+            'ix_pedidos_activos_no_leidos', 'visto_por_vendedor',
+            postgresql_where=db.text('observaciones_fabrica IS NOT NULL'),
+            sqlite_where=db.text('observaciones_fabrica IS NOT NULL')
+        ),
+        # Paginacion por cursor de /fabrica/api/pedidos
+        db.Index('ix_pedidos_fecha_id', 'fecha_creacion', 'id'),
+        # Los ids no se reutilizan aunque la tabla quede vacia despues de un
+        # cierre (en pedidos_archivo la clave es (id, semana_archivado))
+        {'sqlite_autoincrement': True},
+    )
+    
     # Campos de la tabla
     id = db.Column(db.Integer, primary_key=True)
     
@@ -25,6 +42,13 @@ class Pedido(db.Model):
     producto_nombre = db.Column(db.String(200), nullable=False)  # Guardamos el nombre por si cambia el producto
     cantidad = db.Column(db.Numeric(10, 2), nullable=False)
     unidad = db.Column(db.String(50), nullable=True)
+    # Producto del catalogo, si el nombre coincide con uno (para agrupar exacto)
+    producto_id = db.Column(
+        db.Integer,
+        db.ForeignKey('productos.id', ondelete='SET NULL', name='fk_pedidos_producto_id_productos'),
+        nullable=True,
+        index=True
+    )
     
     # Estado del pedido
     estado = db.Column(
@@ -47,15 +71,20 @@ class Pedido(db.Model):
     visto_por_vendedor = db.Column(db.Boolean, default=False, nullable=False)
     esperando_contestacion = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Versión del pedido: la base la incrementa en cada UPDATE.
+    # Viaja en los eventos de Socket.IO para descartar eventos viejos.
+    version = db.Column(
+        db.Integer,
+        nullable=False,
+        default=1,
+        server_default='1',
+        onupdate=db.literal_column('version') + 1
+    )
+
     # Timestamps
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     fecha_completado = db.Column(db.DateTime, nullable=True)
-
-    # Campos de archivo
-    archivado = db.Column(db.Boolean, default=False, nullable=False, index=True)
-    fecha_archivado = db.Column(db.DateTime, nullable=True)
-    semana_archivado = db.Column(db.String(50), nullable=True)  # Ej: "Semana 2025-01"
     
     
     def __repr__(self):
@@ -81,36 +110,42 @@ class Pedido(db.Model):
         """Marca que el vendedor ya vió la actualización de fábrica"""
         self.visto_por_vendedor = True
     
-    def to_dict(self):
-        """Convierte el pedido a diccionario"""
+    def to_dict(self, cliente_nombre=None, operario_nombre=None):
+        """
+        Convierte el pedido a diccionario.
+        
+        Args:
+            cliente_nombre: Nombre del cliente ya resuelto (evita cargar la relación)
+            operario_nombre: Nombre del operario ya resuelto (evita cargar la relación)
+        """
+        if cliente_nombre is None:
+            cliente_nombre = self.cliente.nombre if self.cliente else None
+        if operario_nombre is None and self.operario_id:
+            operario_nombre = self.operario_responsable.nombre if self.operario_responsable else None
+        
         return {
             'id': self.id,
             'cliente_id': self.cliente_id,
-            'cliente_nombre': self.cliente.nombre if self.cliente else None,
+            'cliente_nombre': cliente_nombre,
             'producto_nombre': self.producto_nombre,
+            'producto_id': self.producto_id,
             'cantidad': float(self.cantidad),
             'unidad': self.unidad,
             'estado': self.estado,
             'operario_id': self.operario_id,
-            'operario_nombre': self.operario_responsable.nombre if self.operario_responsable else None,
+            'operario_nombre': operario_nombre,
             'observaciones_fabrica': self.observaciones_fabrica,
             'notas_vendedor': self.notas_vendedor,
             'modificado': self.modificado,
             'visto_por_fabrica': self.visto_por_fabrica,
             'visto_por_vendedor': self.visto_por_vendedor,
-            'archivado': self.archivado,  # <--- AGREGAR
-            'fecha_archivado': self.fecha_archivado.isoformat() if self.fecha_archivado else None,  # <--- AGREGAR
-            'semana_archivado': self.semana_archivado,  # <--- AGREGAR
+            # Mismas claves que PedidoArchivado.to_dict
+            'archivado': False,
+            'fecha_archivado': None,
+            'semana_archivado': None,
             'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
             'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
             'fecha_completado': self.fecha_completado.isoformat() if self.fecha_completado else None,
-            'esperando_contestacion': self.esperando_contestacion
+            'esperando_contestacion': self.esperando_contestacion,
+            'version': self.version
         }
-    
-    def archivar(self, semana):
-        """
-        Archiva el pedido al cerrar la semana
-        """
-        self.archivado = True
-        self.fecha_archivado = datetime.utcnow()
-        self.semana_archivado = semana
\ No newline at end of file
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo PedidoArchivado - Pedidos de semanas ya cerradas.
+
+Al cerrar la semana los pedidos se mueven de la tabla `pedidos` a
+`pedidos_archivo`, asi la tabla de pedidos activos se mantiene chica.
+En PostgreSQL la tabla esta particionada por LIST (semana_archivado),
+con una particion por semana cerrada.
+"""
+
+from app import db
+
+
+class PedidoArchivado(db.Model):
+    """
+    Modelo de Pedido archivado.
+    Mismos datos que Pedido, mas la semana en la que se cerró.
+    """
+
+    __tablename__ = 'pedidos_archivo'
+    __table_args__ = (
+        # Paginacion por cursor de /fabrica/api/pedidos?archivado=1
+        db.Index('ix_pedidos_archivo_fecha_id', 'fecha_creacion', 'id'),
+        {'postgresql_partition_by': 'LIST (semana_archivado)'}
+    )
+
+    # Se conserva el id original del pedido. La semana forma parte de la
+    # clave primaria porque PostgreSQL exige incluir la clave de particion.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    semana_archivado = db.Column(db.String(50), primary_key=True)  # Ej: "Semana 2026-1F"
+    fecha_archivado = db.Column(db.DateTime, nullable=False, index=True)
+
+    # Relación con Cliente
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False, index=True)
+
+    # Detalles del pedido
+    producto_nombre = db.Column(db.String(200), nullable=False)
+    cantidad = db.Column(db.Numeric(10, 2), nullable=False)
+    unidad = db.Column(db.String(50), nullable=True)
+    producto_id = db.Column(
+        db.Integer,
+        db.ForeignKey('productos.id', ondelete='SET NULL', name='fk_pedidos_archivo_producto_id_productos'),
+        nullable=True,
+        index=True
+    )
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+
+    # Operario responsable
+    operario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+
+    # Observaciones
+    observaciones_fabrica = db.Column(db.Text, nullable=True)
+    notas_vendedor = db.Column(db.Text, nullable=True)
+
+    # Control de cambios (estado al momento de archivar)
+    modificado = db.Column(db.Boolean, default=False, nullable=False)
+    visto_por_fabrica = db.Column(db.Boolean, default=False, nullable=False)
+    visto_por_vendedor = db.Column(db.Boolean, default=False, nullable=False)
+    esperando_contestacion = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Timestamps
+    fecha_creacion = db.Column(db.DateTime, nullable=False)
+    fecha_actualizacion = db.Column(db.DateTime, nullable=True)
+    fecha_completado = db.Column(db.DateTime, nullable=True)
+
+    # Relaciones
+    cliente = db.relationship(
+        'Cliente',
+        backref=db.backref('pedidos_archivados', lazy='dynamic', cascade='all, delete-orphan')
+    )
+    operario_responsable = db.relationship('Usuario')
+
+    def __repr__(self):
+        """Representación en string del pedido archivado"""
+        return f'<PedidoArchivado #{self.id} - {self.producto_nombre} - {self.semana_archivado}>'
+
+    def to_dict(self, cliente_nombre=None, operario_nombre=None):
+        """
+        Convierte el pedido archivado a diccionario (mismas claves que Pedido.to_dict).
+
+        Args:
+            cliente_nombre: Nombre del cliente ya resuelto (evita cargar la relación)
+            operario_nombre: Nombre del operario ya resuelto (evita cargar la relación)
+        """
+        if cliente_nombre is None:
+            cliente_nombre = self.cliente.nombre if self.cliente else None
+        if operario_nombre is None and self.operario_id:
+            operario_nombre = self.operario_responsable.nombre if self.operario_responsable else None
+
+        return {
+            'id': self.id,
+            'cliente_id': self.cliente_id,
+            'cliente_nombre': cliente_nombre,
+            'producto_nombre': self.producto_nombre,
+            'producto_id': self.producto_id,
+            'cantidad': float(self.cantidad),
+            'unidad': self.unidad,
+            'estado': self.estado,
+            'operario_id': self.operario_id,
+            'operario_nombre': operario_nombre,
+            'observaciones_fabrica': self.observaciones_fabrica,
+            'notas_vendedor': self.notas_vendedor,
+            'modificado': self.modificado,
+            'visto_por_fabrica': self.visto_por_fabrica,
+            'visto_por_vendedor': self.visto_por_vendedor,
+            'archivado': True,
+            'fecha_archivado': self.fecha_archivado.isoformat() if self.fecha_archivado else None,
+            'semana_archivado': self.semana_archivado,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None,
+            'fecha_completado': self.fecha_completado.isoformat() if self.fecha_completado else None,
+            'esperando_contestacion': self.esperando_contestacion,
+            'version': None  # No se conserva al archivar
+        }
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo ResumenSemana - Totales de cada semana cerrada.
+
+Se mantiene al cerrar la semana (en la misma transaccion que archiva los
+pedidos) y al purgar el archivo, para que el historial y los reportes
+semanales lean una fila por semana en vez de recorrer `pedidos_archivo`.
+"""
+
+from app import db
+
+
+class ResumenSemana(db.Model):
+    """
+    Resumen de una semana archivada: pedidos por estado, por ruta y por
+    producto, y las primeras/ultimas fechas.
+    """
+
+    __tablename__ = 'resumen_semanas'
+
+    semana = db.Column(db.String(50), primary_key=True)  # Ej: "Semana 2026-1F"
+
+    # Totales por estado
+    total_pedidos = db.Column(db.Integer, nullable=False, default=0)
+    pendientes = db.Column(db.Integer, nullable=False, default=0)
+    completados = db.Column(db.Integer, nullable=False, default=0)
+    cancelados = db.Column(db.Integer, nullable=False, default=0)
+
+    # Pedidos por ruta y por producto: {nombre: cantidad de pedidos}
+    por_ruta = db.Column(db.JSON, nullable=False, default=dict)
+    por_producto = db.Column(db.JSON, nullable=False, default=dict)
+
+    # Cierres de la semana (fecha_archivado) y pedidos (fecha_creacion)
+    primer_cierre = db.Column(db.DateTime, nullable=True, index=True)
+    ultimo_cierre = db.Column(db.DateTime, nullable=True)
+    primer_pedido = db.Column(db.DateTime, nullable=True)
+    ultimo_pedido = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        """Representación en string del resumen"""
+        return f'<ResumenSemana {self.semana} - {self.total_pedidos} pedidos>'
+
+    def to_dict(self):
+        """Convierte el resumen a diccionario"""
+        return {
+            'semana': self.semana,
+            'total_pedidos': self.total_pedidos,
+            'pendientes': self.pendientes,
+            'completados': self.completados,
+            'cancelados': self.cancelados,
+            'por_ruta': self.por_ruta,
+            'por_producto': self.por_producto,
+            'primer_cierre': self.primer_cierre.isoformat() if self.primer_cierre else None,
+            'ultimo_cierre': self.ultimo_cierre.isoformat() if self.ultimo_cierre else None,
+            'primer_pedido': self.primer_pedido.isoformat() if self.primer_pedido else None,
+            'ultimo_pedido': self.ultimo_pedido.isoformat() if self.ultimo_pedido else None,
+        }
@@ -5,10 +5,15 @@ Modelo Usuario - Representa a vendedores y operarios de fábrica.
 
 from app import db, login_manager
 from flask_login import UserMixin
+from sqlalchemy import event, inspect
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 
+# Campos que, al cambiar, cierran las sesiones abiertas del usuario
+CAMPOS_SESION = ('rol', 'activo', 'password_hash')
+
+
 class Usuario(UserMixin, db.Model):
     """
     Modelo de Usuario del sistema.
@@ -29,6 +34,10 @@ class Usuario(UserMixin, db.Model):
     rol = db.Column(db.String(20), nullable=False, default='vendedor')  # 'vendedor' o 'operario'
     activo = db.Column(db.Boolean, default=True, nullable=False)
     
+    # Se incrementa al cambiar rol, activo o contraseña; la sesion guarda
+    # la version con la que se inicio y deja de valer si no coincide
+    version_sesion = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+    
     # Timestamps
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     ultima_conexion = db.Column(db.DateTime)
@@ -84,4 +93,12 @@ class Usuario(UserMixin, db.Model):
             'activo': self.activo,
             'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
             'ultima_conexion': self.ultima_conexion.isoformat() if self.ultima_conexion else None
-        }
\ No newline at end of file
+        }
+
+
+@event.listens_for(Usuario, 'before_update')
+def _incrementar_version_sesion(mapper, connection, usuario):
+    """Invalida las sesiones abiertas si cambio el rol, el estado o la contraseña"""
+    estado = inspect(usuario)
+    if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_SESION):
+        usuario.version_sesion = (usuario.version_sesion or 1) + 1
@@ -3,7 +3,7 @@
 Blueprint de autenticación (login, logout).
 """
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session
 from flask_login import login_user, logout_user, current_user
 from app import db
 from app.models.usuario import Usuario
@@ -45,6 +45,7 @@ def login():
             
             # Iniciar sesión
             login_user(usuario, remember=form.remember_me.data)
+            session['version_sesion'] = usuario.version_sesion
             
             # Actualizar última conexión
             usuario.ultima_conexion = datetime.utcnow()
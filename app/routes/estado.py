@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprints de estado del servidor (monitoreo): /estado/* y /metrics.
+
+Accesibles con sesion iniciada o con el encabezado
+`Authorization: Bearer <TOKEN_METRICAS>`.
+"""
+
+import os
+from flask import Blueprint, Response, jsonify, request, current_app, abort
+from flask_login import current_user
+from app import db
+from functools import wraps
+
+# Crear los Blueprints (/metrics va en la raiz, donde lo busca Prometheus)
+estado_bp = Blueprint('estado', __name__)
+metricas_bp = Blueprint('metricas', __name__)
+
+
+def monitoreo_permitido(f):
+    """
+    Decorador: usuario logueado o token de monitoreo valido.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = current_app.config.get('TOKEN_METRICAS')
+        if token and request.headers.get('Authorization') == f'Bearer {token}':
+            return f(*args, **kwargs)
+        if not current_user.is_authenticated:
+            abort(401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@estado_bp.route('/pool')
+@monitoreo_permitido
+def pool():
+    """
+    Uso del pool de conexiones de este proceso.
+    Con varios workers cada uno responde por su propio pool (ver 'pid').
+    """
+    pool_conexiones = db.engine.pool
+    
+    datos = {
+        'pid': os.getpid(),
+        'pool': type(pool_conexiones).__name__,
+        'estado': pool_conexiones.status()
+    }
+    
+    # QueuePool (PostgreSQL y SQLite en archivo); otros pools no llevan contadores
+    if hasattr(pool_conexiones, 'checkedout'):
+        datos.update({
+            'tamano': pool_conexiones.size(),
+            'en_uso': pool_conexiones.checkedout(),
+            'libres': pool_conexiones.checkedin(),
+            'desborde': max(pool_conexiones.overflow(), 0),
+            # Configurado en opciones_motor_postgres(); None si se usa el de SQLAlchemy
+            'maximo_desborde': current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).get('max_overflow'),
+            'espera_maxima': pool_conexiones.timeout()
+        })
+    
+    return jsonify(datos)
+
+
+def _metricas_pool():
+    """Gauges del pool de conexiones para /metrics"""
+    pool_conexiones = db.engine.pool
+    if not hasattr(pool_conexiones, 'checkedout'):
+        return []
+    return [
+        ('db_pool_size', 'gauge', 'Conexiones del pool', pool_conexiones.size()),
+        ('db_pool_checked_out', 'gauge', 'Conexiones en uso', pool_conexiones.checkedout()),
+        ('db_pool_overflow', 'gauge', 'Conexiones de desborde abiertas', max(pool_conexiones.overflow(), 0)),
+    ]
+
+
+@estado_bp.route('/consultas-lentas')
+@monitoreo_permitido
+def consultas_lentas():
+    """
+    Consultas SQL mas lentas de este proceso desde que arranco, con la ruta,
+    la plantilla y la linea de codigo que las disparo.
+    """
+    instrumentacion = current_app.extensions.get('instrumentacion')
+    if instrumentacion is None:
+        return jsonify({'success': False, 'error': 'Instrumentacion desactivada'}), 404
+    
+    return jsonify({
+        'pid': os.getpid(),
+        'consultas': instrumentacion.consultas_mas_lentas()
+    })
+
+
+@metricas_bp.route('/metrics')
+@monitoreo_permitido
+def metricas():
+    """
+    Metricas de este proceso en el formato de texto de Prometheus:
+    peticiones, duracion, consultas por peticion, tiempo en la base y pool.
+    """
+    instrumentacion = current_app.extensions.get('instrumentacion')
+    if instrumentacion is None:
+        abort(404)
+    
+    return Response(
+        instrumentacion.prometheus(extra=_metricas_pool()),
+        mimetype='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -3,13 +3,18 @@
 Blueprint para el panel de fábrica (operarios).
 """
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, make_response
 from flask_login import login_required, current_user
-from app import db, socketio
+from app import db
 from app.models.pedido import Pedido
 from app.models.cliente import Cliente
 from app.models.usuario import Usuario
 from app.forms.pedido_forms import ActualizarPedidoFabricaForm
+from app.services.dashboard import obtener_fragmento_cliente
+from app.services.tablero import obtener_tablero, etag_pagina, respuesta_sin_cambios, con_etag
+from app.services.listado_pedidos import listar_pedidos
+from app.services.demanda import obtener_demanda
+from app.eventos import campos_modificados, publicar_pedido
 from datetime import datetime
 from functools import wraps
 
@@ -36,59 +41,38 @@ def operario_requerido(f):
 def dashboard():
     """
     Panel principal de la fábrica.
-    Muestra todos los pedidos agrupados por ruta.
+    Muestra todos los pedidos agrupados por ruta (o una sola con ?ruta=...).
     """
     
-    # Obtener todos los clientes que tienen pedidos, agrupados por ruta
-    clientes_con_pedidos = Cliente.query.join(Pedido).filter(
-        Pedido.archivado == False
-    ).distinct().order_by(Cliente.ruta, Cliente.nombre).all()
-    
-    # Agrupar clientes por ruta
-    from collections import defaultdict
-    clientes_por_ruta = defaultdict(list)
-    for cliente in clientes_con_pedidos:
-        clientes_por_ruta[cliente.ruta].append(cliente)
-    
-    # Convertir a dict normal y ordenar rutas
-    clientes_por_ruta = dict(sorted(clientes_por_ruta.items()))
-    
-    # Estadísticas generales
-    total_pendientes = Pedido.query.filter_by(archivado=False, estado='pendiente').count()
-    total_completados = Pedido.query.filter_by(archivado=False, estado='completado').count()
-    total_cancelados = Pedido.query.filter_by(archivado=False, estado='cancelado').count()
-    pedidos_modificados = Pedido.query.filter_by(archivado=False, modificado=True, visto_por_fabrica=False).count()
-    
-    # Pedidos con cambios sin ver
-    pedidos_modificados = Pedido.query.filter_by(modificado=True, visto_por_fabrica=False).count()
-    
-    # Obtener operarios para asignación
-    operarios = Usuario.query.filter_by(rol='operario', activo=True).all()
+    # Tablero compartido en memoria: si el navegador ya tiene esta version, 304
+    ruta = request.args.get('ruta') or None
+    tablero = obtener_tablero()
+    etag = etag_pagina(tablero, 'fabrica', ruta)
+    sin_cambios = respuesta_sin_cambios(etag)
+    if sin_cambios is not None:
+        return sin_cambios
+
+    vista = tablero.vista(ruta=ruta)
+    totales = vista['totales']
     
-    # Calcular notificaciones por ruta
-    notificaciones_por_ruta = {}
-    for ruta in clientes_por_ruta.keys():
-        # Contar pedidos modificados sin ver en esta ruta
-        count = db.session.query(Pedido).join(Cliente).filter(
-            Cliente.ruta == ruta,
-            Pedido.archivado == False,
-            Pedido.modificado == True,
-            Pedido.visto_por_fabrica == False
-        ).count()
-        notificaciones_por_ruta[ruta] = count
+    # Operarios para asignación (tambien en el tablero en memoria)
+    operarios = tablero.operarios
+    html_tablero = tablero.html(('fabrica', ruta), lambda: render_template(
+        'fabrica/_tablero.html', clientes_por_ruta=vista['rutas'], operarios=operarios
+    ))
     
-    return render_template(
+    respuesta = make_response(render_template(
         'fabrica/dashboard.html',
         title='Panel de Fabrica',
-        clientes_por_ruta=clientes_por_ruta,  # <--- CAMBIO: enviar agrupados por ruta
-        notificaciones_por_ruta=notificaciones_por_ruta,  # <--- NUEVO: notificaciones por ruta
-        total_pendientes=total_pendientes,
-        total_completados=total_completados,
-        total_cancelados=total_cancelados,
-        pedidos_modificados=pedidos_modificados,
-        operarios=operarios,
-        Pedido=Pedido
-    )
+        clientes_por_ruta=vista['rutas'],
+        html_tablero=html_tablero,
+        total_pendientes=totales['pendientes'],
+        total_completados=totales['completados'],
+        total_cancelados=totales['cancelados'],
+        pedidos_modificados=totales['modificados'],
+        operarios=operarios
+    ))
+    return con_etag(respuesta, etag)
 
 
 @fabrica_bp.route('/pedido/<int:pedido_id>/actualizar', methods=['GET', 'POST'])
@@ -121,13 +105,14 @@ def actualizar_pedido(pedido_id):
         pedido.visto_por_vendedor = False
         pedido.esperando_contestacion = True
         
+        campos = campos_modificados(pedido)
         db.session.commit()
         
-        # Emitir evento de WebSocket
-        socketio.emit('pedido_actualizado', {
-            'pedido': pedido.to_dict(),
-            'mensaje': f'Pedido #{pedido.id} actualizado'
-        }, namespace='/')
+        # Emitir evento de WebSocket (solo los campos que cambiaron)
+        publicar_pedido(
+            'pedido_actualizado', pedido, campos,
+            mensaje=f'Pedido #{pedido.id} actualizado'
+        )
         
         flash(f'Pedido actualizado a estado: {pedido.estado}', 'success')
         return redirect(url_for('fabrica.dashboard'))
@@ -153,13 +138,11 @@ def marcar_pedido_visto(pedido_id):
     pedido.visto_por_fabrica = True
     pedido.fecha_actualizacion = datetime.utcnow()
     
+    campos = campos_modificados(pedido)
     db.session.commit()
     
     # Emitir evento WebSocket para notificar a ventas
-    socketio.emit('pedido_visto_por_fabrica', {
-        'pedido_id': pedido.id,
-        'pedido': pedido.to_dict()
-    }, namespace='/')
+    publicar_pedido('pedido_visto_por_fabrica', pedido, campos, pedido_id=pedido.id)
     
     return jsonify({
         'success': True,
@@ -171,26 +154,77 @@ def marcar_pedido_visto(pedido_id):
 @operario_requerido
 def obtener_todos_pedidos():
     """
-    API para obtener todos los pedidos en formato JSON.
-    """
+    API: pedidos en formato JSON, de a una pagina (los mas nuevos primero).
     
-    # Filtros opcionales
-    estado = request.args.get('estado')
-    cliente_id = request.args.get('cliente_id', type=int)
+    Filtros: archivado, estado, cliente_id, ruta, operario_id, modificado,
+    desde, hasta. Paginacion: limite y cursor (el 'siguiente' de la
+    respuesta anterior). ?campos=id,estado,... limita las claves de cada pedido.
+    """
+    try:
+        pagina = listar_pedidos(request.args)
+    except ValueError as error:
+        return jsonify({'success': False, 'error': str(error)}), 400
     
-    query = Pedido.query
+    return jsonify(pagina)
+
+
+@fabrica_bp.route('/api/demanda')
+@operario_requerido
+def api_demanda():
+    """
+    API: Lista de produccion, cantidad pendiente por producto y unidad.
+    Con ?ruta=... solo esa ruta; con ?por_ruta=1 una linea por ruta.
+    """
+    ruta = request.args.get('ruta') or None
+    por_ruta = request.args.get('por_ruta', '').lower() in ('1', 'true', 'si')
     
-    if estado:
-        query = query.filter_by(estado=estado)
+    return jsonify({
+        'productos': obtener_demanda(ruta=ruta, por_ruta=por_ruta),
+        'ruta': ruta
+    })
+
+
+@fabrica_bp.route('/api/cliente/<int:cliente_id>/fragmento')
+@operario_requerido
+def api_cliente_fragmento(cliente_id):
+    """
+    API: Tarjeta de un cliente ya renderizada, mas los contadores de su ruta
+    y los totales. El dashboard la usa para actualizarse sin recargar.
+    Con ?con_ruta=1 tambien devuelve la ruta completa (cuando no esta en pantalla).
+    """
+    fragmento = obtener_fragmento_cliente(cliente_id)
+    if fragmento is None:
+        abort(404)
     
-    if cliente_id:
-        query = query.filter_by(cliente_id=cliente_id)
+    cliente = fragmento['cliente']
+    item = fragmento['item']
+    ruta = fragmento['ruta']
+    operarios = Usuario.query.filter_by(rol='operario', activo=True).all()
     
-    pedidos = query.order_by(Pedido.fecha_creacion.desc()).all()
+    html = html_ruta = None
+    if item:
+        html = render_template('fabrica/_cliente.html', item=item, operarios=operarios, indice_ruta='')
+        if request.args.get('con_ruta', type=int):
+            html_ruta = render_template(
+                'fabrica/_ruta.html',
+                ruta=cliente.ruta,
+                grupo={'clientes': [item], 'contadores': ruta['contadores']},
+                operarios=operarios,
+                indice_ruta=f'Nueva{cliente.id}'
+            )
     
     return jsonify({
-        'pedidos': [p.to_dict() for p in pedidos],
-        'total': len(pedidos)
+        'cliente_id': cliente.id,
+        'ruta': cliente.ruta,
+        'html': html,
+        'html_ruta': html_ruta,
+        'html_badges_ruta': render_template(
+            'fabrica/_badges_ruta.html',
+            total_clientes=ruta['total_clientes'],
+            contadores=ruta['contadores']
+        ),
+        'clientes_en_ruta': ruta['total_clientes'],
+        'totales': fragmento['totales']
     })
 
 
@@ -213,14 +247,13 @@ def asignar_operario(pedido_id):
     else:
         pedido.operario_id = None
     
+    campos = campos_modificados(pedido)
     db.session.commit()
     
-    # Emitir evento
-    socketio.emit('pedido_asignado', {
-        'pedido': pedido.to_dict()
-    }, namespace='/')
+    # Emitir evento (se serializa una sola vez, también para la respuesta)
+    datos = publicar_pedido('pedido_asignado', pedido, campos)
     
-    return jsonify({'success': True, 'pedido': pedido.to_dict()})
+    return jsonify({'success': True, 'pedido': datos})
 
 @fabrica_bp.route('/pedido/<int:pedido_id>/actualizar-estado-rapido', methods=['POST'])
 @operario_requerido
@@ -256,14 +289,13 @@ def actualizar_estado_rapido(pedido_id):
 
     
     
+    campos = campos_modificados(pedido)
     db.session.commit()
     
-    # Emitir evento de WebSocket
-    socketio.emit('pedido_actualizado', {
-        'pedido': pedido.to_dict()
-    }, namespace='/')
+    # Emitir evento de WebSocket (se serializa una sola vez, también para la respuesta)
+    datos = publicar_pedido('pedido_actualizado', pedido, campos)
     
     return jsonify({
         'success': True,
-        'pedido': pedido.to_dict()
+        'pedido': datos
     })
\ No newline at end of file
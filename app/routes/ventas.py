@@ -3,16 +3,38 @@
 Blueprint para el panel de ventas (vendedores).
 """
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort,
+    Response, stream_with_context, make_response
+)
 from flask_login import login_required, current_user
-from app import db, socketio
+from app import db
 from app.models.cliente import Cliente
 from app.models.pedido import Pedido
 from app.models.producto import Producto
 from app.forms.cliente_forms import ClienteForm
 from app.forms.pedido_forms import PedidoForm, EditarPedidoForm
+from app.forms.importacion_forms import ImportarCSVForm
+from app.services.dashboard import obtener_fragmento_cliente
+from app.services.tablero import obtener_tablero, etag_pagina, respuesta_sin_cambios, con_etag
+from app.services.serializacion import serializar_pedidos, serializar_clientes
+from app.services.semanas import (
+    cerrar_semana as cerrar_semana_pedidos, obtener_historial, obtener_semana, obtener_resumenes
+)
+from app.services.purga import purgar_pedidos_antiguos
+from app.services.cache_semanas import pagina_semana, version_semana, etag_semana
+from app.services.pedidos import crear_pedidos
+from app.services.productos import sugerir_productos, producto_del_nombre, productos_de_nombres
+from app.services.busqueda_clientes import buscar_clientes
+from app.services.exportacion import FORMATOS, generar_exportacion, nombre_archivo
+from app.services.importacion import importar_csv
+from app.eventos import (
+    campos_modificados, publicar_pedido, serializar_pedidos_creados, publicar_pedidos_creados,
+    publicar_eliminado, publicar_general
+)
 from datetime import datetime
 from functools import wraps
+import io
 
 # Crear el Blueprint
 ventas_bp = Blueprint('ventas', __name__)
@@ -38,47 +60,35 @@ def dashboard():
     """
     Panel principal del vendedor.
     Muestra TODOS los clientes con sus pedidos agrupados por ruta (unificado para todos los vendedores).
+    Con ?ruta=... muestra una sola ruta.
     """
     
-    # Obtener TODOS los clientes activos (sin filtrar por vendedor)
-    clientes = Cliente.query.join(Pedido).filter(
-        Cliente.activo == True,
-        Pedido.archivado == False
-    ).distinct().order_by(Cliente.ruta, Cliente.nombre).all()
-    
-    # Agrupar clientes por ruta
-    from collections import defaultdict
-    clientes_por_ruta = defaultdict(list)
-    for cliente in clientes:
-        clientes_por_ruta[cliente.ruta].append(cliente)
-    
-    # Convertir a dict normal y ordenar rutas
-    clientes_por_ruta = dict(sorted(clientes_por_ruta.items()))
-    
-    # Estadísticas rápidas
-    total_clientes = len(clientes)
-    total_pedidos = Pedido.query.filter_by(archivado=False).count()
-    pedidos_pendientes = Pedido.query.filter_by(archivado=False, estado='pendiente').count()
-    pedidos_completados = Pedido.query.filter_by(archivado=False, estado='completado').count()
-    
-    # Contar notificaciones sin leer
-    pedidos_no_leidos = Pedido.query.filter(
-        Pedido.archivado == False,
-        Pedido.observaciones_fabrica.isnot(None),
-        Pedido.visto_por_vendedor == False
-    ).count()
+    # Tablero compartido en memoria: si el navegador ya tiene esta version, 304
+    ruta = request.args.get('ruta') or None
+    tablero = obtener_tablero()
+    etag = etag_pagina(tablero, 'ventas', ruta)
+    sin_cambios = respuesta_sin_cambios(etag)
+    if sin_cambios is not None:
+        return sin_cambios
+
+    vista = tablero.vista(solo_clientes_activos=True, ruta=ruta)
+    totales = vista['totales']
+    html_tablero = tablero.html(('ventas', ruta), lambda: render_template(
+        'ventas/_tablero.html', clientes_por_ruta=vista['rutas']
+    ))
     
-    return render_template(
+    respuesta = make_response(render_template(
         'ventas/dashboard.html',
         title='Panel de Ventas',
-        clientes_por_ruta=clientes_por_ruta,  # <--- CAMBIO: enviar agrupados por ruta
-        total_clientes=total_clientes,
-        total_pedidos=total_pedidos,
-        pedidos_pendientes=pedidos_pendientes,
-        pedidos_completados=pedidos_completados,
-        pedidos_no_leidos=pedidos_no_leidos,
-        Pedido=Pedido
-    )
+        clientes_por_ruta=vista['rutas'],
+        html_tablero=html_tablero,
+        total_clientes=vista['total_clientes'],
+        total_pedidos=totales['total'],
+        pedidos_pendientes=totales['pendientes'],
+        pedidos_completados=totales['completados'],
+        pedidos_no_leidos=totales['no_leidos']
+    ))
+    return con_etag(respuesta, etag)
 
 
 @ventas_bp.route('/cliente/nuevo', methods=['GET', 'POST'])
@@ -156,12 +166,12 @@ def nuevo_pedido():
     form = PedidoForm()
     
     if request.method == 'POST':
-        # Validar cliente
-        cliente_id = request.form.get('cliente_id', type=int)
-        
-        if not cliente_id or cliente_id == 0:
-            flash('Debes seleccionar un cliente', 'danger')
+        # Validar cliente (una consulta por clave primaria)
+        if not form.validate():
+            for errores in form.errors.values():
+                flash(errores[0], 'danger')
             return render_template('ventas/pedido_form.html', form=form, title='Nuevo Pedido', accion='Crear')
+        cliente_id = form.cliente_id.data
         
         # Obtener arrays de datos
         productos = request.form.getlist('productos[]')
@@ -176,8 +186,9 @@ def nuevo_pedido():
             flash('Debes agregar al menos un pedido con producto', 'warning')
             return render_template('ventas/pedido_form.html', form=form, title='Nuevo Pedido', accion='Crear')
         
-        # Crear múltiples pedidos
-        pedidos_creados = []
+        # Armar las líneas del pedido (los productos del catalogo, de una vez)
+        lineas = []
+        ids_productos = productos_de_nombres(productos_validos)
         
         for i in range(len(productos)):
             if productos[i] and productos[i].strip():  # Solo si hay producto
@@ -186,37 +197,30 @@ def nuevo_pedido():
                     unidad = unidades[i] if i < len(unidades) else 'unidades'
                     nota = notas[i] if i < len(notas) and notas[i] else None
                     
-                    pedido = Pedido(
-                        cliente_id=cliente_id,
-                        producto_nombre=productos[i].strip(),
-                        cantidad=cantidad,
-                        unidad=unidad,
-                        estado='pendiente',
-                        notas_vendedor=nota,
-                        modificado=False,
-                        visto_por_fabrica=False,
-                        esperando_contestacion=False
-                    )
-                    db.session.add(pedido)
-                    pedidos_creados.append(pedido)
+                    lineas.append({
+                        'producto_nombre': productos[i].strip(),
+                        'producto_id': ids_productos[productos[i]],
+                        'cantidad': cantidad,
+                        'unidad': unidad,
+                        'notas_vendedor': nota
+                    })
                     
                 except Exception as e:
                     flash(f'Error en pedido #{i+1}: {str(e)}', 'danger')
                     db.session.rollback()
                     return render_template('ventas/pedido_form.html', form=form, title='Nuevo Pedido', accion='Crear')
         
-        # Guardar todos los pedidos
+        # Guardar todos los pedidos (un solo INSERT para todas las líneas)
         try:
+            pedidos_creados = crear_pedidos(cliente_id, lineas)
+            cliente = form.cliente
+            datos = serializar_pedidos_creados(cliente, pedidos_creados)
             db.session.commit()
             
-            # Emitir eventos de WebSocket para cada pedido
-            for pedido in pedidos_creados:
-                socketio.emit('nuevo_pedido', {
-                    'pedido': pedido.to_dict()
-                }, namespace='/')
-            
             total_pedidos = len(pedidos_creados)
-            cliente = Cliente.query.get(cliente_id)
+            
+            # Un solo evento de WebSocket con todas las líneas
+            publicar_pedidos_creados(cliente, datos)
             
             flash(f'✅ Se crearon {total_pedidos} pedido(s) para {cliente.nombre}', 'success')
             return redirect(url_for('ventas.dashboard'))
@@ -246,10 +250,11 @@ def editar_pedido(pedido_id):
     # Guardar valores anteriores para detectar cambios
     notas_anteriores = pedido.notas_vendedor
     
-    form = PedidoForm(obj=pedido)
+    form = EditarPedidoForm(obj=pedido)
     
     if form.validate_on_submit():
         pedido.producto_nombre = form.producto_nombre.data
+        pedido.producto_id = producto_del_nombre(form.producto_nombre.data)
         pedido.cantidad = form.cantidad.data
         pedido.unidad = form.unidad.data
         pedido.notas_vendedor = form.notas_vendedor.data
@@ -264,12 +269,11 @@ def editar_pedido(pedido_id):
         
         pedido.fecha_actualizacion = datetime.utcnow()
         
+        campos = campos_modificados(pedido)
         db.session.commit()
         
-        # Emitir evento de WebSocket
-        socketio.emit('pedido_modificado', {
-            'pedido': pedido.to_dict()
-        }, namespace='/')
+        # Emitir evento de WebSocket (solo los campos que cambiaron)
+        publicar_pedido('pedido_modificado', pedido, campos)
         
         flash('Pedido actualizado correctamente', 'success')
         return redirect(url_for('ventas.dashboard'))
@@ -295,7 +299,8 @@ def eliminar_pedido(pedido_id):
     pedido_info = {
         'id': pedido.id,
         'producto_nombre': pedido.producto_nombre,
-        'cliente_id': pedido.cliente_id
+        'cliente_id': pedido.cliente_id,
+        'ruta': pedido.cliente.ruta
     }
     
     # Eliminar el pedido
@@ -303,10 +308,7 @@ def eliminar_pedido(pedido_id):
     db.session.commit()
     
     # Emitir evento WebSocket
-    socketio.emit('pedido_eliminado', {
-        'pedido_id': pedido_info['id'],
-        'cliente_id': pedido_info['cliente_id']
-    }, namespace='/')
+    publicar_eliminado(pedido_info['id'], pedido_info['cliente_id'], pedido_info['ruta'])
     
     flash(f'Pedido eliminado correctamente', 'success')
     return redirect(url_for('ventas.dashboard'))
@@ -333,57 +335,24 @@ def cerrar_semana():
     """
     Cierra la semana actual archivando todos los pedidos activos.
     """
-    from datetime import datetime
-    
-    # Generar nombre de semana (Ej: "Semana 2026-1F")
-    fecha_actual = datetime.utcnow()
-
-    # Obtener mes
-    mes_numero = fecha_actual.month
-    meses_letras = {
-        1: 'E',   # Enero
-        2: 'F',   # Febrero
-        3: 'M',   # Marzo
-        4: 'A',   # Abril
-        5: 'MY',  # Mayo
-        6: 'JN',  # Junio
-        7: 'JL',  # Julio
-        8: 'AG',  # Agosto
-        9: 'S',   # Septiembre
-        10: 'O',  # Octubre
-        11: 'N',  # Noviembre
-        12: 'D'   # Diciembre
-    }
-    mes_letra = meses_letras[mes_numero]
-
-    # Calcular número de semana dentro del mes
-    dia_del_mes = fecha_actual.day
-    numero_semana_mes = ((dia_del_mes - 1) // 7) + 1
-
-    # Formato: Semana YYYY-#L (ej: Semana 2026-1F)
-    nombre_semana = f"Semana {fecha_actual.year}-{numero_semana_mes}{mes_letra}"
+    resultado = cerrar_semana_pedidos()
+    nombre_semana = resultado['semana']
+    total_archivados = resultado['total_archivados']
     
-    # Obtener todos los pedidos no archivados
-    pedidos_activos = Pedido.query.filter_by(archivado=False).all()
+    if resultado['duplicado']:
+        flash('La semana ya se cerró y no hay pedidos nuevos para archivar', 'info')
+        return redirect(url_for('ventas.dashboard'))
     
-    if not pedidos_activos:
+    if not total_archivados:
         flash('No hay pedidos activos para archivar', 'warning')
         return redirect(url_for('ventas.dashboard'))
     
-    # Archivar todos los pedidos
-    total_archivados = 0
-    for pedido in pedidos_activos:
-        pedido.archivar(nombre_semana)
-        total_archivados += 1
-    
-    db.session.commit()
-    
     # Emitir evento de WebSocket para notificar a fábrica
-    socketio.emit('semana_cerrada', {
+    publicar_general('semana_cerrada', {
         'semana': nombre_semana,
         'total_archivados': total_archivados,
         'mensaje': f'Se archivaron {total_archivados} pedidos de {nombre_semana}'
-    }, namespace='/')
+    })
     
     flash(f'✅ Semana cerrada: {total_archivados} pedidos archivados en "{nombre_semana}"', 'success')
     return redirect(url_for('ventas.dashboard'))
@@ -395,26 +364,15 @@ def historial_semanas():
     """
     Muestra el historial de semanas cerradas.
     """
-    from datetime import datetime
-    
     # Obtener semanas únicas de pedidos archivados
-    semanas = db.session.query(
-        Pedido.semana_archivado,
-        db.func.count(Pedido.id).label('total_pedidos'),
-        db.func.min(Pedido.fecha_archivado).label('fecha')
-    ).filter(
-        Pedido.archivado == True
-    ).group_by(
-        Pedido.semana_archivado
-    ).order_by(
-        db.desc('fecha')
-    ).all()
+    semanas = obtener_historial()
     
     return render_template(
         'ventas/historial_semanas.html',
         title='Historial de Semanas',
         semanas=semanas,
-        now=datetime.utcnow()  # <--- AGREGAR ESTO
+        now=datetime.utcnow(),  # <--- AGREGAR ESTO
+        dias_retencion=current_app.config['DIAS_RETENCION_ARCHIVO']
     )
 
 
@@ -424,72 +382,153 @@ def ver_semana(semana):
     """
     Ver los pedidos de una semana archivada específica.
     """
-    # Obtener pedidos de esa semana agrupados por ruta
-    clientes_con_pedidos = Cliente.query.join(Pedido).filter(
-        Pedido.semana_archivado == semana
-    ).distinct().order_by(Cliente.ruta, Cliente.nombre).all()
-    
-    # Agrupar por ruta
-    from collections import defaultdict
-    clientes_por_ruta = defaultdict(list)
-    for cliente in clientes_con_pedidos:
-        clientes_por_ruta[cliente.ruta].append(cliente)
-    
-    clientes_por_ruta = dict(sorted(clientes_por_ruta.items()))
-    
-    return render_template(
+    # Pedidos de esa semana agrupados por ruta, renderizados una sola vez
+    def generar():
+        clientes_por_ruta = obtener_semana(semana)
+        if not clientes_por_ruta:
+            return None
+        return render_template('ventas/_semana.html', clientes_por_ruta=clientes_por_ruta)
+
+    # Si el navegador ya tiene la pagina guardada, 304 sin generarla
+    sin_cambios = respuesta_sin_cambios(etag_semana(semana, version_semana(semana)))
+    if sin_cambios is not None:
+        return sin_cambios
+
+    html_semana, version = pagina_semana(semana, generar)
+
+    respuesta = make_response(render_template(
         'ventas/ver_semana.html',
         title=f'Pedidos de {semana}',
         semana=semana,
-        clientes_por_ruta=clientes_por_ruta,
-        Pedido=Pedido
+        html_semana=html_semana or render_template('ventas/_semana.html', clientes_por_ruta={})
+    ))
+    return con_etag(respuesta, etag_semana(semana, version))
+
+@ventas_bp.route('/importar', methods=['GET', 'POST'])
+@vendedor_requerido
+def importar():
+    """
+    Importacion masiva de clientes o pedidos desde un CSV.
+    Las filas con errores se muestran y no frenan la importacion del resto.
+    """
+    form = ImportarCSVForm()
+    resultado = None
+
+    if form.validate_on_submit():
+        archivo = io.TextIOWrapper(form.archivo.data.stream, encoding='utf-8-sig', newline='')
+        try:
+            resultado = importar_csv(
+                form.tipo.data, archivo,
+                creado_por_id=current_user.id,
+                simular=form.simular.data
+            )
+        except UnicodeDecodeError:
+            flash('El archivo debe estar codificado en UTF-8', 'danger')
+        except ValueError as e:
+            flash(str(e), 'danger')
+        else:
+            if form.simular.data:
+                flash(f"Validación: {resultado['importadas']} de {resultado['leidas']} filas son válidas", 'info')
+            elif resultado['importadas']:
+                flash(f"✅ Se importaron {resultado['importadas']} {resultado['tipo']}", 'success')
+            else:
+                flash('No se importó ninguna fila', 'warning')
+
+    return render_template(
+        'ventas/importar.html',
+        form=form,
+        title='Importar CSV',
+        resultado=resultado
+    )
+
+
+@ventas_bp.route('/exportar/pedidos')
+@vendedor_requerido
+def exportar_pedidos():
+    """
+    Descarga de pedidos en CSV o NDJSON (?formato=csv|ndjson), con los
+    filtros de /fabrica/api/pedidos: semana, desde, hasta, archivado, ruta...
+    El archivo se envia a medida que se lee de la base.
+    """
+    formato = request.args.get('formato', 'csv')
+
+    try:
+        generador = generar_exportacion(formato, request.args)
+        archivo = nombre_archivo(formato, request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    respuesta = Response(
+        stream_with_context(generador),
+        mimetype=FORMATOS[formato],
+        # Que nginx no acumule la respuesta antes de enviarla
+        headers={'X-Accel-Buffering': 'no'}
     )
+    # Werkzeug cita el nombre (RFC 6266) y agrega filename* si no es ASCII
+    respuesta.headers.set('Content-Disposition', 'attachment', filename=archivo)
+    return respuesta
+
 
 @ventas_bp.route('/limpiar-pedidos-antiguos', methods=['POST'])
 @vendedor_requerido
 def limpiar_pedidos_antiguos():
     """
-    Elimina pedidos archivados de más de 30 días.
+    Elimina pedidos archivados más antiguos que el período de retención.
     Esta acción la ejecuta manualmente el usuario.
     """
-    from datetime import timedelta
-    
-    # Calcular fecha límite (hace 30 días)
-    fecha_limite = datetime.utcnow() - timedelta(days=30)
-    
-    # Buscar pedidos archivados hace más de 30 días
-    pedidos_antiguos = Pedido.query.filter(
-        Pedido.archivado == True,
-        Pedido.fecha_archivado < fecha_limite
-    ).all()
+    resultado = purgar_pedidos_antiguos()
     
-    if not pedidos_antiguos:
-        flash('No hay pedidos antiguos para eliminar (mayores a 30 días)', 'info')
+    if not resultado['total']:
+        flash(f'No hay pedidos antiguos para eliminar (mayores a {current_app.config["DIAS_RETENCION_ARCHIVO"]} días)', 'info')
         return redirect(url_for('ventas.historial_semanas'))
     
-    # Contar por semana
-    semanas_afectadas = {}
-    for pedido in pedidos_antiguos:
-        semana = pedido.semana_archivado or "Sin semana"
-        if semana not in semanas_afectadas:
-            semanas_afectadas[semana] = 0
-        semanas_afectadas[semana] += 1
-    
-    total_eliminados = len(pedidos_antiguos)
-    
-    # Eliminar pedidos
-    for pedido in pedidos_antiguos:
-        db.session.delete(pedido)
-    
-    db.session.commit()
-    
     # Crear mensaje detallado
-    mensaje_detalle = f"Se eliminaron {total_eliminados} pedidos antiguos: "
-    mensaje_detalle += ", ".join([f"{sem} ({cant})" for sem, cant in semanas_afectadas.items()])
+    mensaje_detalle = f"Se eliminaron {resultado['total_eliminados']} pedidos antiguos: "
+    mensaje_detalle += ", ".join([f"{sem} ({cant})" for sem, cant in resultado['semanas'].items()])
     
     flash(f'✅ {mensaje_detalle}', 'success')
     return redirect(url_for('ventas.historial_semanas'))
 
+@ventas_bp.route('/api/semanas')
+@vendedor_requerido
+def api_semanas():
+    """
+    API: Resumen de cada semana cerrada (por estado, ruta y producto),
+    para reportes semanales.
+    """
+    return jsonify({'semanas': [resumen.to_dict() for resumen in obtener_resumenes()]})
+
+
+@ventas_bp.route('/api/productos/sugerencias')
+@vendedor_requerido
+def api_sugerencias_productos():
+    """
+    API: Sugerencias de producto para lo que se esta escribiendo (?q=...).
+    Primero los del catalogo, despues los nombres mas pedidos.
+    """
+    try:
+        limite = min(max(int(request.args.get('limite', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limite debe ser un numero'}), 400
+    
+    return jsonify({'sugerencias': sugerir_productos(request.args.get('q', ''), limite)})
+
+
+@ventas_bp.route('/api/clientes/buscar')
+@vendedor_requerido
+def api_buscar_clientes():
+    """
+    API: Clientes activos cuyo nombre contiene lo escrito (?q=...),
+    con los datos que muestra el formulario de pedidos.
+    """
+    try:
+        limite = min(max(int(request.args.get('limite', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limite debe ser un numero'}), 400
+    
+    return jsonify({'clientes': buscar_clientes(request.args.get('q', ''), limite)})
+
+
 @ventas_bp.route('/api/cliente/<int:cliente_id>/info')
 @vendedor_requerido
 def api_cliente_info(cliente_id):
@@ -519,6 +558,48 @@ def api_cliente_pedidos(cliente_id):
     pedidos = Pedido.query.filter_by(cliente_id=cliente_id).order_by(Pedido.fecha_creacion.desc()).all()
     
     return jsonify({
-        'cliente': cliente.to_dict(),
-        'pedidos': [p.to_dict() for p in pedidos]
-    })
\ No newline at end of file
+        'cliente': serializar_clientes([cliente])[0],
+        'pedidos': serializar_pedidos(pedidos)
+    })
+
+
+@ventas_bp.route('/api/cliente/<int:cliente_id>/fragmento')
+@vendedor_requerido
+def api_cliente_fragmento(cliente_id):
+    """
+    API: Tarjeta de un cliente ya renderizada, mas los contadores de su ruta
+    y los totales. El dashboard la usa para actualizarse sin recargar.
+    Con ?con_ruta=1 tambien devuelve la ruta completa (cuando no esta en pantalla).
+    """
+    fragmento = obtener_fragmento_cliente(cliente_id, solo_clientes_activos=True)
+    if fragmento is None:
+        abort(404)
+    
+    cliente = fragmento['cliente']
+    item = fragmento['item']
+    ruta = fragmento['ruta']
+    
+    html = html_ruta = None
+    if item:
+        html = render_template('ventas/_cliente.html', item=item, indice_ruta='')
+        if request.args.get('con_ruta', type=int):
+            html_ruta = render_template(
+                'ventas/_ruta.html',
+                ruta=cliente.ruta,
+                grupo={'clientes': [item], 'contadores': ruta['contadores']},
+                indice_ruta=f'Nueva{cliente.id}'
+            )
+    
+    return jsonify({
+        'cliente_id': cliente.id,
+        'ruta': cliente.ruta,
+        'html': html,
+        'html_ruta': html_ruta,
+        'html_badges_ruta': render_template(
+            'ventas/_badges_ruta.html',
+            total_clientes=ruta['total_clientes'],
+            contadores=ruta['contadores']
+        ),
+        'clientes_en_ruta': ruta['total_clientes'],
+        'totales': fragmento['totales']
+    })
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Servicios de la aplicacion.
+Logica de consulta y procesos que comparten varias rutas.
+"""
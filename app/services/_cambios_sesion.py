@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Cambios de la transaccion para las caches en memoria.
+
+Varias caches (contadores, tablero, demanda, productos, busqueda de
+clientes) se mantienen igual: al hacer flush anotan en session.info lo que
+cambio, al confirmar lo aplican y si hay rollback lo descartan. Este modulo
+tiene esos tres listeners una sola vez; cada cache se registra con
+registrar_cache y solo aporta como anotar y como aplicar.
+"""
+
+from sqlalchemy import event
+from app import db
+
+
+# (clave de session.info, al_flush, al_confirmar) de cada cache registrada
+_caches = []
+
+
+def registrar_cache(nombre, vacios, al_flush=None, al_confirmar=None):
+    """
+    Registra una cache que se mantiene con los cambios de cada transaccion.
+
+    Args:
+        nombre: Nombre de la cache (clave en session.info)
+        vacios: Funcion que crea los cambios pendientes de una transaccion
+        al_flush: al_flush(session), anota los cambios del flush
+        al_confirmar: al_confirmar(pendientes), aplica los cambios confirmados
+
+    Returns:
+        Funcion pendientes(session=None) con los cambios de la transaccion
+        actual (para anotar cambios que no pasan por el flush).
+    """
+    clave = f'{nombre}_pendientes'
+
+    def pendientes(session=None):
+        session = session if session is not None else db.session
+        cambios = session.info.get(clave)
+        if cambios is None:
+            cambios = session.info[clave] = vacios()
+        return cambios
+
+    _caches.append((clave, al_flush, al_confirmar))
+    return pendientes
+
+
+@event.listens_for(db.session, 'after_flush')
+def _anotar_flush(session, flush_context):
+    """Cada cache anota los cambios del flush (el historial de atributos todavia esta)"""
+    for _, al_flush, _ in _caches:
+        if al_flush is not None:
+            al_flush(session)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _aplicar_confirmados(session):
+    """Aplica los cambios de la transaccion confirmada en cada cache"""
+    confirmados = [
+        (al_confirmar, session.info.pop(clave, None)) for clave, _, al_confirmar in _caches
+    ]
+    for al_confirmar, pendientes in confirmados:
+        if pendientes is not None and al_confirmar is not None:
+            al_confirmar(pendientes)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _descartar(session, transaction):
+    """Rollback (o sesion cerrada sin commit): los cambios no se aplican"""
+    if transaction.parent is None:
+        for clave, _, _ in _caches:
+            session.info.pop(clave, None)
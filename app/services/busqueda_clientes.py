@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Busqueda de clientes activos mientras se escribe (carga de pedidos).
+
+Un cliente coincide si cada palabra buscada aparece en su nombre, sin
+distinguir mayusculas, acentos ni espacios (app.utils.normalizar). Primero
+los nombres que empiezan con el texto, despues los que tienen palabras que
+empiezan con cada palabra buscada y al final el resto.
+
+En PostgreSQL, si la migracion pudo instalar pg_trgm y unaccent, se busca
+en la base con el indice GIN de trigramas sobre f_unaccent(lower(nombre))
+(se comprueba cada BUSQUEDA_CLIENTES_TTL segundos).
+Si no (SQLite, o sin permisos para crear extensiones) se usa un indice en
+memoria del proceso, mantenido como el de productos: los cambios de
+clientes se aplican al confirmar y cada BUSQUEDA_CLIENTES_TTL segundos se
+reconstruye desde la base (cambios de otros procesos).
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import and_, case, func, inspect, or_, text
+from app import db
+from app.models.cliente import Cliente
+from app.services._cambios_sesion import registrar_cache
+from app.utils import normalizar
+
+
+CAMPOS = ('id', 'nombre', 'ruta', 'telefono', 'activo')
+
+_estado = {'indice': None, 'vence': 0.0, 'trigramas_en_base': False, 'trigramas_vence': 0.0}
+_candado = threading.Lock()
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceClientes:
+    """Clientes activos, buscables por prefijo de palabra y por trigramas"""
+
+    def __init__(self):
+        self.clientes = {}                   # id -> {'id', 'nombre', 'ruta', 'telefono', 'clave'}
+        self._palabras = []                  # (palabra, id), ordenada
+        self._trigramas = defaultdict(set)   # trigrama -> ids
+
+    def poner(self, cliente_id, nombre, ruta, telefono):
+        self.quitar(cliente_id)
+        clave = normalizar(nombre)
+        self.clientes[cliente_id] = {
+            'id': cliente_id, 'nombre': nombre, 'ruta': ruta, 'telefono': telefono, 'clave': clave
+        }
+        for palabra in set(clave.split()):
+            insort(self._palabras, (palabra, cliente_id))
+        for trigrama in _trigramas(clave):
+            self._trigramas[trigrama].add(cliente_id)
+
+    def quitar(self, cliente_id):
+        cliente = self.clientes.pop(cliente_id, None)
+        if cliente is None:
+            return
+        for palabra in set(cliente['clave'].split()):
+            posicion = bisect_left(self._palabras, (palabra, cliente_id))
+            if posicion < len(self._palabras) and self._palabras[posicion] == (palabra, cliente_id):
+                del self._palabras[posicion]
+        for trigrama in _trigramas(cliente['clave']):
+            ids = self._trigramas.get(trigrama)
+            if ids is not None:
+                ids.discard(cliente_id)
+                if not ids:
+                    del self._trigramas[trigrama]
+
+    def _por_prefijo(self, palabra):
+        ids = set()
+        posicion = bisect_left(self._palabras, (palabra, 0))
+        while posicion < len(self._palabras) and self._palabras[posicion][0].startswith(palabra):
+            ids.add(self._palabras[posicion][1])
+            posicion += 1
+        return ids
+
+    def _por_subcadena(self, palabra):
+        """Ids cuyo nombre contiene `palabra` (con 3 letras o mas, via trigramas)"""
+        if len(palabra) < 3:
+            return set()
+        grupos = sorted((self._trigramas.get(trigrama, set()) for trigrama in _trigramas(palabra)), key=len)
+        ids = set(grupos[0]).intersection(*grupos[1:])
+        return {cliente_id for cliente_id in ids if palabra in self.clientes[cliente_id]['clave']}
+
+    def buscar(self, consulta, limite):
+        palabras = consulta.split()
+        grupos = {}
+        prefijos = None
+        coincidentes = None
+        for palabra in palabras:
+            por_prefijo = self._por_prefijo(palabra)
+            prefijos = por_prefijo if prefijos is None else prefijos & por_prefijo
+            ids = por_prefijo | self._por_subcadena(palabra)
+            coincidentes = ids if coincidentes is None else coincidentes & ids
+
+        for cliente_id in coincidentes:
+            clave = self.clientes[cliente_id]['clave']
+            grupos[cliente_id] = 0 if clave.startswith(consulta) else 1 if cliente_id in prefijos else 2
+
+        ids = sorted(grupos, key=lambda cliente_id: (
+            grupos[cliente_id], self.clientes[cliente_id]['clave'], self.clientes[cliente_id]['ruta']
+        ))
+        return [
+            {campo: self.clientes[cliente_id][campo] for campo in ('id', 'nombre', 'ruta', 'telefono')}
+            for cliente_id in ids[:limite]
+        ]
+
+
+# ============================================================
+# BUSQUEDA
+# ============================================================
+
+def _trigramas_en_base():
+    """
+    True si la base es PostgreSQL con pg_trgm y f_unaccent. Se vuelve a
+    consultar cada BUSQUEDA_CLIENTES_TTL segundos (una migracion aplicada
+    con la app andando, o extensiones borradas).
+    """
+    if _estado['trigramas_vence'] <= time.monotonic():
+        disponible = False
+        if db.engine.dialect.name == 'postgresql':
+            disponible = bool(db.session.execute(text(
+                "SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL "
+                "AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+            )).scalar())
+        with _candado:
+            _estado['trigramas_en_base'] = disponible
+            _estado['trigramas_vence'] = time.monotonic() + current_app.config['BUSQUEDA_CLIENTES_TTL']
+            if disponible:
+                _estado['indice'] = None  # Ya no hace falta el indice en memoria
+    return _estado['trigramas_en_base']
+
+
+def _buscar_en_base(consulta, limite):
+    """Busqueda con el indice de trigramas de PostgreSQL"""
+    nombre = func.f_unaccent(func.lower(Cliente.nombre))
+    escapar = lambda texto: texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    palabras = [escapar(palabra) for palabra in consulta.split()]
+
+    orden = case(
+        (nombre.like(escapar(consulta) + '%', escape='\\'), 0),
+        (and_(*[
+            or_(nombre.like(f'{palabra}%', escape='\\'), nombre.like(f'% {palabra}%', escape='\\'))
+            for palabra in palabras
+        ]), 1),
+        else_=2
+    )
+    filas = db.session.query(
+        Cliente.id, Cliente.nombre, Cliente.ruta, Cliente.telefono
+    ).filter(
+        Cliente.activo == True,
+        *[nombre.like(f'%{palabra}%', escape='\\') for palabra in palabras]
+    ).order_by(orden, nombre, Cliente.ruta).limit(limite)
+
+    return [
+        {'id': cliente_id, 'nombre': nombre_cliente, 'ruta': ruta, 'telefono': telefono}
+        for cliente_id, nombre_cliente, ruta, telefono in filas
+    ]
+
+
+def construir_indice():
+    """Indice en memoria con todos los clientes activos"""
+    indice = IndiceClientes()
+    filas = db.session.query(Cliente.id, Cliente.nombre, Cliente.ruta, Cliente.telefono).filter(
+        Cliente.activo == True
+    )
+    for cliente_id, nombre, ruta, telefono in filas:
+        indice.poner(cliente_id, nombre, ruta, telefono)
+    return indice
+
+
+def _indice():
+    """Indice vigente (se reconstruye si vencio)"""
+    with _candado:
+        if _estado['indice'] is not None and _estado['vence'] > time.monotonic():
+            return _estado['indice']
+
+    indice = construir_indice()
+    with _candado:
+        _estado['indice'] = indice
+        _estado['vence'] = time.monotonic() + current_app.config['BUSQUEDA_CLIENTES_TTL']
+    return indice
+
+
+def buscar_clientes(texto, limite=10):
+    """
+    Clientes activos cuyo nombre contiene lo escrito.
+
+    Returns:
+        Lista de {'id', 'nombre', 'ruta', 'telefono'}; vacia si no hay texto
+    """
+    consulta = normalizar(texto)
+    if not consulta:
+        return []
+    if _trigramas_en_base():
+        return _buscar_en_base(consulta, limite)
+
+    indice = _indice()
+    with _candado:
+        return indice.buscar(consulta, limite)
+
+
+def invalidar_busqueda_clientes():
+    """El indice se reconstruye despues de confirmar (importacion de clientes)"""
+    _pendientes()['invalidar'] = True
+
+
+# ============================================================
+# CAMBIOS DE CLIENTES
+# ============================================================
+
+def _valores_cliente(estado, nuevo=False):
+    """
+    Valores del cliente despues del flush, o None si no estan cargados.
+    En un cliente nuevo lo que no se asigno quedo en NULL.
+    """
+    if not nuevo and any(campo not in estado.dict for campo in CAMPOS):
+        return None
+    return {campo: estado.dict.get(campo) for campo in CAMPOS}
+
+
+def _registrar_cambios(session):
+    """Clientes creados, modificados o eliminados en el flush"""
+    for objeto in session.new.union(session.dirty):
+        if isinstance(objeto, Cliente):
+            valores = _valores_cliente(inspect(objeto), nuevo=objeto in session.new)
+            if valores is None:
+                _pendientes(session)['invalidar'] = True
+            else:
+                _pendientes(session)['cambios'][valores['id']] = valores
+
+    for objeto in session.deleted:
+        if isinstance(objeto, Cliente):
+            cliente_id = inspect(objeto).identity[0]
+            _pendientes(session)['cambios'][cliente_id] = None
+
+
+def _aplicar_cambios(pendientes):
+    """Aplica al indice los cambios de clientes confirmados"""
+    with _candado:
+        indice = _estado['indice']
+        if indice is None:
+            return
+        if pendientes['invalidar']:
+            _estado['indice'] = None
+            return
+        for cliente_id, valores in pendientes['cambios'].items():
+            if valores is None or not valores['activo']:
+                indice.quitar(cliente_id)
+            else:
+                indice.poner(cliente_id, valores['nombre'], valores['ruta'], valores['telefono'])
+
+
+_pendientes = registrar_cache(
+    'busqueda_clientes', lambda: {'cambios': {}, 'invalidar': False}, _registrar_cambios, _aplicar_cambios
+)
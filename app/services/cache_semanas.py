@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de las paginas de semanas archivadas (/ventas/ver-semana/<semana>).
+
+Una semana cerrada casi no cambia: el HTML de sus pedidos se renderiza una
+vez y se guarda por nombre de semana y generacion. La generacion de una
+semana sube solo cuando cambian sus filas: la purga de pedidos antiguos
+borra pedidos de ella, o un segundo cierre en la misma semana le agrega
+pedidos. Las paginas de generaciones anteriores dejan de usarse.
+
+El navegador revalida cada carga (Cache-Control: private, no-cache) con un
+ETag que sale de la version de la pagina guardada (generacion y momento en
+que se guardo), asi el 304 se responde sin generar ni hashear el HTML.
+
+La cache es local al proceso (LRU acotada, con vencimiento para enterarse
+de purgas hechas por otro proceso) o en disco con CACHE_SEMANAS_DIR: los
+workers de la maquina comparten las paginas y las generaciones, incluidas
+las purgas de `flask limpiar-pedidos`.
+"""
+
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from flask import current_app, session
+from flask_login import current_user
+from app.services.tablero import ARRANQUE
+
+
+# ============================================================
+# ALMACENAMIENTO
+# ============================================================
+
+class PaginasLocales:
+    """LRU en memoria del proceso, con vencimiento por pagina"""
+
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._paginas = OrderedDict()  # semana -> (generacion, vencimiento, html, guardado)
+        self._generaciones = {}        # semana -> generacion
+        self._guardados = count(1)
+        self._candado = threading.Lock()
+
+    def generacion(self, semana):
+        return self._generaciones.get(semana, 0)
+
+    def leer(self, semana, generacion):
+        with self._candado:
+            entrada = self._paginas.get(semana)
+            if entrada is None or entrada[0] != generacion:
+                return None
+            if entrada[1] < time.monotonic():
+                del self._paginas[semana]
+                return None
+            self._paginas.move_to_end(semana)
+            return entrada[2]
+
+    def version(self, semana, generacion):
+        """Version de la pagina guardada, o None si no esta (o vencio)"""
+        with self._candado:
+            entrada = self._paginas.get(semana)
+            if entrada is None or entrada[0] != generacion or entrada[1] < time.monotonic():
+                return None
+            return f'{generacion}.{entrada[3]}'
+
+    def guardar(self, semana, generacion, html):
+        with self._candado:
+            if generacion != self.generacion(semana):
+                return  # Se invalido mientras se renderizaba
+            self._paginas[semana] = (generacion, time.monotonic() + self.ttl, html, next(self._guardados))
+            self._paginas.move_to_end(semana)
+            while len(self._paginas) > self.maximo:
+                self._paginas.popitem(last=False)
+
+    def invalidar(self, semanas):
+        with self._candado:
+            for semana in semanas:
+                self._generaciones[semana] = self.generacion(semana) + 1
+                self._paginas.pop(semana, None)
+
+
+class PaginasEnDisco:
+    """
+    Un archivo por semana y generacion en una carpeta compartida por los
+    procesos. La generacion vigente de cada semana esta en <semana>.gen.
+    """
+
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        os.makedirs(carpeta, exist_ok=True)
+
+    def _base(self, semana):
+        return os.path.join(self.carpeta, hashlib.sha1(semana.encode()).hexdigest()[:16])
+
+    def _escribir(self, ruta, texto):
+        """Escritura atomica: los demas procesos ven el archivo entero o ninguno"""
+        descriptor, temporal = tempfile.mkstemp(dir=self.carpeta, suffix='.tmp')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+        os.replace(temporal, ruta)
+
+    def generacion(self, semana):
+        try:
+            with open(self._base(semana) + '.gen', encoding='utf-8') as archivo:
+                return int(archivo.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def leer(self, semana, generacion):
+        try:
+            with open(f'{self._base(semana)}-{generacion}.html', encoding='utf-8') as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            return None
+
+    def version(self, semana, generacion):
+        try:
+            return f'{generacion}.{os.stat(f"{self._base(semana)}-{generacion}.html").st_mtime_ns}'
+        except FileNotFoundError:
+            return None
+
+    def guardar(self, semana, generacion, html):
+        self._escribir(f'{self._base(semana)}-{generacion}.html', html)
+
+    def invalidar(self, semanas):
+        for semana in semanas:
+            base = self._base(semana)
+            self._escribir(base + '.gen', str(self.generacion(semana) + 1))
+            for viejo in glob.glob(glob.escape(base) + '-*.html'):
+                try:
+                    os.remove(viejo)
+                except FileNotFoundError:
+                    pass
+
+
+_cache = None
+
+
+def obtener_cache():
+    """Cache configurada (se crea la primera vez que se usa)"""
+    global _cache
+    if _cache is None:
+        config = current_app.config
+        if config.get('CACHE_SEMANAS_DIR'):
+            _cache = PaginasEnDisco(config['CACHE_SEMANAS_DIR'])
+        else:
+            _cache = PaginasLocales(config['CACHE_SEMANAS_MAXIMO'], config['CACHE_SEMANAS_TTL'])
+    return _cache
+
+
+# ============================================================
+# USO
+# ============================================================
+
+def pagina_semana(semana, generar):
+    """
+    HTML de los pedidos de una semana, guardado o recien generado.
+    generar() retorna None si la semana no tiene pedidos (no se guarda:
+    la semana puede existir mas adelante).
+
+    Returns:
+        (html, version): version de la pagina guardada, None si no se guardo
+    """
+    cache = obtener_cache()
+    generacion = cache.generacion(semana)
+    html = cache.leer(semana, generacion)
+    if html is None:
+        html = generar()
+        if html is not None:
+            cache.guardar(semana, generacion, html)
+    return html, cache.version(semana, generacion)
+
+
+def version_semana(semana):
+    """Version de la pagina guardada de una semana, o None si no esta guardada"""
+    cache = obtener_cache()
+    return cache.version(semana, cache.generacion(semana))
+
+
+def invalidar_semanas(semanas):
+    """Las semanas cambiaron (purga o cierre): sus paginas se vuelven a generar"""
+    obtener_cache().invalidar(semanas)
+
+
+def etag_semana(semana, version):
+    """
+    ETag de la pagina de una semana para la version guardada y el usuario.
+    None si no hay version o la pagina tiene mensajes flash pendientes.
+    """
+    if version is None or session.get('_flashes'):
+        return None
+    texto = '|'.join(str(parte) for parte in (ARRANQUE, semana, version, current_user.id))
+    return hashlib.sha1(texto.encode()).hexdigest()[:20]
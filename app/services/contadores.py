@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de los contadores de los dashboards (total, pendientes, no leidos...).
+
+Los contadores se guardan por alcance: global, por ruta y por cliente. En
+lugar de recalcularlos en cada carga, los cambios de pedidos se acumulan como
+diferencias al hacer flush (las mismas rutas que publican los eventos de
+Socket.IO: alta, edicion, eliminacion, cambio de estado, marcar visto) y se
+aplican al confirmar la transaccion; si hay rollback se descartan. Lo que no
+pasa por el flush del ORM (alta de varias lineas, cierre de semana) se anota
+a mano con anotar_pedidos_nuevos / invalidar_al_confirmar.
+
+Cada entrada vence a los CACHE_CONTADORES_TTL segundos y se vuelve a
+calcular desde la base, lo que corrige cualquier desfasaje (por ejemplo,
+cambios hechos por otro proceso cuando la cache es local).
+
+La cache es local al proceso (LRU acotada) o compartida entre procesos en
+Redis, con CACHE_CONTADORES_URL=redis://...
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm.base import NO_VALUE
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services._cambios_sesion import registrar_cache
+
+
+# Contadores que se calculan para cada cliente, cada ruta y el total
+NOMBRES_CONTADORES = (
+    'total', 'pendientes', 'completados', 'cancelados',
+    'modificados', 'esperando', 'no_leidos'
+)
+
+# Columnas de Pedido de las que dependen los contadores
+CAMPOS_CONTADORES = (
+    'cliente_id', 'estado', 'modificado', 'visto_por_fabrica', 'visto_por_vendedor',
+    'esperando_contestacion', 'observaciones_fabrica'
+)
+
+
+def contadores_vacios():
+    """Retorna un diccionario de contadores en cero"""
+    return {nombre: 0 for nombre in NOMBRES_CONTADORES}
+
+
+# ============================================================
+# CLAVES
+# ============================================================
+
+def clave_global():
+    return 'global'
+
+
+def clave_ruta(ruta, solo_clientes_activos=False):
+    return f"ruta{'-activos' if solo_clientes_activos else ''}:{ruta}"
+
+
+def clave_cliente(cliente_id):
+    return f'cliente:{cliente_id}'
+
+
+def claves_de_ruta(ruta):
+    """Las dos variantes de una ruta (con y sin clientes inactivos)"""
+    return [clave_ruta(ruta), clave_ruta(ruta, solo_clientes_activos=True)]
+
+
+# ============================================================
+# ALMACENAMIENTO
+# ============================================================
+
+class CacheLocal:
+    """LRU en memoria del proceso, con vencimiento por entrada"""
+
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (vencimiento, valores)
+        self._vencidas = {}  # clave -> valores, para detectar desfasajes
+        self._candado = threading.Lock()
+
+    def leer(self, clave):
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            vencimiento, valores = entrada
+            if vencimiento < time.monotonic():
+                del self._entradas[clave]
+                self._vencidas[clave] = valores
+                return None
+            self._entradas.move_to_end(clave)
+            return dict(valores)
+
+    def guardar(self, clave, valores):
+        with self._candado:
+            anteriores = self._vencidas.pop(clave, None)
+            self._entradas[clave] = (time.monotonic() + self.ttl, dict(valores))
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+        return anteriores
+
+    def incrementar(self, clave, diferencia):
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return
+            for nombre, valor in diferencia.items():
+                entrada[1][nombre] = entrada[1].get(nombre, 0) + valor
+
+    def borrar(self, claves):
+        with self._candado:
+            for clave in claves:
+                self._entradas.pop(clave, None)
+
+    def limpiar(self):
+        with self._candado:
+            self._entradas.clear()
+
+
+class CacheRedis:
+    """Hash de Redis por clave, compartido por todos los procesos"""
+
+    # Suma las diferencias solo si la clave existe (si vencio, se recalcula)
+    SCRIPT_INCREMENTAR = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+        for i = 1, #ARGV, 2 do redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1]) end
+        return 1
+    """
+
+    def __init__(self, url, ttl):
+        import redis
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefijo = 'contadores:'
+        self._incrementar = self.redis.register_script(self.SCRIPT_INCREMENTAR)
+
+    def leer(self, clave):
+        valores = self.redis.hgetall(self.prefijo + clave)
+        if not valores:
+            return None
+        return {nombre.decode(): int(valor) for nombre, valor in valores.items()}
+
+    def guardar(self, clave, valores):
+        pipe = self.redis.pipeline()
+        pipe.delete(self.prefijo + clave)
+        pipe.hset(self.prefijo + clave, mapping=valores)
+        pipe.expire(self.prefijo + clave, self.ttl)
+        pipe.execute()
+
+    def incrementar(self, clave, diferencia):
+        argumentos = []
+        for nombre, valor in diferencia.items():
+            argumentos.extend([nombre, valor])
+        self._incrementar(keys=[self.prefijo + clave], args=argumentos)
+
+    def borrar(self, claves):
+        if claves:
+            self.redis.delete(*[self.prefijo + clave for clave in claves])
+
+    def limpiar(self):
+        claves = list(self.redis.scan_iter(self.prefijo + '*'))
+        if claves:
+            self.redis.delete(*claves)
+
+
+_cache = None
+
+
+def obtener_cache():
+    """Cache configurada (se crea la primera vez que se usa)"""
+    global _cache
+    if _cache is None:
+        config = current_app.config
+        if config.get('CACHE_CONTADORES_URL'):
+            _cache = CacheRedis(config['CACHE_CONTADORES_URL'], config['CACHE_CONTADORES_TTL'])
+        else:
+            _cache = CacheLocal(config['CACHE_CONTADORES_MAXIMO'], config['CACHE_CONTADORES_TTL'])
+    return _cache
+
+
+def obtener(clave, calcular):
+    """
+    Contadores guardados en la clave, o calculados con calcular() si no
+    estan o vencieron.
+    """
+    cache = obtener_cache()
+    valores = cache.leer(clave)
+    if valores is None:
+        valores = calcular()
+        guardar(clave, valores)
+    return valores
+
+
+def guardar(clave, valores):
+    """Guarda contadores recien calculados desde la base"""
+    anteriores = obtener_cache().guardar(clave, valores)
+    if anteriores is not None and anteriores != valores:
+        current_app.logger.warning(
+            'Contadores desfasados en %s: cache %s, base %s', clave, anteriores, valores
+        )
+
+
+# ============================================================
+# CAMBIOS PENDIENTES DE LA TRANSACCION
+# ============================================================
+
+def contribucion(valores):
+    """Contadores que suma un pedido con estos valores de columnas"""
+    estado = valores['estado']
+    return {
+        'total': 1,
+        'pendientes': int(estado == 'pendiente'),
+        'completados': int(estado == 'completado'),
+        'cancelados': int(estado == 'cancelado'),
+        'modificados': int(bool(valores['modificado']) and not valores['visto_por_fabrica']),
+        'esperando': int(bool(valores['esperando_contestacion'])),
+        'no_leidos': int(valores['observaciones_fabrica'] is not None and not valores['visto_por_vendedor']),
+    }
+
+
+def _cambios_vacios():
+    """Cambios acumulados en una transaccion"""
+    return {
+        'diferencias': defaultdict(contadores_vacios),
+        'invalidar': set(),
+        'invalidar_todo': False
+    }
+
+
+def _claves_pedido(session, cliente_id):
+    """Claves afectadas por un pedido del cliente (sin las de ruta si no hay cliente)"""
+    claves = [clave_global(), clave_cliente(cliente_id)]
+    with session.no_autoflush:
+        cliente = session.get(Cliente, cliente_id)
+    return claves, cliente
+
+
+def _sumar(session, cliente_id, diferencia):
+    """Acumula la diferencia de un pedido en todas sus claves"""
+    if not any(diferencia.values()):
+        return
+
+    pendientes = _pendientes(session)
+    claves, cliente = _claves_pedido(session, cliente_id)
+    for clave in claves:
+        for nombre, valor in diferencia.items():
+            pendientes['diferencias'][clave][nombre] += valor
+
+    if cliente is None:
+        return
+    if diferencia['total']:
+        # Puede cambiar la cantidad de clientes con pedidos de la ruta
+        pendientes['invalidar'].update(claves_de_ruta(cliente.ruta))
+        return
+    rutas = [clave_ruta(cliente.ruta)]
+    if cliente.activo:
+        rutas.append(clave_ruta(cliente.ruta, solo_clientes_activos=True))
+    for clave in rutas:
+        for nombre, valor in diferencia.items():
+            pendientes['diferencias'][clave][nombre] += valor
+
+
+def valores_pedido(estado, anteriores=False, nuevo=False, campos=CAMPOS_CONTADORES):
+    """
+    Valores actuales (o anteriores al cambio) de columnas de un pedido
+    (por defecto, las de los contadores).
+    En un pedido recien insertado, lo que no se asigno quedo en NULL.
+    Retorna None si alguno no esta cargado y no se puede saber.
+    """
+    valores = {}
+    for campo in campos:
+        atributo = estado.attrs[campo]
+        if anteriores:
+            historial = atributo.history
+            if historial.deleted:
+                valor = historial.deleted[0]
+            elif historial.unchanged:
+                valor = historial.unchanged[0]
+            elif historial.added:
+                return None  # Cambio sobre un atributo que no estaba cargado
+            else:
+                valor = atributo.loaded_value
+        else:
+            valor = atributo.loaded_value
+        if valor is NO_VALUE:
+            if not nuevo:
+                return None
+            valor = None
+        valores[campo] = valor
+    return valores
+
+
+def _invalidar_pedido(session, cliente_id):
+    """No se conoce la diferencia exacta: se descartan sus claves"""
+    pendientes = _pendientes(session)
+    claves, cliente = _claves_pedido(session, cliente_id)
+    pendientes['invalidar'].update(claves)
+    if cliente is not None:
+        pendientes['invalidar'].update(claves_de_ruta(cliente.ruta))
+
+
+def anotar_pedidos_nuevos(pedidos, cliente):
+    """
+    Suma pedidos insertados sin pasar por el flush del ORM
+    (INSERT ... RETURNING de varias lineas). Se aplica al confirmar.
+    """
+    pendientes = _pendientes()
+    diferencia = contadores_vacios()
+    for pedido in pedidos:
+        for nombre, valor in contribucion(valores_pedido(inspect(pedido), nuevo=True)).items():
+            diferencia[nombre] += valor
+
+    for clave in (clave_global(), clave_cliente(cliente.id)):
+        for nombre, valor in diferencia.items():
+            pendientes['diferencias'][clave][nombre] += valor
+    pendientes['invalidar'].update(claves_de_ruta(cliente.ruta))
+
+
+def invalidar_al_confirmar():
+    """Descarta toda la cache al confirmar (cambios masivos, como el cierre de semana)"""
+    _pendientes()['invalidar_todo'] = True
+
+
+def _registrar_cambios(session):
+    """
+    Calcula la diferencia de contadores de cada pedido creado, modificado o
+    eliminado en el flush (el historial de atributos todavia esta disponible).
+    """
+    for objeto in session.new:
+        if isinstance(objeto, Pedido):
+            _sumar(session, objeto.cliente_id, contribucion(valores_pedido(inspect(objeto), nuevo=True)))
+
+    for objeto in session.deleted:
+        if isinstance(objeto, Pedido):
+            valores = valores_pedido(inspect(objeto), anteriores=True)
+            if valores is None:
+                _invalidar_pedido(session, objeto.cliente_id)
+                continue
+            _sumar(session, valores['cliente_id'],
+                   {nombre: -valor for nombre, valor in contribucion(valores).items()})
+
+    for objeto in session.dirty:
+        if isinstance(objeto, Cliente):
+            estado = inspect(objeto)
+            historial_ruta = estado.attrs.ruta.history
+            if historial_ruta.has_changes() or estado.attrs.activo.history.has_changes():
+                rutas = set(historial_ruta.deleted) | set(historial_ruta.added) | {objeto.ruta}
+                for ruta in rutas:
+                    _pendientes(session)['invalidar'].update(claves_de_ruta(ruta))
+            continue
+
+        if not isinstance(objeto, Pedido) or not session.is_modified(objeto):
+            continue
+
+        estado = inspect(objeto)
+        antes = valores_pedido(estado, anteriores=True)
+        despues = valores_pedido(estado)
+        if antes is None or despues is None:
+            _invalidar_pedido(session, objeto.cliente_id)
+            continue
+        if antes['cliente_id'] != despues['cliente_id']:
+            _sumar(session, antes['cliente_id'],
+                   {nombre: -valor for nombre, valor in contribucion(antes).items()})
+            _sumar(session, despues['cliente_id'], contribucion(despues))
+            continue
+
+        anterior = contribucion(antes)
+        _sumar(session, despues['cliente_id'],
+               {nombre: valor - anterior[nombre] for nombre, valor in contribucion(despues).items()})
+
+
+def _aplicar_cambios(pendientes):
+    """Aplica en la cache los cambios de la transaccion confirmada"""
+    cache = obtener_cache()
+    if pendientes['invalidar_todo']:
+        cache.limpiar()
+        return
+
+    cache.borrar(pendientes['invalidar'])
+    for clave, diferencia in pendientes['diferencias'].items():
+        if clave not in pendientes['invalidar'] and any(diferencia.values()):
+            cache.incrementar(clave, diferencia)
+
+
+_pendientes = registrar_cache('contadores', _cambios_vacios, _registrar_cambios, _aplicar_cambios)
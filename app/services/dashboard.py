@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo de lectura de los dashboards de ventas y fabrica.
+
+Calcula todos los contadores (globales, por ruta y por cliente) con una sola
+agregacion agrupada y carga los pedidos activos en una sola consulta, de modo
+que renderizar el dashboard cuesta siempre la misma cantidad de consultas sin
+importar cuantos clientes haya.
+
+Los contadores globales, de ruta y de cliente se leen de la cache de
+contadores (app/services/contadores.py) cuando estan disponibles.
+"""
+
+from collections import defaultdict
+from sqlalchemy import case, func
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services import contadores as cache_contadores
+from app.services.contadores import NOMBRES_CONTADORES, contadores_vacios
+
+
+def _columnas_contadores():
+    """
+    Columnas COUNT/SUM(CASE ...) de todos los contadores.
+    Cada condicion se evalua sobre la fila de Pedido.
+    """
+    condiciones = {
+        'pendientes': Pedido.estado == 'pendiente',
+        'completados': Pedido.estado == 'completado',
+        'cancelados': Pedido.estado == 'cancelado',
+        'modificados': db.and_(Pedido.modificado == True, Pedido.visto_por_fabrica == False),
+        'esperando': Pedido.esperando_contestacion == True,
+        'no_leidos': db.and_(Pedido.observaciones_fabrica.isnot(None), Pedido.visto_por_vendedor == False),
+    }
+
+    columnas = [func.count(Pedido.id).label('total')]
+    for nombre, condicion in condiciones.items():
+        columnas.append(
+            func.coalesce(func.sum(case((condicion, 1), else_=0)), 0).label(nombre)
+        )
+    return columnas
+
+
+def _fila_a_contadores(fila):
+    """Convierte una fila de la agregacion en un diccionario de contadores"""
+    contadores = contadores_vacios()
+    for nombre in contadores:
+        contadores[nombre] = int(getattr(fila, nombre) or 0)
+    return contadores
+
+
+def obtener_dashboard(solo_clientes_activos=False, cliente_id=None, ruta=None, cliente_ids=None):
+    """
+    Construye la estructura que consumen los templates de dashboard.
+
+    Args:
+        solo_clientes_activos: Si es True, ignora clientes dados de baja
+        cliente_id: Si se indica, solo arma la tarjeta de ese cliente
+                    (los totales siguen siendo globales)
+        ruta: Si se indica, solo arma esa ruta (tablets dedicadas a una ruta)
+        cliente_ids: Si se indica, solo arma las tarjetas de esos clientes
+                     (actualizacion parcial del tablero en memoria)
+
+    Returns:
+        dict con:
+            - 'rutas': {ruta: {'clientes': [...], 'contadores': {...}}} ordenado por ruta.
+              Cada cliente es {'cliente': Cliente, 'contadores': {...}, 'pedidos': [Pedido, ...]}
+            - 'totales': contadores globales sobre todos los pedidos activos
+            - 'total_clientes': cantidad de clientes con pedidos activos
+    """
+
+    # 1) Contadores por cliente en una sola agregacion
+    consulta = db.session.query(Cliente, *_columnas_contadores()).join(
+        Pedido, Pedido.cliente_id == Cliente.id
+    )
+
+    if solo_clientes_activos:
+        consulta = consulta.filter(Cliente.activo == True)
+    if cliente_id is not None:
+        consulta = consulta.filter(Cliente.id == cliente_id)
+    if cliente_ids is not None:
+        consulta = consulta.filter(Cliente.id.in_(cliente_ids))
+    if ruta:
+        consulta = consulta.filter(Cliente.ruta == ruta)
+
+    filas = consulta.group_by(Cliente.id).order_by(Cliente.ruta, Cliente.nombre).all()
+
+    # 2) Pedidos activos (con su operario) en una sola consulta
+    consulta_pedidos = Pedido.query.options(
+        joinedload(Pedido.operario_responsable)
+    )
+
+    if solo_clientes_activos or ruta:
+        consulta_pedidos = consulta_pedidos.join(Cliente, Pedido.cliente_id == Cliente.id)
+    if solo_clientes_activos:
+        consulta_pedidos = consulta_pedidos.filter(Cliente.activo == True)
+    if ruta:
+        consulta_pedidos = consulta_pedidos.filter(Cliente.ruta == ruta)
+    if cliente_id is not None:
+        consulta_pedidos = consulta_pedidos.filter(Pedido.cliente_id == cliente_id)
+    if cliente_ids is not None:
+        consulta_pedidos = consulta_pedidos.filter(Pedido.cliente_id.in_(cliente_ids))
+
+    pedidos_por_cliente = defaultdict(list)
+    for pedido in consulta_pedidos.order_by(Pedido.fecha_creacion.desc()).all():
+        pedidos_por_cliente[pedido.cliente_id].append(pedido)
+
+    # 3) Contadores globales (incluye pedidos de clientes inactivos, como antes)
+    totales = obtener_totales()
+
+    # Agrupar por ruta y acumular contadores de cada ruta
+    rutas = {}
+    for fila in filas:
+        cliente = fila[0]
+        contadores = _fila_a_contadores(fila)
+
+        grupo = rutas.setdefault(cliente.ruta, {'clientes': [], 'contadores': contadores_vacios()})
+        grupo['clientes'].append({
+            'cliente': cliente,
+            'contadores': contadores,
+            'pedidos': pedidos_por_cliente.get(cliente.id, [])
+        })
+        for nombre, valor in contadores.items():
+            grupo['contadores'][nombre] += valor
+        cache_contadores.guardar(cache_contadores.clave_cliente(cliente.id), contadores)
+
+    # Las rutas completas recien calculadas tambien renuevan la cache
+    if cliente_id is None and cliente_ids is None:
+        for nombre_ruta, grupo in rutas.items():
+            cache_contadores.guardar(
+                cache_contadores.clave_ruta(nombre_ruta, solo_clientes_activos),
+                {'total_clientes': len(grupo['clientes']), **grupo['contadores']}
+            )
+
+    return {
+        'rutas': dict(sorted(rutas.items())),
+        'totales': totales,
+        'total_clientes': len(filas)
+    }
+
+
+def obtener_totales():
+    """Contadores globales sobre todos los pedidos activos (cacheados)"""
+    def calcular():
+        return _fila_a_contadores(
+            db.session.query(*_columnas_contadores()).one()
+        )
+
+    return cache_contadores.obtener(cache_contadores.clave_global(), calcular)
+
+
+def contadores_de_cliente(cliente_id):
+    """Contadores de los pedidos activos de un cliente (cacheados)"""
+    def calcular():
+        return _fila_a_contadores(
+            db.session.query(*_columnas_contadores()).filter(
+                Pedido.cliente_id == cliente_id
+            ).one()
+        )
+
+    return cache_contadores.obtener(cache_contadores.clave_cliente(cliente_id), calcular)
+
+
+def contadores_de_ruta(ruta, solo_clientes_activos=False):
+    """
+    Contadores de una sola ruta (cacheados; si no, una sola agregacion).
+
+    Returns:
+        dict con 'total_clientes' (clientes con pedidos activos) y 'contadores'
+    """
+    valores = cache_contadores.obtener(
+        cache_contadores.clave_ruta(ruta, solo_clientes_activos),
+        lambda: _calcular_contadores_de_ruta(ruta, solo_clientes_activos)
+    )
+    return {
+        'total_clientes': valores['total_clientes'],
+        'contadores': {nombre: valores[nombre] for nombre in NOMBRES_CONTADORES}
+    }
+
+
+def _calcular_contadores_de_ruta(ruta, solo_clientes_activos):
+    """Agregacion de una ruta en la base, en el formato de la cache"""
+    consulta = db.session.query(
+        func.count(func.distinct(Cliente.id)).label('total_clientes'),
+        *_columnas_contadores()
+    ).select_from(Pedido).join(
+        Cliente, Pedido.cliente_id == Cliente.id
+    ).filter(
+        Cliente.ruta == ruta
+    )
+
+    if solo_clientes_activos:
+        consulta = consulta.filter(Cliente.activo == True)
+
+    fila = consulta.one()
+    return {'total_clientes': int(fila.total_clientes or 0), **_fila_a_contadores(fila)}
+
+
+def obtener_fragmento_cliente(cliente_id, solo_clientes_activos=False):
+    """
+    Datos para volver a dibujar la tarjeta de un cliente sin recargar el dashboard.
+
+    Returns:
+        dict con 'cliente', 'item' (None si el cliente ya no tiene pedidos
+        activos), 'ruta' (contadores de su ruta) y 'totales'; o None si el
+        cliente no existe
+    """
+    cliente = db.session.get(Cliente, cliente_id)
+    if cliente is None:
+        return None
+
+    contadores = contadores_de_cliente(cliente_id)
+
+    item = None
+    if contadores['total'] and (cliente.activo or not solo_clientes_activos):
+        pedidos = Pedido.query.options(
+            joinedload(Pedido.operario_responsable)
+        ).filter(
+            Pedido.cliente_id == cliente_id
+        ).order_by(Pedido.fecha_creacion.desc()).all()
+
+        item = {'cliente': cliente, 'contadores': contadores, 'pedidos': pedidos}
+
+    return {
+        'cliente': cliente,
+        'item': item,
+        'ruta': contadores_de_ruta(cliente.ruta, solo_clientes_activos=solo_clientes_activos),
+        'totales': obtener_totales()
+    }
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Demanda de produccion: cuanto hay que producir de cada producto.
+
+Suma la cantidad de los pedidos activos pendientes por producto y unidad
+(y por ruta). La agregacion se hace en la base, agrupando por nombre,
+unidad y ruta tal como estan escritos; despues se juntan en Python las
+variantes de un mismo producto ("Pan dulce", "pan  Dulce", "Pán dulce")
+con app.utils.normalizar, la misma funcion que usan los cambios incrementales.
+
+El resultado queda en memoria del proceso y se mantiene como la cache de
+contadores: al hacer flush se calcula la diferencia de cada pedido creado,
+editado, eliminado o con cambio de estado, y se aplica al confirmar (si hay
+rollback se descarta). Lo que no pasa por el flush (alta de varias lineas)
+se anota con sumar_pedidos_nuevos; el cierre de semana y la importacion la
+descartan con invalidar_demanda. Cada DEMANDA_TTL segundos se vuelve a
+calcular desde la base, lo que incorpora los cambios de otros procesos.
+"""
+
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import func, inspect
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services.contadores import valores_pedido
+from app.services._cambios_sesion import registrar_cache
+from app.utils import normalizar
+
+
+# Columnas de Pedido de las que depende la demanda
+CAMPOS_DEMANDA = ('cliente_id', 'producto_nombre', 'unidad', 'cantidad', 'estado')
+
+UNIDAD_POR_DEFECTO = 'unidades'
+CENTAVOS = Decimal('0.01')  # Escala de Pedido.cantidad
+SIN_RUTA = 'Sin ruta'
+
+# Lineas de demanda: (producto, unidad, ruta) -> {'cantidad', 'pedidos', 'nombres'}
+_estado = {'lineas': None, 'vence': 0.0}
+_candado = threading.Lock()
+
+
+def _clave(producto_nombre, unidad, ruta):
+    return (normalizar(producto_nombre), normalizar(unidad) or UNIDAD_POR_DEFECTO, ruta or SIN_RUTA)
+
+
+def _sumar(lineas, clave, nombre, cantidad, pedidos):
+    """Suma (o resta) pedidos en una linea; la linea se quita si queda vacia"""
+    linea = lineas.get(clave)
+    if linea is None:
+        linea = lineas[clave] = {'cantidad': Decimal(0), 'pedidos': 0, 'nombres': Counter()}
+    linea['cantidad'] += cantidad
+    linea['pedidos'] += pedidos
+    linea['nombres'][nombre] += pedidos
+    if linea['nombres'][nombre] <= 0:
+        del linea['nombres'][nombre]
+    if linea['pedidos'] <= 0:
+        del lineas[clave]
+
+
+# ============================================================
+# CALCULO
+# ============================================================
+
+def calcular_desde_base():
+    """Lineas de demanda con una sola agregacion en la base"""
+    filas = db.session.query(
+        Pedido.producto_nombre,
+        Pedido.unidad,
+        Cliente.ruta,
+        func.sum(Pedido.cantidad),
+        func.count(Pedido.id)
+    ).join(
+        Cliente, Cliente.id == Pedido.cliente_id
+    ).filter(
+        Pedido.estado == 'pendiente'
+    ).group_by(
+        Pedido.producto_nombre, Pedido.unidad, Cliente.ruta
+    ).all()
+
+    lineas = {}
+    for producto_nombre, unidad, ruta, cantidad, pedidos in filas:
+        _sumar(lineas, _clave(producto_nombre, unidad, ruta), producto_nombre.strip(),
+               Decimal(str(cantidad or 0)), pedidos)
+    return lineas
+
+
+def _lineas():
+    """Lineas vigentes (se recalculan si vencieron)"""
+    with _candado:
+        if _estado['lineas'] is not None and _estado['vence'] > time.monotonic():
+            return _estado['lineas']
+
+    lineas = calcular_desde_base()
+    with _candado:
+        _estado['lineas'] = lineas
+        _estado['vence'] = time.monotonic() + current_app.config['DEMANDA_TTL']
+    return lineas
+
+
+def obtener_demanda(ruta=None, por_ruta=False):
+    """
+    Lista de produccion: cantidad pendiente de cada producto y unidad.
+
+    Args:
+        ruta: Si se indica, solo los pedidos de esa ruta
+        por_ruta: Si es True, una linea por producto, unidad y ruta
+
+    Returns:
+        Lista de {'producto', 'unidad', 'cantidad', 'pedidos'} (mas 'ruta'
+        con por_ruta), ordenada por producto. 'producto' es la forma mas
+        usada del nombre.
+    """
+    agrupadas = {}
+    for (producto, unidad, ruta_linea), linea in _lineas().items():
+        if ruta and ruta_linea != ruta:
+            continue
+        clave = (producto, unidad, ruta_linea) if por_ruta else (producto, unidad)
+        total = agrupadas.setdefault(clave, {'cantidad': Decimal(0), 'pedidos': 0, 'nombres': Counter()})
+        total['cantidad'] += linea['cantidad']
+        total['pedidos'] += linea['pedidos']
+        total['nombres'].update(linea['nombres'])
+
+    resultado = []
+    for clave, total in sorted(agrupadas.items()):
+        fila = {
+            'producto': total['nombres'].most_common(1)[0][0],
+            'unidad': clave[1],
+            'cantidad': float(total['cantidad']),
+            'pedidos': total['pedidos'],
+        }
+        if por_ruta:
+            fila['ruta'] = clave[2]
+        resultado.append(fila)
+    return resultado
+
+
+# ============================================================
+# CAMBIOS PENDIENTES DE LA TRANSACCION
+# ============================================================
+
+def _aporte(session, valores):
+    """(clave, nombre, cantidad) de un pedido pendiente, o None si no suma"""
+    if valores['estado'] != 'pendiente':
+        return None
+    with session.no_autoflush:
+        cliente = session.get(Cliente, valores['cliente_id'])
+    nombre = (valores['producto_nombre'] or '').strip()
+    return (
+        _clave(nombre, valores['unidad'], cliente.ruta if cliente else None),
+        nombre,
+        Decimal(str(valores['cantidad'] or 0)).quantize(CENTAVOS)
+    )
+
+
+def _anotar(session, valores, signo):
+    aporte = _aporte(session, valores)
+    if aporte is not None:
+        clave, nombre, cantidad = aporte
+        _pendientes(session)['diferencias'].append((clave, nombre, signo * cantidad, signo))
+
+
+def sumar_pedidos_nuevos(pedidos):
+    """Suma pedidos insertados sin pasar por el flush del ORM. Se aplica al confirmar."""
+    for pedido in pedidos:
+        _anotar(db.session, valores_pedido(inspect(pedido), nuevo=True, campos=CAMPOS_DEMANDA), 1)
+
+
+def invalidar_demanda():
+    """Recalcula la demanda desde la base despues de confirmar (cierre de semana, importaciones)"""
+    _pendientes()['invalidar'] = True
+
+
+def _registrar_cambios(session):
+    """Diferencia de demanda de cada pedido creado, modificado o eliminado en el flush"""
+    for objeto in session.new:
+        if isinstance(objeto, Pedido):
+            _anotar(session, valores_pedido(inspect(objeto), nuevo=True, campos=CAMPOS_DEMANDA), 1)
+
+    for objeto in session.deleted:
+        if isinstance(objeto, Pedido):
+            valores = valores_pedido(inspect(objeto), anteriores=True, campos=CAMPOS_DEMANDA)
+            if valores is None:
+                _pendientes(session)['invalidar'] = True
+                continue
+            _anotar(session, valores, -1)
+
+    for objeto in session.dirty:
+        if isinstance(objeto, Cliente):
+            if inspect(objeto).attrs.ruta.history.has_changes():
+                _pendientes(session)['invalidar'] = True
+            continue
+
+        if not isinstance(objeto, Pedido) or not session.is_modified(objeto):
+            continue
+
+        estado = inspect(objeto)
+        antes = valores_pedido(estado, anteriores=True, campos=CAMPOS_DEMANDA)
+        despues = valores_pedido(estado, campos=CAMPOS_DEMANDA)
+        if antes is None or despues is None:
+            _pendientes(session)['invalidar'] = True
+            continue
+        if antes != despues:
+            _anotar(session, antes, -1)
+            _anotar(session, despues, 1)
+
+
+def _aplicar_cambios(pendientes):
+    """Aplica las diferencias de la transaccion confirmada"""
+    with _candado:
+        if pendientes['invalidar']:
+            _estado['lineas'] = None
+            return
+        if _estado['lineas'] is None or not pendientes['diferencias']:
+            return
+
+        # Copia de las lineas que cambian: los lectores pueden estar recorriendo las actuales
+        lineas = dict(_estado['lineas'])
+        copiadas = set()
+        for clave, nombre, cantidad, pedidos in pendientes['diferencias']:
+            if clave in lineas and clave not in copiadas:
+                linea = lineas[clave]
+                lineas[clave] = {**linea, 'nombres': Counter(linea['nombres'])}
+            copiadas.add(clave)
+            _sumar(lineas, clave, nombre, cantidad, pedidos)
+        _estado['lineas'] = lineas
+
+
+_pendientes = registrar_cache(
+    'demanda', lambda: {'diferencias': [], 'invalidar': False}, _registrar_cambios, _aplicar_cambios
+)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Preparacion del esquema de la base.
+
+Siempre con las migraciones (`upgrade`): la primera (esquema base) crea las
+tablas, asi una base vacia queda igual que una migrada, con lo que solo
+existe en las migraciones (extensiones e indices de PostgreSQL,
+particiones de pedidos_archivo). Una base con tablas pero sin
+alembic_version (creada con create_all antes de las migraciones) se marca
+con el esquema base y se migra desde ahi; una vaciada con drop_all (que
+deja alembic_version) vuelve a la revision inicial.
+
+Se ejecuta una vez por despliegue (`flask preparar-base`, fase release del
+Procfile), no al crear la app.
+"""
+
+from flask import current_app
+from app import db, registrar_migraciones
+
+
+# Revision que crea las tablas originales
+REVISION_BASE = '1b0e7f3a9c50'
+
+
+def preparar_esquema():
+    """
+    Deja el esquema de la base al dia. Requiere contexto de aplicacion.
+
+    Returns:
+        'creada' si la base estaba vacia, 'actualizada' si se migro
+    """
+    from flask_migrate import stamp, upgrade
+
+    registrar_migraciones(current_app._get_current_object())
+
+    inspector = db.inspect(db.engine)
+    vacia = not inspector.has_table('usuarios')
+    if inspector.has_table('alembic_version'):
+        if vacia:
+            stamp(revision='base')
+    elif not vacia:
+        stamp(revision=REVISION_BASE)
+
+    upgrade()
+    return 'creada' if vacia else 'actualizada'
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Exportacion de pedidos (CSV y NDJSON) para contabilidad.
+
+Las filas se leen con un cursor del lado del servidor (yield_per; en
+PostgreSQL activa stream_results) y se envian a medida que llegan, de a
+bloques: exportar un millon de pedidos usa memoria constante y la descarga
+empieza enseguida. Se leen columnas sueltas, no objetos del ORM, para no
+llenar el identity map de la sesion.
+"""
+
+import csv
+import io
+import json
+from decimal import Decimal
+from datetime import datetime
+from werkzeug.utils import secure_filename
+from app import db
+from app.models.cliente import Cliente
+from app.models.usuario import Usuario
+from app.services.listado_pedidos import consulta_filtrada, leer_fecha
+
+
+# Filas leidas por vuelta del cursor (y enviadas por bloque)
+FILAS_POR_BLOQUE = 1000
+
+COLUMNAS_EXPORTACION = (
+    'id', 'fecha_creacion', 'cliente_id', 'cliente_nombre', 'ruta', 'producto_nombre',
+    'cantidad', 'unidad', 'estado', 'operario_nombre', 'observaciones_fabrica',
+    'notas_vendedor', 'fecha_completado', 'semana_archivado'
+)
+
+# Formato -> tipo de contenido
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def consulta_exportacion(args):
+    """
+    SELECT de las columnas exportadas, con los mismos filtros que
+    /fabrica/api/pedidos (semana, desde, hasta, ruta, ...), del pedido mas
+    viejo al mas nuevo.
+    """
+    modelo, consulta = consulta_filtrada(args)
+
+    if hasattr(modelo, 'semana_archivado'):
+        semana = modelo.semana_archivado
+    else:
+        semana = db.null()
+
+    columnas = [
+        modelo.id, modelo.fecha_creacion, modelo.cliente_id,
+        Cliente.nombre.label('cliente_nombre'), Cliente.ruta,
+        modelo.producto_nombre, modelo.cantidad, modelo.unidad, modelo.estado,
+        Usuario.nombre.label('operario_nombre'),
+        modelo.observaciones_fabrica, modelo.notas_vendedor, modelo.fecha_completado,
+        semana.label('semana_archivado'),
+    ]
+
+    return consulta.with_only_columns(*columnas).select_from(modelo).outerjoin(
+        Cliente, Cliente.id == modelo.cliente_id
+    ).outerjoin(
+        Usuario, Usuario.id == modelo.operario_id
+    ).order_by(modelo.fecha_creacion, modelo.id)
+
+
+def _valor(valor):
+    """Valor de una columna en un formato que entiendan CSV y JSON"""
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+def _bloques_de_filas(consulta):
+    """Filas de la consulta de a FILAS_POR_BLOQUE, leidas con cursor del servidor"""
+    resultado = db.session.execute(consulta.execution_options(yield_per=FILAS_POR_BLOQUE))
+    for bloque in resultado.partitions():
+        yield [[_valor(valor) for valor in fila] for fila in bloque]
+
+
+def generar_csv(consulta):
+    """Genera el CSV por bloques (primero el encabezado)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    # BOM para que Excel abra el archivo como UTF-8
+    buffer.write('\ufeff')
+    escritor.writerow(COLUMNAS_EXPORTACION)
+    yield buffer.getvalue()
+
+    for filas in _bloques_de_filas(consulta):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(filas)
+        yield buffer.getvalue()
+
+
+def generar_ndjson(consulta):
+    """Genera un objeto JSON por linea, por bloques"""
+    for filas in _bloques_de_filas(consulta):
+        yield ''.join(
+            json.dumps(dict(zip(COLUMNAS_EXPORTACION, fila)), ensure_ascii=False) + '\n'
+            for fila in filas
+        )
+
+
+def generar_exportacion(formato, args):
+    """
+    Generador del archivo exportado.
+
+    Raises:
+        ValueError: Si el formato o algun filtro es invalido (antes de empezar a enviar)
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"formato debe ser {' o '.join(FORMATOS)}")
+
+    consulta = consulta_exportacion(args)
+    if formato == 'csv':
+        return generar_csv(consulta)
+    return generar_ndjson(consulta)
+
+
+def _fecha_para_nombre(args, nombre):
+    """Fecha del filtro ya validada, en un formato apto para nombre de archivo"""
+    fecha, solo_dia = leer_fecha(args, nombre)
+    if fecha is None:
+        return None
+    return fecha.strftime('%Y-%m-%d' if solo_dia else '%Y-%m-%dT%H-%M-%S')
+
+
+def nombre_archivo(formato, args):
+    """
+    Nombre sugerido para la descarga segun los filtros. Se arma con los
+    valores ya interpretados (fechas) o saneados (semana), nunca con el
+    texto de la URL tal cual.
+
+    Raises:
+        ValueError: Si alguna fecha es invalida
+    """
+    partes = ['pedidos']
+    semana = secure_filename(args.get('semana') or '')
+    if semana:
+        partes.append(semana)
+    elif args.get('archivado') in ('1', 'true'):
+        partes.append('archivados')
+    for filtro in ('desde', 'hasta'):
+        fecha = _fecha_para_nombre(args, filtro)
+        if fecha:
+            partes.append(f'{filtro}-{fecha}')
+    return f"{'_'.join(partes)}.{formato}"
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Importacion masiva de clientes y pedidos desde CSV.
+
+Se usa desde `flask importar-csv` y desde /ventas/importar. Cada fila se
+valida con las mismas reglas que los formularios (ClienteForm para clientes,
+los campos de EditarPedidoForm para las lineas de pedido); las filas con
+errores se informan con su numero de linea y se saltean, sin frenar el
+resto del archivo.
+
+Las filas validas se insertan por lotes: en PostgreSQL con COPY (mucho mas
+rapido que INSERT para miles de filas) y en las demas bases con un INSERT
+por lote (executemany). COPY no aplica los valores por defecto de los
+modelos, asi que cada fila se completa antes con los defaults de la tabla.
+"""
+
+import csv
+from itertools import chain
+from flask import current_app
+from sqlalchemy import insert
+from werkzeug.datastructures import MultiDict
+from app import db
+from app.forms.cliente_forms import ClienteForm
+from app.forms.pedido_forms import EditarPedidoForm
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services.contadores import invalidar_al_confirmar
+from app.services.tablero import invalidar_tablero
+from app.services.demanda import invalidar_demanda
+from app.services.productos import productos_de_nombres, invalidar_sugerencias
+from app.services.busqueda_clientes import invalidar_busqueda_clientes
+
+
+TIPOS = ('clientes', 'pedidos')
+
+COLUMNAS_CLIENTES = ('nombre', 'telefono', 'direccion', 'ruta', 'notas')
+COLUMNAS_PEDIDOS = ('cliente_id', 'cliente', 'ruta', 'producto_nombre', 'cantidad', 'unidad', 'notas_vendedor')
+
+# Columnas obligatorias en el encabezado (los pedidos llevan cliente_id o cliente)
+OBLIGATORIAS = {
+    'clientes': ('nombre', 'ruta'),
+    'pedidos': ('producto_nombre', 'cantidad'),
+}
+
+
+def _leer_filas(archivo):
+    """
+    Filas del CSV como dicts, con su numero de linea.
+    Acepta ',' o ';' como separador (Excel en castellano usa ';').
+
+    Yields:
+        (linea, fila)
+    """
+    encabezado = archivo.readline()
+    if not encabezado.strip():
+        raise ValueError('El archivo esta vacio')
+
+    separador = ';' if encabezado.count(';') > encabezado.count(',') else ','
+    lector = csv.reader(chain([encabezado], archivo), delimiter=separador)
+    columnas = [columna.strip().lower() for columna in next(lector)]
+
+    for fila in lector:
+        if not any(valor.strip() for valor in fila):
+            continue
+        yield lector.line_num, {
+            columna: valor.strip() for columna, valor in zip(columnas, fila)
+        }
+
+
+def _verificar_encabezado(tipo, fila):
+    """Error si faltan columnas obligatorias (se revisa con la primera fila)"""
+    faltantes = [columna for columna in OBLIGATORIAS[tipo] if columna not in fila]
+    if tipo == 'pedidos' and 'cliente_id' not in fila and 'cliente' not in fila:
+        faltantes.append('cliente_id o cliente')
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el CSV: {', '.join(faltantes)}")
+
+
+def _errores_formulario(form):
+    """Mensajes de error de un formulario validado, con el nombre del campo"""
+    return [
+        f'{campo}: {mensaje}'
+        for campo, mensajes in form.errors.items()
+        for mensaje in mensajes
+    ]
+
+
+def _valores_por_defecto(tabla):
+    """
+    Valores por defecto (del lado de Python) de las columnas de una tabla,
+    calculados una vez por lote: COPY e INSERT ... VALUES los necesitan
+    explicitos.
+    """
+    valores = {}
+    for columna in tabla.columns:
+        defecto = columna.default
+        if columna.primary_key or defecto is None:
+            continue
+        if defecto.is_scalar:
+            valores[columna.name] = defecto.arg
+        elif defecto.is_callable:
+            valores[columna.name] = defecto.arg(None)
+    return valores
+
+
+def _copiar(conexion, tabla, columnas, filas):
+    """COPY ... FROM STDIN de psycopg 3, dentro de la transaccion de la sesion"""
+    preparador = conexion.dialect.identifier_preparer
+    sentencia = 'COPY {} ({}) FROM STDIN'.format(
+        preparador.format_table(tabla),
+        ', '.join(preparador.quote(columna) for columna in columnas)
+    )
+    with conexion.connection.cursor() as cursor:
+        with cursor.copy(sentencia) as copia:
+            for fila in filas:
+                copia.write_row([fila[columna] for columna in columnas])
+
+
+def insertar_lote(tabla, filas):
+    """
+    Inserta un lote de filas (dicts) en la tabla.
+
+    Returns:
+        str: Metodo usado ('copy' o 'executemany')
+    """
+    defectos = _valores_por_defecto(tabla)
+    filas = [{**defectos, **fila} for fila in filas]
+    columnas = list(filas[0])
+
+    conexion = db.session.connection()
+    if conexion.dialect.name == 'postgresql' and conexion.dialect.driver == 'psycopg':
+        _copiar(conexion, tabla, columnas, filas)
+        return 'copy'
+
+    conexion.execute(insert(tabla), filas)
+    return 'executemany'
+
+
+# ============================================================
+# VALIDACION
+# ============================================================
+
+def validar_cliente(fila, creado_por_id):
+    """
+    Valida una fila de clientes con las reglas de ClienteForm.
+
+    Returns:
+        (valores, errores): dict para insertar (o None) y lista de mensajes
+    """
+    datos = {columna: fila.get(columna, '') for columna in COLUMNAS_CLIENTES}
+    form = ClienteForm(formdata=MultiDict(datos), meta={'csrf': False})
+    if not form.validate():
+        return None, _errores_formulario(form)
+
+    return {
+        'nombre': form.nombre.data,
+        'telefono': form.telefono.data or None,
+        'direccion': form.direccion.data or None,
+        'ruta': form.ruta.data,
+        'notas': form.notas.data or None,
+        'creado_por_id': creado_por_id,
+    }, []
+
+
+class BuscadorClientes:
+    """
+    Resuelve el cliente de cada linea de pedido (por cliente_id, o por
+    nombre y ruta) contra los clientes activos, leidos una sola vez.
+    """
+
+    def __init__(self):
+        filas = db.session.query(Cliente.id, Cliente.nombre, Cliente.ruta).filter(
+            Cliente.activo == True
+        ).all()
+        self.ids = {cliente_id for cliente_id, _, _ in filas}
+        self.por_nombre = {}
+        for cliente_id, nombre, ruta in filas:
+            self.por_nombre.setdefault(nombre.strip().lower(), []).append((cliente_id, ruta))
+
+    def buscar(self, fila):
+        """Retorna (cliente_id, error)"""
+        if fila.get('cliente_id'):
+            try:
+                cliente_id = int(fila['cliente_id'])
+            except ValueError:
+                return None, 'cliente_id: debe ser un numero'
+            if cliente_id not in self.ids:
+                return None, f'cliente_id: no existe un cliente activo con id {cliente_id}'
+            return cliente_id, None
+
+        nombre = fila.get('cliente', '')
+        if not nombre:
+            return None, 'cliente: falta el cliente (cliente_id o cliente)'
+
+        candidatos = self.por_nombre.get(nombre.lower(), [])
+        if fila.get('ruta'):
+            candidatos = [(cliente_id, ruta) for cliente_id, ruta in candidatos if ruta == fila['ruta']]
+        if not candidatos:
+            return None, f'cliente: no existe un cliente activo "{nombre}"'
+        if len(candidatos) > 1:
+            return None, f'cliente: hay varios clientes "{nombre}", indicar la ruta o cliente_id'
+        return candidatos[0][0], None
+
+
+def validar_pedido(fila, buscador):
+    """
+    Valida una linea de pedido con las reglas de EditarPedidoForm y
+    resuelve su cliente (el producto del catalogo se busca por lote, en
+    _completar_productos).
+
+    Returns:
+        (valores, errores): dict para insertar (o None) y lista de mensajes
+    """
+    datos = {
+        'producto_nombre': fila.get('producto_nombre', ''),
+        'cantidad': fila.get('cantidad', '').replace(',', '.'),
+        'unidad': fila.get('unidad', ''),
+        'notas_vendedor': fila.get('notas_vendedor', ''),
+    }
+    form = EditarPedidoForm(formdata=MultiDict(datos), meta={'csrf': False})
+    errores = [] if form.validate() else _errores_formulario(form)
+
+    cliente_id, error_cliente = buscador.buscar(fila)
+    if error_cliente:
+        errores.insert(0, error_cliente)
+    if errores:
+        return None, errores
+
+    return {
+        'cliente_id': cliente_id,
+        'producto_nombre': form.producto_nombre.data.strip(),
+        'cantidad': form.cantidad.data,
+        'unidad': form.unidad.data or 'unidades',
+        'notas_vendedor': form.notas_vendedor.data or None,
+    }, []
+
+
+def _completar_productos(filas):
+    """producto_id de cada linea del lote, con una sola busqueda en el catalogo"""
+    ids = productos_de_nombres({fila['producto_nombre'] for fila in filas})
+    for fila in filas:
+        fila['producto_id'] = ids[fila['producto_nombre']]
+
+
+# ============================================================
+# IMPORTACION
+# ============================================================
+
+def importar_csv(tipo, archivo, creado_por_id=None, tamano_lote=None, simular=False):
+    """
+    Importa un CSV de clientes o de pedidos.
+
+    Args:
+        tipo: 'clientes' o 'pedidos'
+        archivo: Archivo de texto abierto (newline='')
+        creado_por_id: Usuario que figura como creador de los clientes
+        tamano_lote: Filas por cada COPY/INSERT (por defecto TAMANO_LOTE_IMPORTACION)
+        simular: Si es True solo valida, sin insertar nada
+
+    Returns:
+        dict con 'tipo', 'leidas', 'importadas', 'metodo' y 'errores'
+        (lista de {'linea': n, 'errores': [...]})
+
+    Raises:
+        ValueError: Si el tipo es invalido o al CSV le faltan columnas
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo debe ser {' o '.join(TIPOS)}")
+    if tipo == 'clientes' and creado_por_id is None:
+        raise ValueError('Falta el usuario que crea los clientes')
+    if tamano_lote is None:
+        tamano_lote = current_app.config['TAMANO_LOTE_IMPORTACION']
+
+    if tipo == 'clientes':
+        tabla = Cliente.__table__
+        validar = lambda fila: validar_cliente(fila, creado_por_id)
+    else:
+        tabla = Pedido.__table__
+        buscador = BuscadorClientes()
+        validar = lambda fila: validar_pedido(fila, buscador)
+
+    resultado = {'tipo': tipo, 'leidas': 0, 'importadas': 0, 'metodo': None, 'errores': []}
+    lote = []
+
+    def volcar():
+        if not simular:
+            if tipo == 'pedidos':
+                _completar_productos(lote)
+            resultado['metodo'] = insertar_lote(tabla, lote)
+        resultado['importadas'] += len(lote)
+        lote.clear()
+
+    try:
+        for linea, fila in _leer_filas(archivo):
+            if resultado['leidas'] == 0:
+                _verificar_encabezado(tipo, fila)
+            resultado['leidas'] += 1
+
+            valores, errores = validar(fila)
+            if errores:
+                resultado['errores'].append({'linea': linea, 'errores': errores})
+                continue
+
+            lote.append(valores)
+            if len(lote) >= tamano_lote:
+                volcar()
+
+        if lote:
+            volcar()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if simular or not resultado['importadas']:
+        db.session.rollback()
+        return resultado
+
+    if tipo == 'pedidos':
+        # Los pedidos no pasan por el flush: contadores, tablero, demanda y sugerencias se descartan
+        invalidar_al_confirmar()
+        invalidar_tablero()
+        invalidar_demanda()
+        invalidar_sugerencias()
+    else:
+        # Los clientes tampoco pasan por el flush: el buscador se reconstruye
+        invalidar_busqueda_clientes()
+    db.session.commit()
+
+    return resultado
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Listado paginado de pedidos para /fabrica/api/pedidos.
+
+Pagina por cursor sobre (fecha_creacion, id), de los mas nuevos a los mas
+viejos: cada pagina pide las filas "anteriores al ultimo pedido visto" y
+usa el indice (fecha_creacion, id), en vez de un OFFSET que recorre todas
+las filas anteriores. El total se calcula solo en la primera pagina y en
+PostgreSQL es la estimacion del planificador (no un COUNT exacto).
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, tuple_
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.models.pedido_archivado import PedidoArchivado
+from app.services.serializacion import serializar_pedidos
+
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+# Claves de Pedido.to_dict que se pueden pedir con ?campos=
+CAMPOS_PEDIDO = (
+    'id', 'cliente_id', 'cliente_nombre', 'producto_nombre', 'producto_id', 'cantidad', 'unidad',
+    'estado', 'operario_id', 'operario_nombre', 'observaciones_fabrica', 'notas_vendedor',
+    'modificado', 'visto_por_fabrica', 'visto_por_vendedor', 'archivado', 'fecha_archivado',
+    'semana_archivado', 'fecha_creacion', 'fecha_actualizacion', 'fecha_completado',
+    'esperando_contestacion', 'version'
+)
+
+VALORES_SI = ('1', 'true', 'si', 'sí')
+VALORES_NO = ('0', 'false', 'no')
+
+
+def _booleano(args, nombre):
+    """Parametro booleano opcional (None si no vino)"""
+    valor = args.get(nombre)
+    if valor is None or valor == '':
+        return None
+    if valor.lower() in VALORES_SI:
+        return True
+    if valor.lower() in VALORES_NO:
+        return False
+    raise ValueError(f'{nombre} debe ser 1 o 0')
+
+
+def leer_fecha(args, nombre):
+    """Parametro de fecha (YYYY-MM-DD) o fecha y hora ISO opcional"""
+    valor = args.get(nombre)
+    if not valor:
+        return None, False
+    try:
+        return datetime.fromisoformat(valor), 'T' not in valor and ' ' not in valor
+    except ValueError:
+        raise ValueError(f'{nombre} debe ser una fecha ISO (YYYY-MM-DD)')
+
+
+def codificar_cursor(pedido):
+    """Cursor opaco con la posicion del ultimo pedido de la pagina"""
+    posicion = json.dumps([pedido.fecha_creacion.isoformat(), pedido.id])
+    return base64.urlsafe_b64encode(posicion.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (fecha_creacion, id) de un cursor"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pedido_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return datetime.fromisoformat(fecha), int(pedido_id)
+    except (ValueError, TypeError):
+        raise ValueError('cursor inválido')
+
+
+def leer_campos(args):
+    """Campos pedidos con ?campos=a,b (o ?fields=), o None para todos"""
+    texto = args.get('campos') or args.get('fields')
+    if not texto:
+        return None
+    campos = [campo.strip() for campo in texto.split(',') if campo.strip()]
+    desconocidos = [campo for campo in campos if campo not in CAMPOS_PEDIDO]
+    if desconocidos:
+        raise ValueError(f"campos desconocidos: {', '.join(desconocidos)}")
+    return campos
+
+
+def consulta_filtrada(args):
+    """
+    Sentencia SELECT de pedidos con los filtros de la URL (sin orden ni limite).
+
+    Filtros: archivado (por defecto 0: pedidos activos), semana (una semana
+    archivada), estado, cliente_id, ruta, operario_id, modificado, desde y
+    hasta (fecha_creacion; una fecha sin hora en 'hasta' incluye todo ese dia).
+
+    Returns:
+        (modelo, consulta): Pedido o PedidoArchivado, y el SELECT de ese modelo
+    """
+    semana = args.get('semana')
+    modelo = PedidoArchivado if semana or _booleano(args, 'archivado') else Pedido
+    consulta = select(modelo)
+
+    if semana:
+        consulta = consulta.where(PedidoArchivado.semana_archivado == semana)
+
+    estado = args.get('estado')
+    if estado:
+        consulta = consulta.where(modelo.estado == estado)
+
+    cliente_id = args.get('cliente_id', type=int)
+    if cliente_id:
+        consulta = consulta.where(modelo.cliente_id == cliente_id)
+
+    ruta = args.get('ruta')
+    if ruta:
+        consulta = consulta.where(modelo.cliente_id.in_(select(Cliente.id).where(Cliente.ruta == ruta)))
+
+    operario_id = args.get('operario_id', type=int)
+    if operario_id:
+        consulta = consulta.where(modelo.operario_id == operario_id)
+
+    modificado = _booleano(args, 'modificado')
+    if modificado is not None:
+        consulta = consulta.where(modelo.modificado == modificado)
+
+    desde, _ = leer_fecha(args, 'desde')
+    if desde:
+        consulta = consulta.where(modelo.fecha_creacion >= desde)
+
+    hasta, solo_dia = leer_fecha(args, 'hasta')
+    if hasta:
+        if solo_dia:
+            consulta = consulta.where(modelo.fecha_creacion < hasta + timedelta(days=1))
+        else:
+            consulta = consulta.where(modelo.fecha_creacion <= hasta)
+
+    return modelo, consulta
+
+
+def estimar_total(consulta):
+    """
+    Cantidad de filas de la consulta. En PostgreSQL usa la estimacion del
+    planificador (EXPLAIN), que no recorre la tabla.
+
+    Returns:
+        (total, estimado)
+    """
+    conexion = db.session.connection()
+    dialecto = conexion.dialect
+
+    if dialecto.name == 'postgresql':
+        compilada = consulta.compile(dialect=dialecto)
+        plan = conexion.exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {compilada.string}', compilada.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+    total = db.session.execute(select(func.count()).select_from(consulta.subquery())).scalar()
+    return total, False
+
+
+def listar_pedidos(args):
+    """
+    Una pagina de pedidos segun los parametros de la URL.
+
+    Parametros: los filtros de consulta_filtrada, limite (hasta
+    LIMITE_MAXIMO), cursor (el 'siguiente' de la pagina anterior) y campos.
+
+    Returns:
+        dict con 'pedidos', 'siguiente' (cursor o None si no hay mas) y,
+        solo en la primera pagina, 'total' y 'total_estimado'
+
+    Raises:
+        ValueError: Si algun parametro es invalido
+    """
+    limite = args.get('limite', LIMITE_POR_DEFECTO, type=int)
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    campos = leer_campos(args)
+    cursor = args.get('cursor')
+
+    modelo, consulta = consulta_filtrada(args)
+
+    respuesta = {}
+    if not cursor:
+        respuesta['total'], respuesta['total_estimado'] = estimar_total(consulta)
+
+    pagina = consulta
+    if cursor:
+        fecha, pedido_id = decodificar_cursor(cursor)
+        pagina = pagina.where(tuple_(modelo.fecha_creacion, modelo.id) < tuple_(fecha, pedido_id))
+
+    # Una fila de mas para saber si hay otra pagina
+    pedidos = db.session.scalars(
+        pagina.order_by(modelo.fecha_creacion.desc(), modelo.id.desc()).limit(limite + 1)
+    ).all()
+    hay_mas = len(pedidos) > limite
+    pedidos = pedidos[:limite]
+
+    datos = serializar_pedidos(pedidos)
+    if campos:
+        datos = [{campo: dato[campo] for campo in campos} for dato in datos]
+
+    respuesta['pedidos'] = datos
+    respuesta['siguiente'] = codificar_cursor(pedidos[-1]) if hay_mas else None
+    return respuesta
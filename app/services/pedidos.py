@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Alta de pedidos.
+
+Un pedido del formulario puede traer muchas lineas (productos[]). Todas las
+lineas se insertan con un solo INSERT ... RETURNING (SQLAlchemy agrupa los
+valores en una sola sentencia), en lugar de un INSERT por linea.
+"""
+
+from sqlalchemy import insert
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services.contadores import anotar_pedidos_nuevos
+from app.services.tablero import marcar_clientes
+from app.services.demanda import sumar_pedidos_nuevos
+from app.services.productos import sumar_usos_nuevos
+
+
+def crear_pedidos(cliente_id, lineas):
+    """
+    Inserta las lineas de pedido de un cliente. No confirma la transaccion.
+
+    Args:
+        cliente_id: Cliente de todas las lineas
+        lineas: Lista de dicts con 'producto_nombre', 'cantidad', 'unidad'
+                y 'notas_vendedor'
+
+    Returns:
+        list: Los Pedido creados, ordenados por id
+    """
+    if not lineas:
+        return []
+
+    filas = [
+        {
+            'cliente_id': cliente_id,
+            'estado': 'pendiente',
+            'modificado': False,
+            'visto_por_fabrica': False,
+            'esperando_contestacion': False,
+            **linea
+        }
+        for linea in lineas
+    ]
+
+    # Sin sort_by_parameter_order: en SQLite obligaria a un INSERT por fila.
+    # Los ids se asignan en el orden de las lineas, asi que se ordena por id.
+    pedidos = db.session.scalars(insert(Pedido).returning(Pedido), filas).all()
+
+    # El INSERT masivo no pasa por el flush: contadores, tablero, demanda y sugerencias se anotan a mano
+    anotar_pedidos_nuevos(pedidos, db.session.get(Cliente, cliente_id))
+    marcar_clientes([cliente_id])
+    sumar_pedidos_nuevos(pedidos)
+    sumar_usos_nuevos(pedidos)
+
+    return sorted(pedidos, key=lambda pedido: pedido.id)
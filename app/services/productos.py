@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+Sugerencias de productos para la carga de pedidos.
+
+Los nombres salen del catalogo (Producto disponibles) y de lo que ya se
+escribio en pedidos: los activos y el historial de `resumen_semanas`
+(por_producto), asi no hace falta recorrer `pedidos_archivo`. Las
+variantes de un nombre se juntan con app.utils.normalizar; se muestra el
+nombre del catalogo o, si no esta, la forma mas usada.
+
+El indice vive en memoria del proceso:
+  - palabras ordenadas, para buscar por prefijo con bisect
+  - trigramas -> nombres, para encontrar texto en el medio o con errores
+
+Los cambios del catalogo y los nombres de los pedidos creados, editados o
+eliminados se aplican al confirmar (listeners de la sesion, como en
+contadores). Cada SUGERENCIAS_TTL segundos el indice se reconstruye desde
+la base en un hilo aparte (cambios de otros procesos, cierres, purgas);
+mientras tanto se sigue usando el anterior, asi la carga de pedidos nunca
+espera la reconstruccion. El primer indice lo arma la primera busqueda de
+sugerencias; hasta entonces los ids de producto se buscan en el catalogo.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from itertools import count
+from flask import current_app
+from sqlalchemy import func, inspect, select
+from app import db
+from app.models.pedido import Pedido
+from app.models.producto import Producto
+from app.models.resumen_semana import ResumenSemana
+from app.services.contadores import valores_pedido
+from app.services._cambios_sesion import registrar_cache
+from app.utils import normalizar
+
+
+# Parecido minimo (trigramas de la consulta presentes en el nombre)
+PARECIDO_MINIMO = 0.5
+
+# 'construyendo': cambios confirmados mientras se arma un indice nuevo (None si no se esta armando)
+_estado = {'indice': None, 'vence': 0.0, 'construyendo': None}
+_candado = threading.Lock()
+
+# Marcas crecientes para ordenar transacciones y reconstrucciones entre si
+_reloj = count()
+
+
+def _trigramas(clave):
+    texto = f'  {clave} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceProductos:
+    """Nombres de producto con sus usos, buscables por prefijo y trigramas"""
+
+    def __init__(self):
+        self.entradas = {}                    # clave -> entrada
+        self._palabras = []                   # (palabra, clave), ordenada
+        self._trigramas = defaultdict(set)    # trigrama -> claves
+
+    # ---- Mantenimiento ----
+
+    def _entrada(self, clave):
+        entrada = self.entradas.get(clave)
+        if entrada is None:
+            entrada = self.entradas[clave] = {
+                'formas': Counter(), 'usos': 0, 'producto_id': None, 'catalogo': None, 'unidad': None
+            }
+            for palabra in set(clave.split()):
+                insort(self._palabras, (palabra, clave))
+            for trigrama in _trigramas(clave):
+                self._trigramas[trigrama].add(clave)
+        return entrada
+
+    def _quitar_si_vacia(self, clave):
+        entrada = self.entradas.get(clave)
+        if entrada is None or entrada['usos'] > 0 or entrada['producto_id'] is not None:
+            return
+        del self.entradas[clave]
+        for palabra in set(clave.split()):
+            posicion = bisect_left(self._palabras, (palabra, clave))
+            if posicion < len(self._palabras) and self._palabras[posicion] == (palabra, clave):
+                del self._palabras[posicion]
+        for trigrama in _trigramas(clave):
+            claves = self._trigramas.get(trigrama)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._trigramas[trigrama]
+
+    def sumar_usos(self, nombre, usos):
+        """Suma (o resta, si `usos` es negativo) usos de un nombre"""
+        clave = normalizar(nombre)
+        if clave:
+            entrada = self._entrada(clave)
+            forma = nombre.strip()
+            entrada['formas'][forma] += usos
+            if entrada['formas'][forma] <= 0:
+                del entrada['formas'][forma]
+            entrada['usos'] += usos
+            self._quitar_si_vacia(clave)
+
+    def poner_producto(self, producto_id, nombre, unidad):
+        clave = normalizar(nombre)
+        if clave:
+            entrada = self._entrada(clave)
+            entrada.update(producto_id=producto_id, catalogo=nombre.strip(), unidad=unidad)
+
+    def quitar_producto(self, producto_id, nombre):
+        clave = normalizar(nombre)
+        entrada = self.entradas.get(clave)
+        if entrada is not None and entrada['producto_id'] == producto_id:
+            entrada.update(producto_id=None, catalogo=None, unidad=None)
+            self._quitar_si_vacia(clave)
+
+    # ---- Consulta ----
+
+    def producto_id(self, nombre):
+        entrada = self.entradas.get(normalizar(nombre))
+        return entrada['producto_id'] if entrada else None
+
+    def _sugerencia(self, clave):
+        entrada = self.entradas[clave]
+        return {
+            'nombre': entrada['catalogo'] or entrada['formas'].most_common(1)[0][0],
+            'producto_id': entrada['producto_id'],
+            'unidad': entrada['unidad'],
+            'usos': entrada['usos'],
+        }
+
+    def _por_prefijo(self, palabra):
+        """Claves con alguna palabra que empieza con `palabra`"""
+        claves = set()
+        posicion = bisect_left(self._palabras, (palabra, ''))
+        while posicion < len(self._palabras) and self._palabras[posicion][0].startswith(palabra):
+            claves.add(self._palabras[posicion][1])
+            posicion += 1
+        return claves
+
+    def buscar(self, texto, limite):
+        """
+        Sugerencias para lo escrito, de mejor a peor: nombres que empiezan
+        con el texto, nombres con palabras que empiezan con cada palabra
+        del texto y nombres parecidos (trigramas). Dentro de cada grupo
+        primero el catalogo y despues los mas usados.
+        """
+        consulta = normalizar(texto)
+        orden = lambda clave: (
+            self.entradas[clave]['producto_id'] is None, -self.entradas[clave]['usos'], clave
+        )
+        if not consulta:
+            return [self._sugerencia(clave) for clave in sorted(self.entradas, key=orden)[:limite]]
+
+        palabras = consulta.split()
+        candidatas = self._por_prefijo(palabras[0])
+        for palabra in palabras[1:]:
+            candidatas &= self._por_prefijo(palabra)
+
+        grupos = {clave: 0 if clave.startswith(consulta) else 1 for clave in candidatas}
+
+        if len(grupos) < limite:
+            buscados = _trigramas(consulta)
+            coincidencias = Counter()
+            for trigrama in buscados:
+                coincidencias.update(self._trigramas.get(trigrama, ()))
+            for clave, cantidad in coincidencias.items():
+                if clave not in grupos and cantidad / len(buscados) >= PARECIDO_MINIMO:
+                    grupos[clave] = 2
+
+        claves = sorted(grupos, key=lambda clave: (grupos[clave], *orden(clave)))
+        return [self._sugerencia(clave) for clave in claves[:limite]]
+
+
+# ============================================================
+# CONSTRUCCION
+# ============================================================
+
+def construir_indice():
+    """Indice completo: catalogo, pedidos activos y resumenes semanales"""
+    indice = IndiceProductos()
+
+    activos = db.session.query(
+        Pedido.producto_nombre, func.count(Pedido.id)
+    ).group_by(Pedido.producto_nombre)
+    for nombre, usos in activos:
+        indice.sumar_usos(nombre, usos)
+
+    for por_producto in db.session.scalars(select(ResumenSemana.por_producto)):
+        for nombre, usos in (por_producto or {}).items():
+            indice.sumar_usos(nombre, usos)
+
+    catalogo = db.session.query(Producto.id, Producto.nombre, Producto.unidad).filter(
+        Producto.disponible == True
+    )
+    for producto_id, nombre, unidad in catalogo:
+        indice.poner_producto(producto_id, nombre, unidad)
+
+    return indice
+
+
+def _construir():
+    """
+    Arma el indice y retorna (indice, inicio, fin): marcas de antes de la
+    primera consulta y de despues de la ultima.
+    """
+    inicio = next(_reloj)
+    indice = construir_indice()
+    return indice, inicio, next(_reloj)
+
+
+def _instalar(construido, ttl):
+    """
+    Reemplaza el indice, con los cambios confirmados mientras se armaba.
+
+    Solo se aplican las transacciones que empezaron a anotar cambios despues
+    de la ultima consulta (el indice nuevo no las vio); las confirmadas antes
+    de la primera ya estan en lo que se leyo. De las que se cruzaron con la
+    lectura no se sabe que vio cada consulta: no se aplican y el indice vence,
+    para volver a armarse en la proxima busqueda.
+    """
+    indice, inicio, fin = construido
+    with _candado:
+        vence = time.monotonic() + ttl
+        for pendientes in _estado['construyendo'] or ():
+            if pendientes['confirmado'] < inicio:
+                continue
+            if pendientes['desde'] > fin:
+                _aplicar(indice, pendientes)
+            else:
+                vence = 0.0
+            if pendientes['invalidar']:
+                vence = 0.0
+        _estado.update(indice=indice, vence=vence, construyendo=None)
+
+
+def _reconstruir(app):
+    """Arma el indice en un hilo aparte"""
+    try:
+        with app.app_context():
+            construido = _construir()
+    except Exception:
+        app.logger.exception('No se pudo reconstruir el indice de productos')
+        with _candado:
+            _estado['construyendo'] = None
+        return
+    _instalar(construido, app.config['SUGERENCIAS_TTL'])
+
+
+def _indice(esperar=True):
+    """
+    Indice vigente. Si vencio se sigue usando y se reconstruye en otro hilo.
+    Si todavia no hay indice: con `esperar` se arma en el momento, si no se
+    retorna None (lo arma la primera busqueda de sugerencias).
+    """
+    app = current_app._get_current_object()
+    with _candado:
+        indice = _estado['indice']
+        if indice is None:
+            if not esperar:
+                return None
+            if _estado['construyendo'] is None:
+                _estado['construyendo'] = []
+        else:
+            if _estado['vence'] <= time.monotonic() and _estado['construyendo'] is None:
+                _estado['construyendo'] = []
+                threading.Thread(target=_reconstruir, args=(app,), daemon=True).start()
+            return indice
+
+    _instalar(_construir(), app.config['SUGERENCIAS_TTL'])
+    with _candado:
+        return _estado['indice']
+
+
+def sugerir_productos(texto, limite=10):
+    """
+    Sugerencias de producto para lo que se esta escribiendo.
+
+    Returns:
+        Lista de {'nombre', 'producto_id', 'unidad', 'usos'}; sin texto,
+        los productos del catalogo y los mas pedidos.
+    """
+    indice = _indice()
+    with _candado:
+        return indice.buscar(texto, limite)
+
+
+def productos_de_nombres(nombres):
+    """
+    Id del producto del catalogo de cada nombre (sin distinguir mayusculas,
+    acentos ni espacios). No arma el indice: si todavia no esta, todos los
+    nombres se comparan con el catalogo leido en una sola consulta, asi
+    un pedido de varias lineas o un lote de importacion la hace una vez.
+
+    Returns:
+        {nombre: producto_id o None}
+    """
+    indice = _indice(esperar=False)
+    if indice is not None:
+        with _candado:
+            return {nombre: indice.producto_id(nombre) for nombre in nombres}
+
+    por_clave = {}
+    catalogo = db.session.query(Producto.id, Producto.nombre).filter(
+        Producto.disponible == True
+    ).order_by(Producto.id)
+    for producto_id, nombre_producto in catalogo:
+        por_clave.setdefault(normalizar(nombre_producto), producto_id)
+    return {nombre: por_clave.get(normalizar(nombre)) for nombre in nombres}
+
+
+def producto_del_nombre(nombre):
+    """Id del producto del catalogo con ese nombre, o None (ver productos_de_nombres)"""
+    return productos_de_nombres([nombre])[nombre]
+
+
+def sumar_usos_nuevos(pedidos):
+    """Suma los nombres de pedidos insertados sin pasar por el flush del ORM. Se aplica al confirmar."""
+    for pedido in pedidos:
+        _anotar_uso(db.session, valores_pedido(inspect(pedido), nuevo=True, campos=CAMPOS_USOS), 1)
+
+
+def invalidar_sugerencias():
+    """Reconstruye el indice despues de confirmar (importacion de pedidos)"""
+    _pendientes()['invalidar'] = True
+
+
+# ============================================================
+# CAMBIOS DEL CATALOGO Y DE LOS PEDIDOS
+# ============================================================
+
+CAMPOS_USOS = ('producto_nombre',)
+
+
+def _valores_producto(estado, anteriores=False):
+    """(id, nombre, unidad, disponible) antes o despues del flush, o None si no estan cargados"""
+    valores = []
+    for campo in ('id', 'nombre', 'unidad', 'disponible'):
+        historial = estado.attrs[campo].history
+        if anteriores and historial.deleted:
+            valores.append(historial.deleted[0])
+        elif campo in estado.dict:
+            valores.append(estado.dict[campo])
+        else:
+            return None
+    return tuple(valores)
+
+
+def _anotar(session, antes, despues):
+    """
+    Anota un cambio (antes, despues); False si el producto no existia o ya
+    no existe. Si faltan valores el indice se reconstruye al confirmar.
+    """
+    pendientes = _pendientes(session)
+    if antes is None or despues is None:
+        pendientes['invalidar'] = True
+    else:
+        pendientes['cambios'].append((antes, despues))
+
+
+def _anotar_uso(session, valores, usos):
+    """Anota usos de un nombre de pedido; si no se conoce el nombre se reconstruye al confirmar"""
+    pendientes = _pendientes(session)
+    if valores is None:
+        pendientes['invalidar'] = True
+    elif valores['producto_nombre']:
+        pendientes['usos'][valores['producto_nombre']] += usos
+
+
+def _registrar_cambios(session):
+    """Productos y pedidos creados, modificados o eliminados en el flush"""
+    for objeto in session.new:
+        if isinstance(objeto, Producto):
+            _anotar(session, False, _valores_producto(inspect(objeto)))
+        elif isinstance(objeto, Pedido):
+            _anotar_uso(session, valores_pedido(inspect(objeto), nuevo=True, campos=CAMPOS_USOS), 1)
+
+    for objeto in session.dirty:
+        if not session.is_modified(objeto):
+            continue
+        if isinstance(objeto, Producto):
+            estado = inspect(objeto)
+            _anotar(session, _valores_producto(estado, anteriores=True), _valores_producto(estado))
+        elif isinstance(objeto, Pedido):
+            estado = inspect(objeto)
+            antes = valores_pedido(estado, anteriores=True, campos=CAMPOS_USOS)
+            despues = valores_pedido(estado, campos=CAMPOS_USOS)
+            if antes != despues:
+                _anotar_uso(session, antes, -1)
+                _anotar_uso(session, despues, 1)
+
+    for objeto in session.deleted:
+        if isinstance(objeto, Producto):
+            _anotar(session, _valores_producto(inspect(objeto), anteriores=True), False)
+        elif isinstance(objeto, Pedido):
+            _anotar_uso(session, valores_pedido(inspect(objeto), anteriores=True, campos=CAMPOS_USOS), -1)
+
+
+def _aplicar(indice, pendientes):
+    """Aplica al indice los cambios de una transaccion"""
+    for antes, despues in pendientes['cambios']:
+        if antes:
+            indice.quitar_producto(antes[0], antes[1])
+        if despues and despues[3]:
+            indice.poner_producto(despues[0], despues[1], despues[2])
+    for nombre, usos in pendientes['usos'].items():
+        if usos:
+            indice.sumar_usos(nombre, usos)
+
+
+def _aplicar_cambios(pendientes):
+    """
+    Aplica al indice los cambios confirmados. Si falta algun valor, el
+    indice vence y se reconstruye en otro hilo en la proxima consulta.
+    """
+    with _candado:
+        pendientes['confirmado'] = next(_reloj)
+        if _estado['construyendo'] is not None:
+            _estado['construyendo'].append(pendientes)
+        if _estado['indice'] is None:
+            return
+        _aplicar(_estado['indice'], pendientes)
+        if pendientes['invalidar']:
+            _estado['vence'] = 0.0
+
+
+def _cambios_vacios():
+    """Cambios de una transaccion; 'desde' es la marca del primer cambio anotado"""
+    return {'cambios': [], 'usos': Counter(), 'invalidar': False, 'desde': next(_reloj)}
+
+
+_pendientes = registrar_cache('productos', _cambios_vacios, _registrar_cambios, _aplicar_cambios)
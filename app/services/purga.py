@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Eliminacion de pedidos archivados antiguos.
+
+Se usa desde la ruta /ventas/limpiar-pedidos-antiguos, desde el comando
+`flask limpiar-pedidos` y desde el script limpiar_pedidos_antiguos.py.
+Borra de `pedidos_archivo` en lotes acotados y confirma entre lotes para
+no bloquear la tabla durante mucho tiempo. Cada lote se resta del resumen
+de su semana en la misma transaccion que lo borra.
+"""
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, tuple_
+from app import db
+from app.models.pedido_archivado import PedidoArchivado
+from app.services.cache_semanas import invalidar_semanas
+from app.services.semanas import restar_del_resumen
+
+
+def _condicion_antiguos(fecha_limite):
+    """Condicion de los pedidos archivados antes de la fecha limite"""
+    return PedidoArchivado.fecha_archivado < fecha_limite
+
+
+def resumen_por_semana(fecha_limite):
+    """
+    Cuenta los pedidos a eliminar agrupados por semana, en una sola consulta.
+
+    Returns:
+        {semana: cantidad} ordenado por nombre de semana
+    """
+    filas = db.session.query(
+        PedidoArchivado.semana_archivado,
+        func.count(PedidoArchivado.id)
+    ).filter(
+        _condicion_antiguos(fecha_limite)
+    ).group_by(
+        PedidoArchivado.semana_archivado
+    ).all()
+
+    return {
+        (semana or 'Sin semana'): cantidad
+        for semana, cantidad in sorted(filas, key=lambda fila: fila[0] or '')
+    }
+
+
+def purgar_pedidos_antiguos(dias_retencion=None, tamano_lote=None, simular=False):
+    """
+    Elimina los pedidos archivados hace mas de `dias_retencion` dias.
+
+    Args:
+        dias_retencion: Dias que se conservan (por defecto DIAS_RETENCION_ARCHIVO)
+        tamano_lote: Pedidos por cada DELETE (por defecto TAMANO_LOTE_PURGA)
+        simular: Si es True solo calcula el resumen, sin borrar nada
+
+    Returns:
+        dict con 'fecha_limite', 'semanas' ({semana: cantidad}),
+        'total' (pedidos encontrados) y 'total_eliminados'
+    """
+    if dias_retencion is None:
+        dias_retencion = current_app.config['DIAS_RETENCION_ARCHIVO']
+    if tamano_lote is None:
+        tamano_lote = current_app.config['TAMANO_LOTE_PURGA']
+
+    fecha_limite = datetime.utcnow() - timedelta(days=dias_retencion)
+    semanas = resumen_por_semana(fecha_limite)
+
+    resultado = {
+        'fecha_limite': fecha_limite,
+        'semanas': semanas,
+        'total': sum(semanas.values()),
+        'total_eliminados': 0
+    }
+
+    if simular or not semanas:
+        return resultado
+
+    # Borrar por lotes de claves (id, semana), confirmando entre cada lote
+    while True:
+        claves = [
+            tuple(fila) for fila in db.session.query(
+                PedidoArchivado.id, PedidoArchivado.semana_archivado
+            ).filter(
+                _condicion_antiguos(fecha_limite)
+            ).order_by(PedidoArchivado.id).limit(tamano_lote)
+        ]
+        if not claves:
+            break
+
+        en_lote = tuple_(PedidoArchivado.id, PedidoArchivado.semana_archivado).in_(claves)
+        try:
+            restar_del_resumen(en_lote)
+            db.session.execute(
+                delete(PedidoArchivado).where(en_lote).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        resultado['total_eliminados'] += len(claves)
+
+    # Las paginas guardadas de esas semanas ya no valen
+    invalidar_semanas(semanas)
+
+    return resultado
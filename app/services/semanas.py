@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Semanas archivadas: cierre de semana (mueve todos los pedidos activos a la
+tabla `pedidos_archivo` de una sola vez), resumen de cada semana
+(`resumen_semanas`) y consultas del historial.
+"""
+
+import re
+from datetime import datetime
+from sqlalchemy import delete, func, insert, literal, select, text
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.models.pedido_archivado import PedidoArchivado
+from app.models.resumen_semana import ResumenSemana
+from app.services.contadores import invalidar_al_confirmar
+from app.services.tablero import invalidar_tablero
+from app.services.demanda import invalidar_demanda
+from app.services.cache_semanas import invalidar_semanas
+
+
+# Letra de cada mes para el nombre de la semana
+MESES_LETRAS = {
+    1: 'E',   # Enero
+    2: 'F',   # Febrero
+    3: 'M',   # Marzo
+    4: 'A',   # Abril
+    5: 'MY',  # Mayo
+    6: 'JN',  # Junio
+    7: 'JL',  # Julio
+    8: 'AG',  # Agosto
+    9: 'S',   # Septiembre
+    10: 'O',  # Octubre
+    11: 'N',  # Noviembre
+    12: 'D'   # Diciembre
+}
+
+# Clave del advisory lock de PostgreSQL que serializa los cierres
+CLAVE_LOCK_CIERRE = 72019001
+
+# Estados con columna propia en resumen_semanas
+ESTADOS_RESUMEN = {'pendiente': 'pendientes', 'completado': 'completados', 'cancelado': 'cancelados'}
+
+
+def nombre_semana(fecha):
+    """
+    Genera el nombre de la semana para una fecha.
+    Formato: Semana YYYY-#L (ej: Semana 2026-1F)
+    """
+    numero_semana_mes = ((fecha.day - 1) // 7) + 1
+    return f"Semana {fecha.year}-{numero_semana_mes}{MESES_LETRAS[fecha.month]}"
+
+
+def nombre_particion(semana):
+    """Nombre de la particion de PostgreSQL para una semana"""
+    return 'pedidos_archivo_' + re.sub(r'[^a-z0-9]+', '_', semana.lower()).strip('_')
+
+
+def crear_particion(semana):
+    """
+    Crea (si no existe) la particion de `pedidos_archivo` para la semana.
+    Solo aplica en PostgreSQL.
+    """
+    valor = semana.replace("'", "''")
+    db.session.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{nombre_particion(semana)}" '
+        f"PARTITION OF pedidos_archivo FOR VALUES IN ('{valor}')"
+    ))
+
+
+def _columnas_archivo():
+    """Nombres de columna que se copian de `pedidos` a `pedidos_archivo`"""
+    return [
+        columna.name for columna in PedidoArchivado.__table__.columns
+        if columna.name not in ('fecha_archivado', 'semana_archivado')
+    ]
+
+
+def _mover_pedidos(semana, fecha_archivado, dialecto):
+    """
+    Copia los pedidos activos a `pedidos_archivo` y los borra de `pedidos`.
+
+    En PostgreSQL es una sola sentencia (DELETE ... RETURNING dentro de un
+    INSERT ... SELECT). En otros motores se toman los ids primero y se copian
+    y borran exactamente esos ids, dentro de la misma transaccion.
+
+    Returns:
+        Cantidad de pedidos archivados
+    """
+    columnas = _columnas_archivo()
+    destino = columnas + ['fecha_archivado', 'semana_archivado']
+    extras = [literal(fecha_archivado).label('fecha_archivado'), literal(semana).label('semana_archivado')]
+
+    if dialecto.name == 'postgresql':
+        crear_particion(semana)
+
+        movidos = delete(Pedido).returning(
+            *[Pedido.__table__.c[nombre] for nombre in columnas]
+        ).cte('movidos')
+
+        sentencia = insert(PedidoArchivado).from_select(
+            destino,
+            select(*[movidos.c[nombre] for nombre in columnas], *extras)
+        ).returning(PedidoArchivado.id)
+
+        return len(db.session.execute(sentencia).all())
+
+    ids = [fila.id for fila in db.session.query(Pedido.id)]
+    if not ids:
+        return 0
+
+    # Si otro cierre movio esos ids mientras tanto, el INSERT no copia nada
+    copiados = db.session.execute(insert(PedidoArchivado).from_select(
+        destino,
+        select(*[Pedido.__table__.c[nombre] for nombre in columnas], *extras).where(Pedido.id.in_(ids))
+    )).rowcount
+    db.session.execute(
+        delete(Pedido).where(Pedido.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    return copiados
+
+
+def cerrar_semana():
+    """
+    Mueve todos los pedidos activos a la tabla de archivo.
+
+    En PostgreSQL los cierres se serializan con un advisory lock. Lo que
+    hace idempotente al cierre es lo que mueve: un segundo cierre (doble
+    click) ya no encuentra pedidos activos y no archiva nada; si se cargaron
+    pedidos despues del primero, se archivan en la misma semana.
+
+    Returns:
+        dict con 'semana', 'total_archivados' y 'duplicado'
+    """
+    fecha_actual = datetime.utcnow()
+    semana = nombre_semana(fecha_actual)
+    dialecto = db.session.get_bind().dialect
+
+    try:
+        if dialecto.name == 'postgresql':
+            db.session.execute(
+                text('SELECT pg_advisory_xact_lock(:clave)'),
+                {'clave': CLAVE_LOCK_CIERRE}
+            )
+
+        total_archivados = _mover_pedidos(semana, fecha_actual, dialecto)
+        if not total_archivados:
+            # Nada nuevo desde el ultimo cierre: si fue en esta semana, es un cierre repetido
+            duplicado = db.session.get(ResumenSemana, semana) is not None
+            db.session.rollback()
+            return {'semana': semana, 'total_archivados': 0, 'duplicado': duplicado}
+
+        sumar_cierre_al_resumen(semana, fecha_actual)
+        invalidar_al_confirmar()  # Ya no quedan pedidos activos
+        invalidar_tablero()
+        invalidar_demanda()
+        db.session.commit()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Un segundo cierre en la misma semana le agrega pedidos
+    invalidar_semanas([semana])
+
+    return {'semana': semana, 'total_archivados': total_archivados, 'duplicado': False}
+
+
+# ============================================================
+# RESUMEN DE SEMANAS
+# ============================================================
+
+def _agregados_archivo(condicion):
+    """
+    Pedidos archivados que cumplen la condicion, agrupados por semana,
+    estado, ruta y producto (una sola consulta).
+    """
+    return db.session.query(
+        PedidoArchivado.semana_archivado,
+        PedidoArchivado.estado,
+        Cliente.ruta,
+        PedidoArchivado.producto_nombre,
+        func.count(PedidoArchivado.id).label('total'),
+        func.min(PedidoArchivado.fecha_archivado).label('primer_cierre'),
+        func.max(PedidoArchivado.fecha_archivado).label('ultimo_cierre'),
+        func.min(PedidoArchivado.fecha_creacion).label('primer_pedido'),
+        func.max(PedidoArchivado.fecha_creacion).label('ultimo_pedido'),
+    ).outerjoin(
+        Cliente, Cliente.id == PedidoArchivado.cliente_id
+    ).filter(
+        condicion
+    ).group_by(
+        PedidoArchivado.semana_archivado, PedidoArchivado.estado, Cliente.ruta, PedidoArchivado.producto_nombre
+    ).all()
+
+
+def _minimo(actual, nuevo):
+    return nuevo if actual is None or (nuevo is not None and nuevo < actual) else actual
+
+
+def _maximo(actual, nuevo):
+    return nuevo if actual is None or (nuevo is not None and nuevo > actual) else actual
+
+
+def _sumar_al_resumen(filas):
+    """Suma las filas de _agregados_archivo a los resumenes de sus semanas"""
+    resumenes = {}
+    for fila in filas:
+        resumen = resumenes.get(fila.semana_archivado)
+        if resumen is None:
+            resumen = db.session.get(ResumenSemana, fila.semana_archivado)
+            if resumen is None:
+                resumen = ResumenSemana(
+                    semana=fila.semana_archivado, total_pedidos=0, pendientes=0,
+                    completados=0, cancelados=0, por_ruta={}, por_producto={}
+                )
+                db.session.add(resumen)
+            # Copias: el ORM detecta el cambio de un JSON al reasignarlo
+            resumen.por_ruta = dict(resumen.por_ruta)
+            resumen.por_producto = dict(resumen.por_producto)
+            resumenes[fila.semana_archivado] = resumen
+
+        resumen.total_pedidos += fila.total
+        columna = ESTADOS_RESUMEN.get(fila.estado)
+        if columna:
+            setattr(resumen, columna, getattr(resumen, columna) + fila.total)
+
+        ruta = fila.ruta or 'Sin ruta'
+        resumen.por_ruta[ruta] = resumen.por_ruta.get(ruta, 0) + fila.total
+        resumen.por_producto[fila.producto_nombre] = resumen.por_producto.get(fila.producto_nombre, 0) + fila.total
+
+        resumen.primer_cierre = _minimo(resumen.primer_cierre, fila.primer_cierre)
+        resumen.ultimo_cierre = _maximo(resumen.ultimo_cierre, fila.ultimo_cierre)
+        resumen.primer_pedido = _minimo(resumen.primer_pedido, fila.primer_pedido)
+        resumen.ultimo_pedido = _maximo(resumen.ultimo_pedido, fila.ultimo_pedido)
+
+
+def sumar_cierre_al_resumen(semana, fecha_archivado):
+    """
+    Suma al resumen de la semana los pedidos recien archivados (los de este
+    cierre tienen su fecha_archivado). Va en la transaccion del cierre.
+    """
+    _sumar_al_resumen(_agregados_archivo(db.and_(
+        PedidoArchivado.semana_archivado == semana,
+        PedidoArchivado.fecha_archivado == fecha_archivado
+    )))
+
+
+def restar_del_resumen(condicion):
+    """
+    Resta de los resumenes los pedidos archivados que cumplen la condicion
+    (antes de borrarlos, en la misma transaccion que el DELETE). Las semanas
+    que quedan sin pedidos se borran; las fechas no se tocan.
+
+    La ruta es la actual del cliente: si cambio despues del cierre, se
+    descuenta de la ruta nueva sin bajar de cero.
+    """
+    resumenes = {}
+    for fila in _agregados_archivo(condicion):
+        if fila.semana_archivado not in resumenes:
+            resumen = db.session.get(ResumenSemana, fila.semana_archivado)
+            if resumen is not None:
+                resumen.por_ruta = dict(resumen.por_ruta)
+                resumen.por_producto = dict(resumen.por_producto)
+            resumenes[fila.semana_archivado] = resumen
+        resumen = resumenes[fila.semana_archivado]
+        if resumen is None:
+            continue
+
+        resumen.total_pedidos = max(resumen.total_pedidos - fila.total, 0)
+        columna = ESTADOS_RESUMEN.get(fila.estado)
+        if columna:
+            setattr(resumen, columna, max(getattr(resumen, columna) - fila.total, 0))
+
+        for conteo, clave in ((resumen.por_ruta, fila.ruta or 'Sin ruta'), (resumen.por_producto, fila.producto_nombre)):
+            restante = conteo.get(clave, 0) - fila.total
+            if restante > 0:
+                conteo[clave] = restante
+            else:
+                conteo.pop(clave, None)
+
+    for resumen in resumenes.values():
+        if resumen is not None and not resumen.total_pedidos:
+            db.session.delete(resumen)
+
+
+def obtener_historial():
+    """
+    Semanas archivadas con su total de pedidos y fecha de cierre,
+    de la mas reciente a la mas antigua (una fila de resumen por semana).
+    """
+    return db.session.query(
+        ResumenSemana.semana.label('semana_archivado'),
+        ResumenSemana.total_pedidos,
+        ResumenSemana.primer_cierre.label('fecha')
+    ).order_by(
+        ResumenSemana.primer_cierre.desc()
+    ).all()
+
+
+def obtener_resumenes():
+    """Resumenes completos de todas las semanas, de la mas reciente a la mas antigua"""
+    return ResumenSemana.query.order_by(ResumenSemana.primer_cierre.desc()).all()
+
+
+def obtener_semana(semana):
+    """
+    Pedidos archivados de una semana agrupados por ruta y cliente.
+    Usa una sola consulta sobre la particion de esa semana.
+
+    Returns:
+        {ruta: [{'cliente': Cliente, 'pedidos': [PedidoArchivado, ...]}, ...]} ordenado por ruta
+    """
+    pedidos = PedidoArchivado.query.options(
+        joinedload(PedidoArchivado.cliente),
+        joinedload(PedidoArchivado.operario_responsable)
+    ).filter(
+        PedidoArchivado.semana_archivado == semana
+    ).order_by(PedidoArchivado.fecha_creacion.desc()).all()
+
+    por_cliente = {}
+    for pedido in pedidos:
+        item = por_cliente.setdefault(pedido.cliente_id, {'cliente': pedido.cliente, 'pedidos': []})
+        item['pedidos'].append(pedido)
+
+    clientes_por_ruta = {}
+    for item in sorted(por_cliente.values(), key=lambda i: (i['cliente'].ruta, i['cliente'].nombre)):
+        clientes_por_ruta.setdefault(item['cliente'].ruta, []).append(item)
+
+    return dict(sorted(clientes_por_ruta.items()))
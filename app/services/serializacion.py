@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Serializacion en lote de pedidos y clientes.
+
+`Pedido.to_dict` y `Cliente.to_dict` cargan relaciones y cuentan pedidos
+objeto por objeto. Estas funciones resuelven nombres y contadores de toda
+la lista con un numero fijo de consultas y luego arman los diccionarios.
+"""
+
+from sqlalchemy import case, func
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.models.usuario import Usuario
+
+
+def _nombres_por_id(modelo, ids):
+    """Retorna {id: nombre} para los ids indicados, en una sola consulta"""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    filas = db.session.query(modelo.id, modelo.nombre).filter(modelo.id.in_(ids)).all()
+    return {fila.id: fila.nombre for fila in filas}
+
+
+def serializar_pedidos(pedidos):
+    """
+    Convierte una lista de pedidos (activos o archivados) a diccionarios.
+    Usa a lo sumo dos consultas (clientes y operarios) para cualquier N.
+    """
+    pedidos = list(pedidos)
+
+    clientes = _nombres_por_id(Cliente, (p.cliente_id for p in pedidos))
+    operarios = _nombres_por_id(Usuario, (p.operario_id for p in pedidos))
+
+    return [
+        p.to_dict(
+            cliente_nombre=clientes.get(p.cliente_id),
+            operario_nombre=operarios.get(p.operario_id)
+        )
+        for p in pedidos
+    ]
+
+
+def serializar_pedido(pedido):
+    """Convierte un solo pedido a diccionario (atajo de serializar_pedidos)"""
+    return serializar_pedidos([pedido])[0]
+
+
+def contadores_de_clientes(cliente_ids):
+    """
+    Calcula total, pendientes y completados de varios clientes
+    con una sola agregacion agrupada.
+
+    Returns:
+        {cliente_id: {'total_pedidos', 'pedidos_pendientes', 'pedidos_completados'}}
+    """
+    cliente_ids = set(cliente_ids)
+    contadores = {
+        cliente_id: {'total_pedidos': 0, 'pedidos_pendientes': 0, 'pedidos_completados': 0}
+        for cliente_id in cliente_ids
+    }
+    if not cliente_ids:
+        return contadores
+
+    filas = db.session.query(
+        Pedido.cliente_id,
+        func.count(Pedido.id).label('total_pedidos'),
+        func.sum(case((Pedido.estado == 'pendiente', 1), else_=0)).label('pedidos_pendientes'),
+        func.sum(case((Pedido.estado == 'completado', 1), else_=0)).label('pedidos_completados')
+    ).filter(
+        Pedido.cliente_id.in_(cliente_ids)
+    ).group_by(
+        Pedido.cliente_id
+    ).all()
+
+    for fila in filas:
+        contadores[fila.cliente_id] = {
+            'total_pedidos': int(fila.total_pedidos or 0),
+            'pedidos_pendientes': int(fila.pedidos_pendientes or 0),
+            'pedidos_completados': int(fila.pedidos_completados or 0)
+        }
+    return contadores
+
+
+def serializar_clientes(clientes):
+    """
+    Convierte una lista de clientes a diccionarios.
+    Usa una sola consulta de agregacion para los contadores de todos.
+    """
+    clientes = list(clientes)
+    contadores = contadores_de_clientes(c.id for c in clientes)
+    return [c.to_dict(contadores=contadores[c.id]) for c in clientes]
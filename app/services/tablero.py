@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Tablero en vivo servido desde memoria.
+
+Los dashboards de ventas y fabrica muestran lo mismo a todos los usuarios
+(pedidos activos agrupados por ruta y cliente, con sus contadores). En vez
+de armarlo en cada carga, el proceso guarda una instantanea compartida y
+versionada del tablero:
+
+- los cambios confirmados en este proceso (flush del ORM, o anotados a mano
+  con marcar_clientes / invalidar_tablero) marcan los clientes afectados, y
+  la siguiente lectura vuelve a armar solo esas tarjetas;
+- una huella barata (cantidad, ultimo id y suma de versiones de los pedidos
+  activos, mas clientes y usuarios) detecta cambios hechos por otros
+  procesos; si no coincide con la instantanea, se arma de nuevo entera. Se
+  revisa en cada lectura o, con TABLERO_TTL > 0, cada TABLERO_TTL segundos;
+- las vistas (por ruta, con o sin clientes inactivos) y el HTML del tablero
+  se calculan una vez por version.
+
+Un solo hilo reconstruye a la vez: 30 tablets que recargan juntas despues de
+un cambio cuestan una reconstruccion, no 30. Cada version tiene su ETag, asi
+que un navegador que ya tiene la pagina recibe un 304 sin cuerpo.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from itertools import chain
+from types import SimpleNamespace
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from sqlalchemy import func, inspect, select
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.models.usuario import Usuario
+from app.services.contadores import contadores_vacios
+from app.services.dashboard import obtener_dashboard
+from app.services._cambios_sesion import registrar_cache
+
+
+# Cambia en cada arranque: las versiones de otro proceso no se confunden
+ARRANQUE = uuid.uuid4().hex[:8]
+
+
+# Columnas de Usuario que se ven en el tablero (no la ultima conexion)
+CAMPOS_USUARIO = ('nombre', 'rol', 'activo')
+
+_estado = {'actual': None, 'version': 0, 'clientes': set(), 'todo': False}
+_candado_pendientes = threading.Lock()
+_candado_reconstruccion = threading.Lock()
+
+
+# ============================================================
+# INSTANTANEA
+# ============================================================
+
+def _copia(objeto, modelo):
+    """Copia de las columnas de un objeto del ORM (independiente de la sesion)"""
+    return SimpleNamespace(**{
+        columna.key: getattr(objeto, columna.key)
+        for columna in modelo.__mapper__.column_attrs
+    })
+
+
+def _copia_item(item):
+    """Tarjeta de cliente de obtener_dashboard, sin objetos del ORM"""
+    pedidos = []
+    for pedido in item['pedidos']:
+        copia = _copia(pedido, Pedido)
+        operario = pedido.operario_responsable
+        copia.operario_responsable = (
+            SimpleNamespace(id=operario.id, nombre=operario.nombre) if operario else None
+        )
+        pedidos.append(copia)
+    return {
+        'cliente': _copia(item['cliente'], Cliente),
+        'contadores': item['contadores'],
+        'pedidos': pedidos,
+    }
+
+
+class Instantanea:
+    """
+    Tablero completo en un momento dado. No se modifica: cada cambio arma
+    una instantanea nueva, con otra version.
+    """
+
+    def __init__(self, version, clientes, operarios, huella_usuarios):
+        self.version = version
+        self.clientes = clientes                  # cliente_id -> tarjeta
+        self.operarios = operarios                # operarios activos (para asignar)
+        self.huella_usuarios = huella_usuarios
+        self.huella = self._calcular_huella()
+        self.verificada = time.monotonic()
+        self._memoria = {}
+        self._candado = threading.Lock()
+
+    def _calcular_huella(self):
+        """La misma huella que _huella_base, calculada sobre los datos en memoria"""
+        pedidos = [pedido for item in self.clientes.values() for pedido in item['pedidos']]
+        fechas = [
+            item['cliente'].fecha_actualizacion for item in self.clientes.values()
+            if item['cliente'].fecha_actualizacion is not None
+        ]
+        return (
+            len(pedidos),
+            max((pedido.id for pedido in pedidos), default=None),
+            sum(pedido.version for pedido in pedidos) if pedidos else None,
+            len(self.clientes),
+            max(fechas, default=None),
+        ) + self.huella_usuarios
+
+    def _memorizar(self, clave, calcular):
+        """Calcula una sola vez por version (los demas hilos esperan el resultado)"""
+        valor = self._memoria.get(clave)
+        if valor is None:
+            with self._candado:
+                valor = self._memoria.get(clave)
+                if valor is None:
+                    valor = calcular()
+                    self._memoria[clave] = valor
+        return valor
+
+    def vista(self, solo_clientes_activos=False, ruta=None):
+        """Misma estructura que obtener_dashboard: 'rutas', 'totales' y 'total_clientes'"""
+        return self._memorizar(
+            ('vista', solo_clientes_activos, ruta),
+            lambda: self._armar_vista(solo_clientes_activos, ruta)
+        )
+
+    def html(self, clave, generar):
+        """HTML del tablero renderizado una vez por version y clave"""
+        return self._memorizar(('html',) + tuple(clave), generar)
+
+    def _armar_vista(self, solo_clientes_activos, ruta):
+        totales = contadores_vacios()
+        for item in self.clientes.values():
+            for nombre, valor in item['contadores'].items():
+                totales[nombre] += valor
+
+        items = [
+            item for item in self.clientes.values()
+            if (item['cliente'].activo or not solo_clientes_activos)
+            and (not ruta or item['cliente'].ruta == ruta)
+        ]
+        items.sort(key=lambda item: (item['cliente'].ruta, item['cliente'].nombre))
+
+        rutas = {}
+        for item in items:
+            grupo = rutas.setdefault(item['cliente'].ruta, {'clientes': [], 'contadores': contadores_vacios()})
+            grupo['clientes'].append(item)
+            for nombre, valor in item['contadores'].items():
+                grupo['contadores'][nombre] += valor
+
+        return {'rutas': rutas, 'totales': totales, 'total_clientes': len(items)}
+
+
+# ============================================================
+# CONSTRUCCION
+# ============================================================
+
+def _huella_base():
+    """
+    Huella del tablero en la base, en una sola consulta. Cualquier alta,
+    baja o UPDATE de un pedido activo la cambia (el UPDATE incrementa su
+    version); de los clientes se mira la ultima modificacion.
+    """
+    con_pedidos = Cliente.id.in_(select(Pedido.cliente_id))
+    return tuple(db.session.execute(select(
+        select(func.count(Pedido.id)).scalar_subquery(),
+        select(func.max(Pedido.id)).scalar_subquery(),
+        select(func.sum(Pedido.version)).scalar_subquery(),
+        select(func.count(Cliente.id)).where(con_pedidos).scalar_subquery(),
+        select(func.max(Cliente.fecha_actualizacion)).where(con_pedidos).scalar_subquery(),
+        select(func.count(Usuario.id)).scalar_subquery(),
+        select(func.max(Usuario.id)).scalar_subquery(),
+        select(func.sum(Usuario.version_sesion)).scalar_subquery(),
+    )).one())
+
+
+def _nueva_version():
+    _estado['version'] += 1
+    return _estado['version']
+
+
+def _construir(huella):
+    """Instantanea completa (clientes activos e inactivos con pedidos activos)"""
+    tablero = obtener_dashboard()
+    clientes = {
+        item['cliente'].id: _copia_item(item)
+        for grupo in tablero['rutas'].values()
+        for item in grupo['clientes']
+    }
+    operarios = [
+        SimpleNamespace(id=operario.id, nombre=operario.nombre)
+        for operario in Usuario.query.filter_by(rol='operario', activo=True).order_by(Usuario.id).all()
+    ]
+    return Instantanea(_nueva_version(), clientes, operarios, huella[5:])
+
+
+def _actualizar(actual, cliente_ids):
+    """Instantanea nueva con solo las tarjetas de esos clientes vueltas a leer"""
+    tablero = obtener_dashboard(cliente_ids=list(cliente_ids))
+    clientes = {
+        cliente_id: item for cliente_id, item in actual.clientes.items()
+        if cliente_id not in cliente_ids
+    }
+    for grupo in tablero['rutas'].values():
+        for item in grupo['clientes']:
+            clientes[item['cliente'].id] = _copia_item(item)
+    return Instantanea(_nueva_version(), clientes, actual.operarios, actual.huella_usuarios)
+
+
+def obtener_tablero():
+    """
+    Instantanea vigente del tablero. Aplica los cambios pendientes de este
+    proceso y, si toca revisar, los de otros procesos.
+    """
+    actual = _estado['actual']
+    if (
+        actual is not None
+        and not _estado['todo'] and not _estado['clientes']
+        and time.monotonic() - actual.verificada < current_app.config['TABLERO_TTL']
+    ):
+        return actual
+
+    with _candado_reconstruccion:
+        actual = _estado['actual']
+        with _candado_pendientes:
+            cliente_ids, todo = _estado['clientes'], _estado['todo']
+            _estado['clientes'], _estado['todo'] = set(), False
+
+        huella = _huella_base()
+        if actual is None or todo:
+            nueva = _construir(huella)
+        else:
+            if cliente_ids:
+                nueva = _actualizar(actual, cliente_ids)
+            else:
+                nueva = actual
+            if nueva.huella != huella:
+                # Cambios de otro proceso (o que no pasaron por la sesion)
+                nueva = _construir(huella)
+
+        nueva.verificada = time.monotonic()
+        _estado['actual'] = nueva
+        return nueva
+
+
+# ============================================================
+# CAMBIOS
+# ============================================================
+
+def marcar_clientes(cliente_ids):
+    """Anota clientes cuyos pedidos cambiaron sin pasar por el flush del ORM"""
+    _pendientes()['clientes'].update(cliente_ids)
+
+
+def invalidar_tablero():
+    """Arma el tablero entero de nuevo al confirmar (cierre de semana, importaciones)"""
+    _pendientes()['todo'] = True
+
+
+def _registrar_cambios(session):
+    """Clientes afectados por los pedidos y clientes del flush"""
+    modificados = [objeto for objeto in session.dirty if session.is_modified(objeto)]
+    for objeto in chain(session.new, modificados, session.deleted):
+        if isinstance(objeto, Pedido):
+            pendientes = _pendientes(session)
+            pendientes['clientes'].add(objeto.cliente_id)
+            # Si cambio de cliente, tambien la tarjeta anterior
+            pendientes['clientes'].update(inspect(objeto).attrs.cliente_id.history.deleted)
+        elif isinstance(objeto, Cliente):
+            _pendientes(session)['clientes'].add(objeto.id)
+        elif isinstance(objeto, Usuario):
+            estado = inspect(objeto)
+            if objeto in modificados and not any(
+                estado.attrs[campo].history.has_changes() for campo in CAMPOS_USUARIO
+            ):
+                continue
+            # Nombres de operarios en las tarjetas y en los selectores
+            _pendientes(session)['todo'] = True
+
+
+def _aplicar_cambios(pendientes):
+    """Anota los clientes a rearmar en la proxima lectura"""
+    with _candado_pendientes:
+        _estado['clientes'].update(pendientes['clientes'])
+        _estado['todo'] = _estado['todo'] or pendientes['todo']
+
+
+_pendientes = registrar_cache(
+    'tablero', lambda: {'clientes': set(), 'todo': False}, _registrar_cambios, _aplicar_cambios
+)
+
+
+# ============================================================
+# RESPUESTAS
+# ============================================================
+
+def etag_pagina(tablero, *partes):
+    """
+    ETag de una pagina de dashboard para la version del tablero y el
+    usuario. None si la pagina tiene mensajes flash pendientes (no se
+    puede reutilizar).
+    """
+    if session.get('_flashes'):
+        return None
+    texto = '|'.join(str(parte) for parte in (ARRANQUE, tablero.version, current_user.id) + partes)
+    return hashlib.sha1(texto.encode()).hexdigest()[:20]
+
+
+def respuesta_sin_cambios(etag):
+    """Respuesta 304 si el navegador ya tiene esa version, o None"""
+    if etag is None or not request.if_none_match.contains(etag):
+        return None
+    respuesta = make_response('', 304)
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+def con_etag(respuesta, etag):
+    """Agrega el ETag (el navegador revalida en cada carga)"""
+    if etag is not None:
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de usuarios para Flask-Login.
+
+load_user se llama en cada peticion, y un dashboard abierto hace muchas
+(fragmentos, marcar visto, estados...). En lugar de buscar el Usuario en la
+base cada vez, se guarda por unos segundos una copia liviana con los datos
+que usan las vistas y los decoradores (id, nombre, rol, activo).
+
+La entrada vale para la version de sesion con la que se inicio sesion: si
+cambia el rol, el estado o la contraseña, la version del usuario aumenta y
+las sesiones viejas dejan de valer. Cada proceso tiene su propia cache; los
+cambios hechos en otro proceso se ven como mucho al vencer el TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, session
+from flask_login import UserMixin
+from sqlalchemy import event
+from app import db
+from app.models.usuario import Usuario
+
+
+# user_id -> (vencimiento, IdentidadUsuario), del menos al mas usado
+_identidades = OrderedDict()
+_candado = threading.Lock()
+
+
+class IdentidadUsuario(UserMixin):
+    """
+    Datos del usuario de la sesion, sin atar a la sesion de SQLAlchemy.
+    Ofrece lo mismo que las vistas usan de Usuario (current_user).
+    """
+
+    def __init__(self, usuario):
+        self.id = usuario.id
+        self.nombre = usuario.nombre
+        self.username = usuario.username
+        self.rol = usuario.rol
+        self.activo = usuario.activo
+        self.version_sesion = usuario.version_sesion
+
+    def __repr__(self):
+        return f'<IdentidadUsuario {self.username} - {self.rol}>'
+
+    @property
+    def is_active(self):
+        return self.activo
+
+    def es_vendedor(self):
+        """Verifica si el usuario es vendedor"""
+        return self.rol == 'vendedor'
+
+    def es_operario(self):
+        """Verifica si el usuario es operario"""
+        return self.rol == 'operario'
+
+    def get_id(self):
+        """Retorna el ID del usuario como string"""
+        return str(self.id)
+
+
+def _buscar_en_cache(user_id):
+    """Identidad guardada y vigente, o None"""
+    with _candado:
+        entrada = _identidades.get(user_id)
+        if entrada is None:
+            return None
+        vencimiento, identidad = entrada
+        if vencimiento < time.monotonic():
+            del _identidades[user_id]
+            return None
+        _identidades.move_to_end(user_id)
+        return identidad
+
+
+def _cargar_de_la_base(user_id):
+    """Busca el usuario en la base y guarda su identidad en la cache"""
+    usuario = db.session.get(Usuario, user_id)
+    if usuario is None:
+        invalidar_usuario(user_id)
+        return None
+
+    identidad = IdentidadUsuario(usuario)
+    vencimiento = time.monotonic() + current_app.config['CACHE_USUARIOS_TTL']
+    with _candado:
+        _identidades[user_id] = (vencimiento, identidad)
+        _identidades.move_to_end(user_id)
+        while len(_identidades) > current_app.config['CACHE_USUARIOS_MAXIMO']:
+            _identidades.popitem(last=False)
+    return identidad
+
+
+def cargar_usuario(user_id):
+    """
+    Identidad del usuario de la sesion, o None si no existe, esta
+    desactivado o la sesion es de una version anterior.
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    version = session.get('version_sesion')
+    identidad = _buscar_en_cache(user_id)
+
+    # Si no coincide la version, la cache puede estar vieja (el cambio se
+    # hizo en otro proceso): se confirma contra la base
+    if identidad is None or (version is not None and identidad.version_sesion != version):
+        identidad = _cargar_de_la_base(user_id)
+
+    if identidad is None or not identidad.activo:
+        return None
+
+    if version is None:
+        # Sesion iniciada antes de que existiera la version
+        session['version_sesion'] = identidad.version_sesion
+    elif identidad.version_sesion != version:
+        return None
+
+    return identidad
+
+
+def invalidar_usuario(user_id):
+    """Quita al usuario de la cache de este proceso"""
+    with _candado:
+        _identidades.pop(user_id, None)
+
+
+@event.listens_for(Usuario, 'after_update')
+@event.listens_for(Usuario, 'after_delete')
+def _invalidar_al_modificar(mapper, connection, usuario):
+    """Cualquier cambio en el usuario descarta su identidad guardada"""
+    invalidar_usuario(usuario.id)
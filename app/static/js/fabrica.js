@@ -3,8 +3,8 @@
  * Maneja WebSockets, filtros y actualizaciones en tiempo real
  */
 
-// Conectar a Socket.IO
-const socket = io();
+// Conectar a Socket.IO (solo la ruta del tablero, si se indicó una)
+const socket = io(opcionesSocketTablero());
 
 // Sonido de notificación
 const notificationSound = new Audio('/static/sounds/notification.mp3');
@@ -28,23 +28,25 @@ socket.on('disconnect', function() {
     mostrarToast('Conexión perdida. Reconectando...', 'warning');
 });
 
-// Cuando llega un NUEVO pedido
-socket.on('nuevo_pedido', function(data) {
-    console.log('🆕 Nuevo pedido recibido:', data);
+// Cuando llegan pedidos NUEVOS (todas las líneas de un alta en un solo evento)
+socket.on('pedidos_creados', function(data) {
+    console.log('🆕 Pedidos nuevos recibidos:', data);
     
-    const pedido = data.pedido;
+    const pedidos = data.pedidos.filter(eventoVigente);
+    if (!pedidos.length) return;
     
     // Reproducir sonido de notificación
     reproducirNotificacion();
     
     // Mostrar toast
-    mostrarToast(`¡Nuevo pedido! #${pedido.id} - ${pedido.producto_nombre}`, 'success');
+    if (pedidos.length === 1) {
+        mostrarToast(`¡Nuevo pedido! #${pedidos[0].id} - ${pedidos[0].producto_nombre}`, 'success');
+    } else {
+        mostrarToast(`¡${pedidos.length} pedidos nuevos para ${data.cliente_nombre}!`, 'success');
+    }
     
-    // Recargar la página para mostrar el nuevo pedido
-    // NUEVO: Agregar clase de estado al recargar
-    setTimeout(() => {
-        location.reload();
-    }, 1000);
+    // Actualizar solo la tarjeta del cliente
+    reconciliarCliente(data.cliente_id);
 });
 
 // Cuando un pedido es MODIFICADO por el vendedor
@@ -52,33 +54,28 @@ socket.on('pedido_modificado', function(data) {
     console.log('⚠️ Pedido modificado:', data);
     
     const pedido = data.pedido;
-    const pedidoRow = document.querySelector(`[data-pedido-id="${pedido.id}"]`);
+    if (!eventoVigente(pedido)) return;
     
-    if (pedidoRow) {
-        // Resaltar como modificado
-        pedidoRow.classList.add('table-danger', 'animate-highlight');
-        
-        // Agregar badge de modificado
-        const productoCelda = pedidoRow.querySelector('td:nth-child(2)');
-        if (productoCelda && !productoCelda.querySelector('.badge-danger')) {
-            const badge = document.createElement('span');
-            badge.className = 'badge bg-danger ms-2';
-            badge.innerHTML = '<i class="fas fa-exclamation-triangle"></i> ¡MODIFICADO!';
-            productoCelda.appendChild(badge);
-        }
-        
-        // Actualizar datos del pedido
-        actualizarDatosPedido(pedidoRow, pedido);
-        
-        // Reproducir sonido
-        reproducirNotificacion();
-        
-        // Mostrar toast
-        mostrarToast(`Pedido #${pedido.id} fue modificado por el vendedor`, 'warning');
-        
-        // Actualizar contador de modificados
-        actualizarEstadisticas();
-    }
+    // Reproducir sonido
+    reproducirNotificacion();
+    
+    // Mostrar toast
+    mostrarToast(`Pedido #${pedido.id} fue modificado por el vendedor`, 'warning');
+    
+    reconciliarCliente(pedido.cliente_id);
+});
+
+// Cuando otro operario actualiza o asigna un pedido
+socket.on('pedido_actualizado', function(data) {
+    console.log('📝 Pedido actualizado:', data);
+    if (!eventoVigente(data.pedido)) return;
+    reconciliarCliente(data.pedido.cliente_id);
+});
+
+socket.on('pedido_asignado', function(data) {
+    console.log('👷 Pedido asignado:', data);
+    if (!eventoVigente(data.pedido)) return;
+    reconciliarCliente(data.pedido.cliente_id);
 });
 
 // Cuando un pedido es ELIMINADO
@@ -97,12 +94,20 @@ socket.on('pedido_eliminado', function(data) {
             // Actualizar estadísticas y badges
             actualizarEstadisticas();
             actualizarBadgesClientes();
+            reconciliarCliente(data.cliente_id);
         }, 500);
         
         mostrarToast(`Pedido #${data.pedido_id} eliminado`, 'info');
     }
 });
 
+// Cuando ventas cierra la semana todos los pedidos activos pasan al archivo
+socket.on('semana_cerrada', function(data) {
+    console.log('📦 Semana cerrada:', data);
+    vaciarTablero();
+    mostrarToast(data.mensaje || 'Semana cerrada', 'info');
+});
+
 // ========================================
 // FUNCIONES DE ACTUALIZACIÓN
 // ========================================
@@ -229,33 +234,6 @@ function marcarComoVisto(pedidoId) {
     });
 }
 
-/**
- * Actualiza los datos de un pedido en la tabla
- */
-function actualizarDatosPedido(pedidoRow, pedido) {
-    // Actualizar cantidad
-    const cantidadCelda = pedidoRow.querySelector('td:nth-child(3)');
-    if (cantidadCelda) {
-        cantidadCelda.innerHTML = `<strong>${pedido.cantidad}</strong> ${pedido.unidad || ''}`;
-    }
-    
-    // Actualizar notas del vendedor
-    const productoCelda = pedidoRow.querySelector('td:nth-child(2)');
-    if (productoCelda && pedido.notas_vendedor) {
-        // Remover notas anteriores
-        const notasAnteriores = productoCelda.querySelector('small');
-        if (notasAnteriores) {
-            notasAnteriores.remove();
-        }
-        
-        // Agregar nuevas notas
-        const notasElement = document.createElement('small');
-        notasElement.className = 'text-muted d-block';
-        notasElement.innerHTML = `<i class="fas fa-sticky-note"></i> ${pedido.notas_vendedor}`;
-        productoCelda.appendChild(notasElement);
-    }
-}
-
 /**
  * Actualiza las estadísticas en las tarjetas superiores
  */
@@ -450,6 +428,35 @@ function actualizarBadgesClientes() {
     });
 }
 
+// ========================================
+// ACTUALIZACIÓN POR CLIENTE (ver tablero.js)
+// ========================================
+
+configurarTablero({
+    urlFragmento: clienteId => `/fabrica/api/cliente/${clienteId}/fragmento`,
+    alActualizar: function(totales) {
+        // Reaplicar filtros sobre las tarjetas nuevas
+        aplicarFiltros();
+        
+        // Los totales del servidor mandan sobre el conteo del DOM
+        const stats = {
+            'stat-pendientes': totales.pendientes,
+            'stat-completados': totales.completados,
+            'stat-cancelados': totales.cancelados,
+            'stat-modificados': totales.modificados
+        };
+        Object.entries(stats).forEach(([id, valor]) => {
+            const elemento = document.getElementById(id);
+            if (elemento) elemento.textContent = valor;
+        });
+        
+        const badgeRutas = document.getElementById('total-pedidos-badge');
+        if (badgeRutas) {
+            badgeRutas.textContent = `Total: ${document.querySelectorAll('.ruta-item').length} ruta(s)`;
+        }
+    }
+});
+
 // ========================================
 // FILTROS
 // ========================================
@@ -613,80 +620,3 @@ function crearToastContainer() {
     document.body.appendChild(container);
     return container;
 }
-
-// Evento: Pedido modificado por ventas
-socket.on('pedido_modificado', function(data) {
-    console.log('📝 Pedido modificado por ventas:', data);
-    
-    const pedido = data.pedido;
-    const pedidoRow = document.querySelector(`[data-pedido-id="${pedido.id}"]`);
-    
-    if (pedidoRow) {
-        // Agregar fondo rojo y badge
-        pedidoRow.classList.add('table-danger', 'animate-highlight');
-        
-        // Buscar celda del producto (segunda columna)
-        const productoCelda = pedidoRow.querySelector('td:nth-child(2)');
-        if (productoCelda) {
-            // Verificar si ya existe el badge
-            let badgeModificado = productoCelda.querySelector('.badge.bg-danger');
-            if (!badgeModificado) {
-                badgeModificado = document.createElement('span');
-                badgeModificado.className = 'badge bg-danger';
-                badgeModificado.innerHTML = '<i class="fas fa-exclamation-triangle"></i> ¡MODIFICADO!';
-                
-                const strong = productoCelda.querySelector('strong');
-                if (strong) {
-                    strong.insertAdjacentElement('afterend', document.createElement('br'));
-                    strong.insertAdjacentElement('afterend', badgeModificado);
-                }
-            }
-        }
-        
-        // NUEVO: Si ventas respondió, quitar "Esperando contestación"
-        if (!pedido.esperando_contestacion) {
-            const estadoCelda = pedidoRow.querySelector('td:nth-child(4)');
-            if (estadoCelda) {
-                const badgeEsperando = estadoCelda.querySelector('.badge.bg-info');
-                if (badgeEsperando && badgeEsperando.textContent.includes('Esperando contestación')) {
-                    // Reemplazar por el selector de estado
-                    estadoCelda.innerHTML = `
-                        <select class="form-select form-select-sm estado-select" 
-                                data-pedido-id="${pedido.id}"
-                                onchange="actualizarEstadoRapido(${pedido.id}, this.value)">
-                            <option value="pendiente" ${pedido.estado === 'pendiente' ? 'selected' : ''}>
-                                Pendiente
-                            </option>
-                            <option value="completado" ${pedido.estado === 'completado' ? 'selected' : ''}>
-                                Completado
-                            </option>
-                            <option value="cancelado" ${pedido.estado === 'cancelado' ? 'selected' : ''}>
-                                Cancelado
-                            </option>
-                        </select>
-                    `;
-                }
-            }
-        }
-        
-        // Agregar botón de marcar visto si no existe
-        const accionesCelda = pedidoRow.querySelector('td:nth-child(7)');
-        if (accionesCelda) {
-            let botonVisto = accionesCelda.querySelector('.btn-success[onclick*="marcarComoVisto"]');
-            if (!botonVisto) {
-                botonVisto = document.createElement('button');
-                botonVisto.className = 'btn btn-sm btn-success';
-                botonVisto.setAttribute('onclick', `marcarComoVisto(${pedido.id})`);
-                botonVisto.setAttribute('title', 'Marcar como visto');
-                botonVisto.innerHTML = '<i class="fas fa-check"></i>';
-                accionesCelda.appendChild(botonVisto);
-            }
-        }
-        
-        // Actualizar estadísticas
-        actualizarEstadisticas();
-        actualizarBadgesClientes();
-        
-        mostrarToast(`Pedido #${pedido.id} modificado`, 'warning');
-    }
-});
\ No newline at end of file
@@ -0,0 +1,200 @@
+/**
+ * Actualización en vivo de los dashboards (ventas y fábrica)
+ * En vez de recargar la página, pide al servidor la tarjeta ya renderizada
+ * del cliente afectado y la reemplaza en el DOM, junto con los badges de
+ * su ruta y los totales.
+ *
+ * Cada dashboard llama a configurarTablero() con la URL del fragmento y una
+ * función para actualizar sus tarjetas de estadísticas.
+ */
+
+const configuracionTablero = {
+    urlFragmento: null,       // clienteId => URL del fragmento
+    alActualizar: null        // (totales) => void
+};
+
+// Última versión conocida de cada pedido (descarta eventos viejos o repetidos)
+const versionesPedidos = new Map();
+
+// Pedidos de fragmento pendientes por cliente (agrupa ráfagas de eventos)
+const reconciliacionesPendientes = new Map();
+const DEMORA_RECONCILIACION_MS = 300;
+
+function configurarTablero(opciones) {
+    Object.assign(configuracionTablero, opciones);
+}
+
+/**
+ * Parámetros de conexión de Socket.IO: con ?ruta=... en la URL del
+ * dashboard, el servidor solo envía los eventos de esa ruta.
+ * Con varios workers sin sesiones pegajosas se usa solo WebSocket
+ * (el long-polling necesita volver siempre al mismo proceso).
+ */
+function opcionesSocketTablero() {
+    const opciones = {};
+
+    const ruta = new URLSearchParams(window.location.search).get('ruta');
+    if (ruta) opciones.query = { ruta: ruta };
+
+    if (document.querySelector('meta[name="socketio-solo-websocket"]')) {
+        opciones.transports = ['websocket'];
+        opciones.upgrade = false;
+    }
+
+    return opciones;
+}
+
+/**
+ * Indica si un evento de pedido es más nuevo que el último recibido.
+ * Los eventos traen solo los campos que cambiaron y la versión del pedido.
+ */
+function eventoVigente(pedido) {
+    if (!pedido || pedido.version === undefined || pedido.version === null) return true;
+
+    const conocida = versionesPedidos.get(pedido.id);
+    if (conocida !== undefined && pedido.version <= conocida) return false;
+
+    versionesPedidos.set(pedido.id, pedido.version);
+    return true;
+}
+
+/**
+ * Programa la actualización de la tarjeta de un cliente.
+ * Varios eventos seguidos del mismo cliente generan un solo pedido al servidor.
+ */
+function reconciliarCliente(clienteId) {
+    if (!clienteId || !configuracionTablero.urlFragmento) return;
+
+    clearTimeout(reconciliacionesPendientes.get(clienteId));
+    reconciliacionesPendientes.set(clienteId, setTimeout(() => {
+        reconciliacionesPendientes.delete(clienteId);
+
+        // Si el cliente no está en pantalla puede que su ruta tampoco
+        const enPantalla = document.querySelector(`.cliente-item[data-cliente-id="${clienteId}"]`);
+        const url = configuracionTablero.urlFragmento(clienteId) + (enPantalla ? '' : '?con_ruta=1');
+
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(aplicarFragmento)
+            .catch(error => console.error('Error al actualizar el cliente:', error));
+    }, DEMORA_RECONCILIACION_MS));
+}
+
+/**
+ * Aplica la respuesta del endpoint de fragmento en el DOM
+ */
+function aplicarFragmento(data) {
+    let actual = document.querySelector(`.cliente-item[data-cliente-id="${data.cliente_id}"]`);
+
+    // Si el cliente cambió de ruta, se saca de la ruta vieja
+    if (actual && actual.closest('.ruta-item').getAttribute('data-ruta') !== data.ruta) {
+        actual.remove();
+        actual = null;
+    }
+
+    let rutaItem = buscarRuta(data.ruta);
+
+    if (!data.html) {
+        // El cliente ya no tiene pedidos activos
+        if (actual) actual.remove();
+    } else if (actual) {
+        const abierto = actual.querySelector('.accordion-collapse.show') !== null;
+        const nuevo = crearElemento(data.html);
+        ajustarPadreAcordeon(nuevo, actual.parentElement);
+        if (abierto) abrirTarjeta(nuevo);
+        actual.replaceWith(nuevo);
+        resaltar(nuevo);
+    } else if (rutaItem) {
+        const contenedor = rutaItem.querySelector('.accordion-body > .accordion');
+        const nuevo = crearElemento(data.html);
+        ajustarPadreAcordeon(nuevo, contenedor);
+        contenedor.appendChild(nuevo);
+        resaltar(nuevo);
+    } else if (data.html_ruta) {
+        insertarRuta(crearElemento(data.html_ruta), data.ruta);
+        rutaItem = buscarRuta(data.ruta);
+    }
+
+    // Badges de la ruta (o quitarla si quedó vacía)
+    if (rutaItem) {
+        if (data.clientes_en_ruta === 0) {
+            rutaItem.remove();
+        } else {
+            const badges = rutaItem.querySelector('.badges-ruta');
+            if (badges) badges.innerHTML = data.html_badges_ruta;
+        }
+    }
+
+    actualizarTablero(data.totales);
+}
+
+/**
+ * Quita todas las rutas del tablero (por ejemplo, al cerrar la semana)
+ */
+function vaciarTablero() {
+    document.querySelectorAll('.ruta-item').forEach(rutaItem => rutaItem.remove());
+
+    const totales = {};
+    ['total', 'pendientes', 'completados', 'cancelados', 'modificados', 'esperando', 'no_leidos']
+        .forEach(nombre => totales[nombre] = 0);
+    actualizarTablero(totales);
+}
+
+function actualizarTablero(totales) {
+    const vacio = document.getElementById('tablero-vacio');
+    if (vacio) {
+        vacio.classList.toggle('d-none', document.querySelector('.ruta-item') !== null);
+    }
+
+    if (configuracionTablero.alActualizar) {
+        configuracionTablero.alActualizar(totales);
+    }
+}
+
+function buscarRuta(ruta) {
+    return Array.from(document.querySelectorAll('.ruta-item'))
+        .find(item => item.getAttribute('data-ruta') === ruta) || null;
+}
+
+/**
+ * Inserta una ruta nueva respetando el orden alfabético
+ */
+function insertarRuta(elemento, ruta) {
+    const acordeon = document.getElementById('rutasAccordion');
+    if (!acordeon) return;
+
+    const siguiente = Array.from(acordeon.querySelectorAll(':scope > .ruta-item'))
+        .find(item => item.getAttribute('data-ruta') > ruta);
+    acordeon.insertBefore(elemento, siguiente || null);
+}
+
+function crearElemento(html) {
+    const template = document.createElement('template');
+    template.innerHTML = html.trim();
+    return template.content.firstElementChild;
+}
+
+/**
+ * El fragmento se renderiza sin conocer el acordeón que lo contiene
+ */
+function ajustarPadreAcordeon(tarjeta, contenedor) {
+    const collapse = tarjeta.querySelector('.accordion-collapse');
+    if (collapse && contenedor && contenedor.id) {
+        collapse.setAttribute('data-bs-parent', `#${contenedor.id}`);
+    }
+}
+
+function abrirTarjeta(tarjeta) {
+    const collapse = tarjeta.querySelector('.accordion-collapse');
+    const boton = tarjeta.querySelector('.accordion-button');
+    if (collapse) collapse.classList.add('show');
+    if (boton) boton.classList.remove('collapsed');
+}
+
+function resaltar(elemento) {
+    elemento.classList.add('animate-highlight');
+    setTimeout(() => elemento.classList.remove('animate-highlight'), 2000);
+}
@@ -3,11 +3,11 @@
  * Maneja actualizaciones en tiempo real de pedidos
  */
 
-// Conectar a Socket.IO
-const socket = io({
+// Conectar a Socket.IO (solo la ruta del tablero, si se indicó una)
+const socket = io(Object.assign({
     transports: ['polling', 'websocket'],
     upgrade: true
-});
+}, opcionesSocketTablero()));
 
 // Evento: Conexión exitosa
 socket.on('connect', function() {
@@ -24,20 +24,30 @@ socket.on('pedido_actualizado', function(data) {
     console.log('📝 Pedido actualizado por fábrica:', data);
     
     const pedido = data.pedido;
-    const pedidoRow = document.getElementById(`pedido-${pedido.id}`);
+    if (!eventoVigente(pedido)) return;
     
-    if (pedidoRow) {
-        actualizarEstadoPedido(pedidoRow, pedido);
-        
-        // Mostrar notificación
-        mostrarToast(`Pedido #${pedido.id} actualizado por fábrica`, 'info');
-        
-        // Actualizar badges de clientes
-        actualizarBadgesClientesVendedor();
-    } else {
-        console.log('Pedido no encontrado en el DOM, recargando página...');
-        setTimeout(() => location.reload(), 1000);
-    }
+    mostrarToast(`Pedido #${pedido.id} actualizado por fábrica`, 'info');
+    reconciliarCliente(pedido.cliente_id);
+});
+
+// Evento: Pedido asignado a un operario
+socket.on('pedido_asignado', function(data) {
+    console.log('👷 Pedido asignado:', data);
+    if (!eventoVigente(data.pedido)) return;
+    reconciliarCliente(data.pedido.cliente_id);
+});
+
+// Eventos: Pedidos creados o modificados por otros vendedores
+socket.on('pedidos_creados', function(data) {
+    console.log('🆕 Pedidos nuevos:', data);
+    if (!data.pedidos.filter(eventoVigente).length) return;
+    reconciliarCliente(data.cliente_id);
+});
+
+socket.on('pedido_modificado', function(data) {
+    console.log('⚠️ Pedido modificado:', data);
+    if (!eventoVigente(data.pedido)) return;
+    reconciliarCliente(data.pedido.cliente_id);
 });
 
 // Evento: Pedido eliminado
@@ -51,85 +61,34 @@ socket.on('pedido_eliminado', function(data) {
         setTimeout(() => {
             pedidoRow.remove();
             actualizarBadgesClientesVendedor();
+            reconciliarCliente(data.cliente_id);
         }, 500);
     }
 });
 
-/**
- * Actualizar visualmente un pedido en la tabla
- */
-function actualizarEstadoPedido(pedidoRow, pedido) {
-    // Actualizar estado
-    const estadoCelda = pedidoRow.querySelector('td:nth-child(3)');
-    if (estadoCelda) {
-        let badgeClass = 'bg-secondary';
-        let estadoTexto = 'Pendiente';
-        
-        if (pedido.estado === 'completado') {
-            badgeClass = 'bg-success';
-            estadoTexto = 'Completado';
-        } else if (pedido.estado === 'cancelado') {
-            badgeClass = 'bg-danger';
-            estadoTexto = 'Cancelado';
-        }
-        
-        estadoCelda.innerHTML = `<span class="badge ${badgeClass}">${estadoTexto}</span>`;
-    }
-    
-    // Actualizar operario
-    const operarioCelda = pedidoRow.querySelector('td:nth-child(4)');
-    if (operarioCelda) {
-        operarioCelda.textContent = pedido.operario_nombre || 'Sin asignar';
-    }
-    
-    // Actualizar observaciones
-    const observacionesCelda = pedidoRow.querySelector('td:nth-child(5)');
-    if (observacionesCelda) {
-        if (pedido.observaciones_fabrica) {
-            const textoCorto = pedido.observaciones_fabrica.substring(0, 50);
-            const puntitos = pedido.observaciones_fabrica.length > 50 ? '...' : '';
-            
-            // Verificar si ya fue leído
-            const esNuevo = !pedido.visto_por_vendedor;
-            
-            observacionesCelda.innerHTML = `
-                <div class="d-flex align-items-center gap-2">
-                    <small class="text-muted flex-grow-1">
-                        <i class="fas fa-comment"></i>
-                        ${textoCorto}${puntitos}
-                    </small>
-                    ${esNuevo ? `
-                        <span class="badge bg-warning animate-pulse" title="Nueva notificación">
-                            <i class="fas fa-bell"></i> Nueva
-                        </span>
-                        <button class="btn btn-sm btn-success" 
-                                onclick="marcarComoLeido(${pedido.id})"
-                                title="Marcar como leído">
-                            <i class="fas fa-check"></i>
-                        </button>
-                    ` : `
-                        <small class="text-success">
-                            <i class="fas fa-check-circle"></i> Leído
-                        </small>
-                    `}
-                </div>
-            `;
-        } else {
-            observacionesCelda.innerHTML = '<small class="text-muted">-</small>';
-        }
+// Evento: Semana cerrada (todos los pedidos activos pasan al archivo)
+socket.on('semana_cerrada', function(data) {
+    console.log('📦 Semana cerrada:', data);
+    vaciarTablero();
+    mostrarToast(data.mensaje || 'Semana cerrada', 'info');
+});
+
+// Actualización por cliente (ver tablero.js)
+configurarTablero({
+    urlFragmento: clienteId => `/ventas/api/cliente/${clienteId}/fragmento`,
+    alActualizar: function(totales) {
+        const stats = {
+            'stat-clientes': document.querySelectorAll('.cliente-item').length,
+            'stat-total': totales.total,
+            'stat-pendientes': totales.pendientes,
+            'stat-completados': totales.completados
+        };
+        Object.entries(stats).forEach(([id, valor]) => {
+            const elemento = document.getElementById(id);
+            if (elemento) elemento.textContent = valor;
+        });
     }
-    
-    // Actualizar color de fila según estado
-    pedidoRow.classList.remove('estado-pendiente', 'estado-completado', 'estado-cancelado');
-    pedidoRow.classList.add(`estado-${pedido.estado}`);
-    pedidoRow.setAttribute('data-estado', pedido.estado);
-    
-    // Resaltar cambio
-    pedidoRow.classList.add('animate-pulse');
-    setTimeout(() => {
-        pedidoRow.classList.remove('animate-pulse');
-    }, 2000);
-}
+});
 
 /**
  * Marcar observaciones como leídas por el vendedor
@@ -329,117 +288,14 @@ function mostrarToast(mensaje, tipo = 'info') {
 // Evento: Pedido marcado como visto por fábrica
 socket.on('pedido_visto_por_fabrica', function(data) {
     console.log('👁️ Pedido visto por fábrica:', data);
+    if (!eventoVigente(data.pedido)) return;
     
-    const pedidoRow = document.getElementById(`pedido-${data.pedido_id}`);
-    
-    if (pedidoRow) {
-        // Remover la clase table-warning (fondo amarillo de modificado)
-        pedidoRow.classList.remove('table-warning');
-        
-        // Remover el badge "Modificado" si existe
-        const badgeModificado = pedidoRow.querySelector('.badge.bg-warning');
-        if (badgeModificado && badgeModificado.textContent.includes('Modificado')) {
-            badgeModificado.remove();
-        }
-        
-        // Actualizar badges de clientes
-        actualizarBadgesClientesVendedor();
-        actualizarBadgesModificadosSinVer();
-        
+    if (document.getElementById(`pedido-${data.pedido_id}`)) {
         mostrarToast('La fábrica vio tu modificación', 'success');
     }
+    reconciliarCliente(data.pedido.cliente_id);
 });
 
-/**
- * Actualizar badges de pedidos modificados sin ver
- */
-function actualizarBadgesModificadosSinVer() {
-    // Actualizar badges de clientes
-    document.querySelectorAll('[id^="cliente-"]').forEach(clienteDiv => {
-        const clienteId = clienteDiv.id.replace('cliente-', '');
-        const botonCliente = document.querySelector(`[data-bs-target="#collapseCliente${clienteId}"]`);
-        
-        if (!botonCliente) return;
-        
-        // Contar pedidos modificados sin ver
-        const pedidosRows = clienteDiv.querySelectorAll('.pedido-row');
-        let modificadosSinVer = 0;
-        
-        pedidosRows.forEach(row => {
-            if (row.classList.contains('table-warning')) {
-                modificadosSinVer++;
-            }
-        });
-        
-        // Actualizar/remover badge de modificados
-        let badgeModificados = botonCliente.querySelector('.badge.bg-danger.animate-pulse');
-        
-        if (modificadosSinVer > 0) {
-            if (!badgeModificados) {
-                // Crear badge si no existe
-                const nuevosBadge = document.createElement('span');
-                nuevosBadge.className = 'badge bg-danger ms-2 animate-pulse';
-                nuevosBadge.innerHTML = `<i class="fas fa-exclamation-circle"></i> ${modificadosSinVer} sin ver`;
-                
-                // Insertarlo después del badge de total pedidos
-                const badgeTotal = botonCliente.querySelector('.badge.bg-secondary');
-                if (badgeTotal) {
-                    badgeTotal.insertAdjacentElement('afterend', nuevosBadge);
-                } else {
-                    botonCliente.appendChild(nuevosBadge);
-                }
-            } else {
-                // Actualizar el número
-                badgeModificados.innerHTML = `<i class="fas fa-exclamation-circle"></i> ${modificadosSinVer} sin ver`;
-            }
-        } else {
-            // Remover badge si ya no hay modificados
-            if (badgeModificados) {
-                badgeModificados.remove();
-            }
-        }
-    });
-    
-    // Actualizar badges de rutas
-    document.querySelectorAll('[id^="ruta-"]').forEach(rutaDiv => {
-        const rutaIndex = rutaDiv.id.replace('ruta-', '');
-        const botonRuta = document.querySelector(`[data-bs-target="#collapseRuta${rutaIndex}"]`);
-        
-        if (!botonRuta) return;
-        
-        // Contar modificados en toda la ruta
-        let modificadosRuta = 0;
-        const clientesDivs = rutaDiv.querySelectorAll('[id^="cliente-"]');
-        
-        clientesDivs.forEach(clienteDiv => {
-            const pedidosRows = clienteDiv.querySelectorAll('.pedido-row');
-            pedidosRows.forEach(row => {
-                if (row.classList.contains('table-warning')) {
-                    modificadosRuta++;
-                }
-            });
-        });
-        
-        // Actualizar/remover badge de ruta
-        let badgeModificadosRuta = botonRuta.querySelector('.badge.bg-danger.animate-pulse');
-        
-        if (modificadosRuta > 0) {
-            if (!badgeModificadosRuta) {
-                const nuevosBadge = document.createElement('span');
-                nuevosBadge.className = 'badge bg-danger ms-2 animate-pulse';
-                nuevosBadge.innerHTML = `<i class="fas fa-exclamation-circle"></i> ${modificadosRuta} sin ver`;
-                botonRuta.appendChild(nuevosBadge);
-            } else {
-                badgeModificadosRuta.innerHTML = `<i class="fas fa-exclamation-circle"></i> ${modificadosRuta} sin ver`;
-            }
-        } else {
-            if (badgeModificadosRuta) {
-                badgeModificadosRuta.remove();
-            }
-        }
-    });
-}
-
 /**
  * Actualizar badges de rutas (pendientes y modificados)
  */
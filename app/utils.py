@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Utilidades que comparten varios servicios.
+"""
+
+import unicodedata
+
+
+def normalizar(texto):
+    """
+    Forma de comparar nombres escritos a mano: minusculas, sin acentos y con
+    los espacios de mas quitados ("Pán  Dulce" -> "pan dulce"). La usan la
+    demanda de produccion, las sugerencias de productos y la busqueda de
+    clientes, asi las tres juntan las mismas variantes.
+    """
+    sin_acentos = ''.join(
+        caracter for caracter in unicodedata.normalize('NFKD', texto or '')
+        if not unicodedata.combining(caracter)
+    )
+    return ' '.join(sin_acentos.casefold().split())
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de rendimiento de la aplicacion.
+Cada modulo se ejecuta con: python -m benchmarks.<modulo>
+"""
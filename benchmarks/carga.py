@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de carga sintética para toda la aplicación.
+
+Carga una base con un tamaño parametrizable (rutas, clientes por ruta,
+pedidos por cliente y semanas archivadas) y la recorre con usuarios
+virtuales concurrentes (un hilo por usuario) que usan las rutas reales de
+Flask: los vendedores cargan, editan y consultan pedidos; los operarios
+cambian estados y consultan el tablero. Cada usuario mantiene además un
+socket de Socket.IO abierto, así que cada cambio reparte sus eventos como
+en producción.
+
+Por cada endpoint informa p50/p95/p99 de latencia, consultas SQL por
+petición y peticiones por segundo. Los resultados se pueden guardar como
+línea base y comparar con una base guardada: si algún endpoint empeora
+más que la tolerancia, el comando termina con código 1.
+
+Ejecutar con:
+    python -m benchmarks.carga --rutas 3 --clientes 50 --pedidos 10 --semanas 4 --duracion 30
+    python -m benchmarks.carga --comparar benchmarks/bases/carga_sqlite.json
+
+⚠️ Borra y vuelve a crear todas las tablas de la base indicada en --db.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+RUTAS = ['Ruta 14', 'Ruta 12', 'Corrientes']
+ESTADOS = ['pendiente', 'completado', 'cancelado']
+PRODUCTOS = [f'Producto {i}' for i in range(1, 51)]
+CLAVE_USUARIOS = 'bench'
+TAMANO_LOTE_CARGA = 10000
+
+# Umbrales para considerar que un endpoint empeoró respecto de la base:
+# p50 más de un 30 % peor (p95, que es más ruidoso, el doble), y al menos
+# 2 ms; las consultas por petición no dependen de la máquina.
+TOLERANCIA_LATENCIA = 0.3
+PISO_LATENCIA_MS = 2.0
+TOLERANCIA_CONSULTAS = 0.5
+
+
+# ============================================================
+# DATOS
+# ============================================================
+
+def nombres_rutas(cantidad):
+    """Las rutas de la aplicación y, si se piden más, rutas numeradas"""
+    return (RUTAS + [f'Ruta bench {i}' for i in range(len(RUTAS) + 1, cantidad + 1)])[:cantidad]
+
+
+def _fila_pedido(aleatorio, cliente_id, fecha):
+    """Valores de un pedido sintético"""
+    return {
+        'cliente_id': cliente_id,
+        'producto_nombre': aleatorio.choice(PRODUCTOS),
+        'cantidad': aleatorio.randint(1, 100),
+        'unidad': 'unidades',
+        'estado': aleatorio.choice(ESTADOS),
+        'modificado': aleatorio.random() < 0.05,
+        'visto_por_fabrica': aleatorio.random() < 0.5,
+        'visto_por_vendedor': aleatorio.random() < 0.5,
+        'esperando_contestacion': aleatorio.random() < 0.05,
+        'observaciones_fabrica': 'Observación' if aleatorio.random() < 0.1 else None,
+        'version': 1,
+        'fecha_creacion': fecha,
+        'fecha_actualizacion': fecha,
+    }
+
+
+def _insertar_por_lotes(db, modelo, filas):
+    """INSERT de muchas filas, confirmando cada TAMANO_LOTE_CARGA"""
+    for inicio in range(0, len(filas), TAMANO_LOTE_CARGA):
+        db.session.execute(db.insert(modelo), filas[inicio:inicio + TAMANO_LOTE_CARGA])
+        db.session.commit()
+
+
+def sembrar(db, args):
+    """
+    Crea las tablas desde cero y carga usuarios, clientes, pedidos activos y
+    semanas archivadas.
+
+    Returns:
+        dict con 'cliente_ids', 'pedido_ids', 'semanas', 'vendedores' y 'operarios'
+    """
+    from app.models.usuario import Usuario
+    from app.models.cliente import Cliente
+    from app.models.pedido import Pedido
+    from app.models.pedido_archivado import PedidoArchivado
+    from app.services.semanas import crear_particion
+
+    db.drop_all()
+    db.create_all()
+
+    usuarios = {'vendedor': [], 'operario': []}
+    for rol, cantidad in (('vendedor', args.vendedores), ('operario', args.operarios)):
+        for i in range(cantidad):
+            username = f'{CLAVE_USUARIOS}_{rol}_{i}'
+            usuario = Usuario(nombre=f'Bench {rol} {i}', username=username,
+                              email=f'{username}@ejemplo.com', rol=rol)
+            usuario.set_password(CLAVE_USUARIOS)
+            db.session.add(usuario)
+            usuarios[rol].append(username)
+    db.session.commit()
+    creador = Usuario.query.filter_by(rol='vendedor').first()
+
+    ahora = datetime.utcnow()
+    db.session.execute(db.insert(Cliente), [
+        {
+            'nombre': f'Cliente {ruta} {i}',
+            'ruta': ruta,
+            'activo': True,
+            'creado_por_id': creador.id,
+            'fecha_creacion': ahora,
+        }
+        for ruta in nombres_rutas(args.rutas)
+        for i in range(args.clientes)
+    ])
+    db.session.commit()
+    cliente_ids = [fila.id for fila in db.session.query(Cliente.id)]
+
+    aleatorio = random.Random(42)
+
+    # Semanas archivadas (una particion por semana en PostgreSQL)
+    semanas = []
+    for numero in range(args.semanas, 0, -1):
+        semana = f'Semana bench {numero:02d}'
+        fecha = ahora - timedelta(weeks=numero)
+        if db.engine.dialect.name == 'postgresql':
+            crear_particion(semana)
+        filas = []
+        siguiente_id = (args.semanas - numero + 1) * 10 ** 7
+        for cliente_id in cliente_ids:
+            for _ in range(args.pedidos):
+                fila = _fila_pedido(aleatorio, cliente_id, fecha)
+                fila.update(id=siguiente_id, semana_archivado=semana, fecha_archivado=fecha)
+                siguiente_id += 1
+                filas.append(fila)
+        _insertar_por_lotes(db, PedidoArchivado, filas)
+        semanas.append(semana)
+
+    _insertar_por_lotes(db, Pedido, [
+        _fila_pedido(aleatorio, cliente_id, ahora - timedelta(minutes=aleatorio.randint(0, 60 * 24 * 6)))
+        for cliente_id in cliente_ids
+        for _ in range(args.pedidos)
+    ])
+    pedido_ids = [fila.id for fila in db.session.query(Pedido.id)]
+
+    return {
+        'cliente_ids': cliente_ids,
+        'pedido_ids': pedido_ids,
+        'semanas': semanas,
+        'vendedores': usuarios['vendedor'],
+        'operarios': usuarios['operario'],
+    }
+
+
+# ============================================================
+# OPERACIONES
+# ============================================================
+
+def _nuevo_pedido(cliente, aleatorio, datos):
+    lineas = aleatorio.randint(1, 5)
+    return cliente.post('/ventas/pedido/nuevo', data={
+        'cliente_id': aleatorio.choice(datos['cliente_ids']),
+        'productos[]': [aleatorio.choice(PRODUCTOS) for _ in range(lineas)],
+        'cantidades[]': [str(aleatorio.randint(1, 20)) for _ in range(lineas)],
+        'unidades[]': ['unidades'] * lineas,
+        'notas[]': [''] * lineas,
+    })
+
+
+def _editar_pedido(cliente, aleatorio, datos):
+    pedido_id = aleatorio.choice(datos['pedido_ids'])
+    return cliente.post(f'/ventas/pedido/{pedido_id}/editar', data={
+        'producto_nombre': aleatorio.choice(PRODUCTOS),
+        'cantidad': str(aleatorio.randint(1, 20)),
+        'unidad': 'unidades',
+        'notas_vendedor': f'Nota {aleatorio.randint(1, 1000)}',
+    })
+
+
+def _actualizar_estado(cliente, aleatorio, datos):
+    pedido_id = aleatorio.choice(datos['pedido_ids'])
+    return cliente.post(f'/fabrica/pedido/{pedido_id}/actualizar-estado-rapido',
+                        json={'estado': aleatorio.choice(ESTADOS)})
+
+
+# Rol -> [(endpoint, peso, operacion)]. El nombre es el endpoint de Flask.
+OPERACIONES = {
+    'vendedor': [
+        ('ventas.dashboard', 3, lambda c, a, d: c.get('/ventas/dashboard')),
+        ('ventas.api_cliente_fragmento', 3,
+         lambda c, a, d: c.get(f"/ventas/api/cliente/{a.choice(d['cliente_ids'])}/fragmento")),
+        ('ventas.nuevo_pedido', 2, _nuevo_pedido),
+        ('ventas.editar_pedido', 2, _editar_pedido),
+        ('ventas.historial_semanas', 1, lambda c, a, d: c.get('/ventas/historial-semanas')),
+        ('ventas.ver_semana', 1,
+         lambda c, a, d: c.get(f"/ventas/ver-semana/{a.choice(d['semanas'])}") if d['semanas'] else None),
+    ],
+    'operario': [
+        ('fabrica.dashboard', 3, lambda c, a, d: c.get('/fabrica/dashboard')),
+        ('fabrica.api_cliente_fragmento', 2,
+         lambda c, a, d: c.get(f"/fabrica/api/cliente/{a.choice(d['cliente_ids'])}/fragmento")),
+        ('fabrica.obtener_todos_pedidos', 2, lambda c, a, d: c.get('/fabrica/api/pedidos?limite=50')),
+        ('fabrica.actualizar_estado_rapido', 3, _actualizar_estado),
+        ('fabrica.marcar_pedido_visto', 1,
+         lambda c, a, d: c.post(f"/fabrica/pedido/{a.choice(d['pedido_ids'])}/marcar-visto")),
+    ],
+}
+
+
+# ============================================================
+# MEDICION
+# ============================================================
+
+class Medidor:
+    """Junta las mediciones de todos los hilos"""
+
+    def __init__(self):
+        self.activo = False
+        self.tiempos = defaultdict(list)
+        self.consultas = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.eventos = defaultdict(int)
+        self._candado = threading.Lock()
+
+    def registrar(self, endpoint, milisegundos, consultas, ok):
+        if not self.activo:
+            return
+        with self._candado:
+            self.tiempos[endpoint].append(milisegundos)
+            self.consultas[endpoint].append(consultas)
+            if not ok:
+                self.errores[endpoint] += 1
+
+    def registrar_eventos(self, rol, cantidad):
+        if not self.activo:
+            return
+        with self._candado:
+            self.eventos[rol] += cantidad
+
+
+def percentil(valores, porcentaje):
+    """Percentil por interpolación (valores ya ordenados)"""
+    if len(valores) == 1:
+        return valores[0]
+    posicion = (len(valores) - 1) * porcentaje / 100
+    abajo = int(posicion)
+    arriba = min(abajo + 1, len(valores) - 1)
+    return valores[abajo] + (valores[arriba] - valores[abajo]) * (posicion - abajo)
+
+
+def resumir(medidor, duracion):
+    """Estadísticas por endpoint"""
+    resumen = {}
+    for endpoint in sorted(medidor.tiempos):
+        tiempos = sorted(medidor.tiempos[endpoint])
+        resumen[endpoint] = {
+            'peticiones': len(tiempos),
+            'errores': medidor.errores[endpoint],
+            'p50_ms': round(percentil(tiempos, 50), 2),
+            'p95_ms': round(percentil(tiempos, 95), 2),
+            'p99_ms': round(percentil(tiempos, 99), 2),
+            'consultas': round(statistics.mean(medidor.consultas[endpoint]), 2),
+            'por_segundo': round(len(tiempos) / duracion, 1),
+        }
+    return resumen
+
+
+def contar_eventos(socketio, medidor, roles_por_socket):
+    """
+    Cuenta los paquetes que el servidor entrega a cada socket. Los sockets de
+    prueba no tienen transporte: los envíos a salas se cuentan (ya
+    codificados) en el punto donde saldrían por la red.
+    """
+    def entregar(eio_sid, paquete):
+        medidor.registrar_eventos(roles_por_socket.get(eio_sid, 'otro'), 1)
+
+    socketio.server._send_eio_packet = entregar
+
+
+def usuario_virtual(app, socketio, rol, username, datos, medidor, contador, fin, semilla, pausa, roles_por_socket):
+    """Hilo de un usuario: inicia sesión, abre su socket y repite operaciones al azar"""
+    aleatorio = random.Random(semilla)
+    operaciones = OPERACIONES[rol]
+    pesos = [peso for _, peso, _ in operaciones]
+
+    cliente = app.test_client()
+    respuesta = cliente.post('/auth/login', data={'username': username, 'password': CLAVE_USUARIOS})
+    if respuesta.status_code != 302:
+        raise RuntimeError(f'No se pudo iniciar sesión como {username}')
+    socket = socketio.test_client(app, flask_test_client=cliente)
+    roles_por_socket[socket.eio_sid] = rol
+
+    while time.monotonic() < fin:
+        endpoint, _, operacion = aleatorio.choices(operaciones, weights=pesos)[0]
+        contador.consultas = 0
+        inicio = time.perf_counter()
+        respuesta = operacion(cliente, aleatorio, datos)
+        if respuesta is None:
+            continue
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        medidor.registrar(endpoint, milisegundos, contador.consultas, respuesta.status_code < 400)
+        if pausa:
+            time.sleep(pausa / 1000)
+
+    socket.disconnect()
+
+
+def correr_carga(app, socketio, db, datos, args):
+    """Lanza los usuarios virtuales y retorna (medidor, duración medida en segundos)"""
+    from sqlalchemy import event
+
+    contador = threading.local()
+    with app.app_context():
+        motor = db.engine
+
+    @event.listens_for(motor, 'before_cursor_execute')
+    def contar(*_):
+        contador.consultas = getattr(contador, 'consultas', 0) + 1
+
+    medidor = Medidor()
+    roles_por_socket = {}
+    contar_eventos(socketio, medidor, roles_por_socket)
+    fin = time.monotonic() + args.calentamiento + args.duracion
+
+    hilos = []
+    usuarios = [('vendedor', u) for u in datos['vendedores']] + [('operario', u) for u in datos['operarios']]
+    for numero, (rol, username) in enumerate(usuarios):
+        hilo = threading.Thread(
+            target=usuario_virtual,
+            args=(app, socketio, rol, username, datos, medidor, contador, fin, numero, args.pausa, roles_por_socket),
+            daemon=True
+        )
+        hilo.start()
+        hilos.append(hilo)
+
+    time.sleep(args.calentamiento)
+    medidor.activo = True
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.join()
+    medidor.activo = False
+
+    event.remove(motor, 'before_cursor_execute', contar)
+    return medidor, time.monotonic() - inicio
+
+
+# ============================================================
+# LINEA BASE
+# ============================================================
+
+def comparar(resumen, base, tolerancia=TOLERANCIA_LATENCIA):
+    """
+    Endpoints que empeoraron respecto de la línea base.
+
+    Returns:
+        list de textos (vacía si no hay regresiones)
+    """
+    regresiones = []
+    for endpoint, actual in resumen.items():
+        anterior = base['endpoints'].get(endpoint)
+        if anterior is None:
+            continue
+        for medida, margen in (('p50_ms', tolerancia), ('p95_ms', tolerancia * 2)):
+            limite = max(anterior[medida] * (1 + margen), anterior[medida] + PISO_LATENCIA_MS)
+            if actual[medida] > limite:
+                regresiones.append(f"{endpoint}: {medida[:3]} {anterior[medida]} -> {actual[medida]} ms")
+        if actual['consultas'] > anterior['consultas'] + TOLERANCIA_CONSULTAS:
+            regresiones.append(f"{endpoint}: consultas {anterior['consultas']} -> {actual['consultas']}")
+        if actual['errores'] > anterior['errores']:
+            regresiones.append(f"{endpoint}: errores {anterior['errores']} -> {actual['errores']}")
+    return regresiones
+
+
+def imprimir(resumen):
+    """Tabla de resultados por endpoint"""
+    print(f"\n{'endpoint':<36}{'n':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'sql':>7}{'req/s':>8}")
+    for endpoint, datos in resumen.items():
+        print(f"{endpoint:<36}{datos['peticiones']:>7}{datos['errores']:>5}{datos['p50_ms']:>9}"
+              f"{datos['p95_ms']:>9}{datos['p99_ms']:>9}{datos['consultas']:>7}{datos['por_segundo']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador de carga de la aplicación')
+    parser.add_argument('--db', default='sqlite:////tmp/benchmark_carga.db',
+                        help='URL de la base de prueba (se borra y se vuelve a crear)')
+    parser.add_argument('--rutas', type=int, default=3, help='Cantidad de rutas')
+    parser.add_argument('--clientes', type=int, default=50, help='Clientes por ruta')
+    parser.add_argument('--pedidos', type=int, default=10, help='Pedidos activos por cliente (y por semana archivada)')
+    parser.add_argument('--semanas', type=int, default=4, help='Semanas archivadas')
+    parser.add_argument('--vendedores', type=int, default=4, help='Vendedores simultáneos')
+    parser.add_argument('--operarios', type=int, default=4, help='Operarios simultáneos')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de medición')
+    parser.add_argument('--calentamiento', type=float, default=3, help='Segundos iniciales sin medir')
+    parser.add_argument('--pausa', type=float, default=0, help='Milisegundos de espera entre operaciones de un usuario')
+    parser.add_argument('--salida', default=None, help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--guardar-base', default=None, help='Guardar los resultados como línea base en este archivo')
+    parser.add_argument('--comparar', default=None, help='Línea base (JSON) contra la que comparar')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_LATENCIA,
+                        help='Empeoramiento de latencia tolerado (0.3 = 30 %% en p50, el doble en p95)')
+    args = parser.parse_args()
+
+    # La configuración lee DATABASE_URL al importarse
+    os.environ['DATABASE_URL'] = args.db
+    from app import create_app, db, socketio
+
+    app = create_app('production')
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        print('=' * 60)
+        print('BENCHMARK DE CARGA')
+        print('=' * 60)
+
+        print(f'\nCargando {args.rutas} rutas x {args.clientes} clientes x {args.pedidos} pedidos'
+              f' ({args.semanas} semanas archivadas) en {args.db}...')
+        datos = sembrar(db, args)
+        db.session.remove()
+
+    print(f'\n{args.vendedores} vendedores y {args.operarios} operarios durante {args.duracion} s...')
+    medidor, duracion = correr_carga(app, socketio, db, datos, args)
+    resumen = resumir(medidor, duracion)
+    imprimir(resumen)
+    total = sum(d['peticiones'] for d in resumen.values())
+    print(f'\nTotal: {total} peticiones, {round(total / duracion, 1)} por segundo')
+    print(f"Paquetes de Socket.IO entregados por rol: {dict(medidor.eventos)}")
+
+    resultados = {
+        'motor': args.db.split(':', 1)[0],
+        'fecha': datetime.utcnow().isoformat(timespec='seconds'),
+        'parametros': {clave: getattr(args, clave) for clave in (
+            'rutas', 'clientes', 'pedidos', 'semanas', 'vendedores', 'operarios', 'duracion', 'pausa'
+        )},
+        'endpoints': resumen,
+        'eventos': dict(medidor.eventos),
+    }
+
+    for destino in (args.salida, args.guardar_base):
+        if destino:
+            os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+            with open(destino, 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+            print(f'\nResultados guardados en {destino}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        if base['parametros'] != resultados['parametros']:
+            print('\n⚠️ La línea base se midió con otros parámetros: la comparación es orientativa')
+        regresiones = comparar(resumen, base, args.tolerancia)
+        if regresiones:
+            print('\nREGRESIONES:')
+            for regresion in regresiones:
+                print(f'   - {regresion}')
+            sys.exit(1)
+        print('\nSin regresiones respecto de la línea base.')
+
+
+if __name__ == '__main__':
+    main()
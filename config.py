@@ -4,6 +4,40 @@ from dotenv import load_dotenv
 # Cargar variables de entorno desde .env
 load_dotenv()
 
+
+def opciones_motor_postgres():
+    """
+    SQLALCHEMY_ENGINE_OPTIONS para PostgreSQL (psycopg 3).
+
+    El pool es por proceso: el total de conexiones abiertas puede llegar a
+    GUNICORN_WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW), y tiene que entrar
+    en el limite de conexiones de la base administrada.
+    """
+    connect_args = {
+        'application_name': os.environ.get('DB_APPLICATION_NAME', 'gestion-pedidos'),
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+    }
+    
+    # Tiempo maximo por consulta en el servidor (0 = sin limite)
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+    if statement_timeout:
+        connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+    
+    # Ejecuciones antes de preparar una consulta en el servidor.
+    # 'none' las desactiva (necesario detras de PgBouncer en modo transaction)
+    prepare_threshold = os.environ.get('DB_PREPARE_THRESHOLD', '5')
+    connect_args['prepare_threshold'] = None if prepare_threshold.lower() == 'none' else int(prepare_threshold)
+    
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),  # Conexiones fijas por proceso
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),  # Conexiones extra en picos
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),  # Segundos esperando una conexion libre
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # Renovar conexiones viejas
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',  # Descartar conexiones cortadas
+        'connect_args': connect_args,
+    }
+
+
 class Config:
     """Configuración base de la aplicación"""
     
@@ -18,6 +52,58 @@ class Config:
     SESSION_COOKIE_SECURE = False  # En producción poner True (requiere HTTPS)
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    
+    # Limpieza de pedidos archivados
+    DIAS_RETENCION_ARCHIVO = int(os.environ.get('DIAS_RETENCION_ARCHIVO', 30))  # Días que se conserva el historial
+    TAMANO_LOTE_PURGA = int(os.environ.get('TAMANO_LOTE_PURGA', 5000))  # Pedidos borrados por cada DELETE
+    
+    # Importacion masiva de clientes y pedidos desde CSV
+    TAMANO_LOTE_IMPORTACION = int(os.environ.get('TAMANO_LOTE_IMPORTACION', 5000))  # Filas por COPY/INSERT
+    
+    # Instrumentacion de peticiones y SQL (ver app/instrumentacion.py)
+    INSTRUMENTACION_ACTIVA = os.environ.get('INSTRUMENTACION_ACTIVA', '1') != '0'
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'  # Encabezado Server-Timing en las respuestas
+    UMBRAL_PETICION_LENTA_MS = int(os.environ.get('UMBRAL_PETICION_LENTA_MS', 500))  # Se registra en el log
+    UMBRAL_CONSULTAS_PETICION = int(os.environ.get('UMBRAL_CONSULTAS_PETICION', 100))  # Idem, por cantidad de consultas
+    CONSULTAS_LENTAS_POR_PETICION = int(os.environ.get('CONSULTAS_LENTAS_POR_PETICION', 5))
+    CONSULTAS_LENTAS_GUARDADAS = int(os.environ.get('CONSULTAS_LENTAS_GUARDADAS', 20))  # Por proceso
+    
+    # Token para consultar /estado/* sin iniciar sesion (monitoreo)
+    TOKEN_METRICAS = os.environ.get('TOKEN_METRICAS') or None
+    
+    # Cache de contadores de los dashboards (ver app/services/contadores.py)
+    CACHE_CONTADORES_URL = os.environ.get('CACHE_CONTADORES_URL') or None  # redis://... para compartirla entre procesos
+    CACHE_CONTADORES_TTL = int(os.environ.get('CACHE_CONTADORES_TTL', 60))  # Segundos hasta recalcular desde la base
+    CACHE_CONTADORES_MAXIMO = int(os.environ.get('CACHE_CONTADORES_MAXIMO', 2000))  # Entradas en la cache local
+    
+    # Demanda de produccion por producto (ver app/services/demanda.py)
+    DEMANDA_TTL = int(os.environ.get('DEMANDA_TTL', 60))  # Segundos hasta recalcular desde la base
+    
+    # Sugerencias de productos al cargar pedidos (ver app/services/productos.py)
+    SUGERENCIAS_TTL = int(os.environ.get('SUGERENCIAS_TTL', 300))  # Segundos hasta reconstruir el indice en segundo plano
+    
+    # Busqueda de clientes al cargar pedidos (ver app/services/busqueda_clientes.py)
+    BUSQUEDA_CLIENTES_TTL = int(os.environ.get('BUSQUEDA_CLIENTES_TTL', 300))  # Segundos hasta reconstruir el indice en memoria o volver a comprobar pg_trgm
+    
+    # Cache de las paginas de semanas archivadas (ver app/services/cache_semanas.py)
+    CACHE_SEMANAS_DIR = os.environ.get('CACHE_SEMANAS_DIR') or None  # Carpeta compartida por los workers (si no, memoria del proceso)
+    CACHE_SEMANAS_MAXIMO = int(os.environ.get('CACHE_SEMANAS_MAXIMO', 20))  # Paginas en memoria
+    CACHE_SEMANAS_TTL = int(os.environ.get('CACHE_SEMANAS_TTL', 3600))  # Segundos que vale cada pagina en memoria
+    
+    # Tablero en memoria de los dashboards (ver app/services/tablero.py)
+    TABLERO_TTL = float(os.environ.get('TABLERO_TTL', 0))  # Segundos sin revisar cambios de otros procesos (0: en cada carga)
+    
+    # Cache de usuarios de la sesion (evita una consulta por peticion)
+    CACHE_USUARIOS_TTL = int(os.environ.get('CACHE_USUARIOS_TTL', 30))  # Segundos que vale cada entrada
+    CACHE_USUARIOS_MAXIMO = int(os.environ.get('CACHE_USUARIOS_MAXIMO', 500))  # Usuarios guardados por proceso
+    
+    # Socket.IO con varios procesos (workers de gunicorn o varios servidores)
+    # Cola de mensajes compartida: redis://host:6379/0, amqp://... o
+    # filesystem:///carpeta (Kombu sobre archivos, sin servidor, para una sola maquina)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'gestion-pedidos')
+    # Solo WebSocket (sin long-polling): no hacen falta sesiones pegajosas entre workers
+    SOCKETIO_SOLO_WEBSOCKET = os.environ.get('SOCKETIO_SOLO_WEBSOCKET', '0') == '1'
 
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
@@ -39,6 +125,10 @@ class ProductionConfig(Config):
         database_url = database_url.replace('postgresql://', 'postgresql+psycopg://', 1)
     
     SQLALCHEMY_DATABASE_URI = database_url or 'sqlite:///gestion_pedidos.db'
+    
+    # Pool de conexiones y parametros de sesion de PostgreSQL
+    if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+        SQLALCHEMY_ENGINE_OPTIONS = opciones_motor_postgres()
 
 # Diccionario para seleccionar configuración
 config = {
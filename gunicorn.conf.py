@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Configuracion de gunicorn con workers de eventlet (WebSocket).
+
+Un worker:  gunicorn -c gunicorn.conf.py wsgi:app
+Varios workers en una maquina (GUNICORN_WORKERS=4) necesitan:
+    - SOCKETIO_MESSAGE_QUEUE, para que un emit llegue a los sockets de
+      todos los workers
+    - SOCKETIO_SOLO_WEBSOCKET=1, porque gunicorn reparte las peticiones
+      entre workers sin sesiones pegajosas y el long-polling se rompe
+
+Varios servidores (o un gunicorn de un worker por puerto) detras de nginx
+con sesiones pegajosas: ver deploy/nginx.conf.
+"""
+
+import os
+from config import Config
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+worker_class = 'eventlet'
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+worker_connections = int(os.getenv('GUNICORN_CONEXIONES', 1000))
+
+# Conexiones a la base: cada worker tiene su propio pool
+conexiones_por_worker = int(os.getenv('DB_POOL_SIZE', 5)) + int(os.getenv('DB_MAX_OVERFLOW', 5))
+limite_conexiones = int(os.getenv('DB_MAX_CONEXIONES', 0))  # Limite del plan de Postgres (0 = no verificar)
+if limite_conexiones and workers * conexiones_por_worker > limite_conexiones:
+    raise RuntimeError(
+        f'{workers} workers x {conexiones_por_worker} conexiones superan DB_MAX_CONEXIONES={limite_conexiones}: '
+        'bajar DB_POOL_SIZE / DB_MAX_OVERFLOW o GUNICORN_WORKERS'
+    )
+
+if workers > 1:
+    if not Config.SOCKETIO_MESSAGE_QUEUE:
+        raise RuntimeError('GUNICORN_WORKERS > 1 requiere SOCKETIO_MESSAGE_QUEUE (redis://, amqp:// o filesystem:///carpeta)')
+    if not Config.SOCKETIO_SOLO_WEBSOCKET:
+        raise RuntimeError('GUNICORN_WORKERS > 1 requiere SOCKETIO_SOLO_WEBSOCKET=1 (gunicorn no tiene sesiones pegajosas)')
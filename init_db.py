@@ -11,6 +11,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
+from app.services.esquema import preparar_esquema
 from app.models.usuario import Usuario
 from app.models.cliente import Cliente
 from app.models.producto import Producto
@@ -37,7 +38,7 @@ def init_database():
             
             # Crear todas las tablas
             print("\nCreando nuevas tablas...")
-            db.create_all()
+            preparar_esquema()  # Crea el esquema con las migraciones
             print("OK - Tablas creadas exitosamente")
             
             # Verificar tablas creadas
@@ -0,0 +1,44 @@
+"""indices compuestos pedidos
+
+Índices compuestos y parciales (solo pedidos activos) para las consultas
+de los dashboards.
+
+Revision ID: 057ce523e6ee
+Revises: 646ebd9a9682
+Create Date: 2026-10-17 12:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '057ce523e6ee'
+down_revision = '646ebd9a9682'
+branch_labels = None
+depends_on = None
+
+
+# nombre -> (columnas, condicion extra ademas de archivado = false)
+INDICES = {
+    'ix_pedidos_activos_estado': (['archivado', 'estado'], None),
+    'ix_pedidos_activos_modificados': (['archivado', 'modificado', 'visto_por_fabrica'], None),
+    'ix_pedidos_activos_cliente_fecha': (['cliente_id', 'archivado', 'fecha_creacion'], None),
+    'ix_pedidos_activos_no_leidos': (['archivado', 'visto_por_vendedor'], 'observaciones_fabrica IS NOT NULL'),
+}
+
+
+def upgrade():
+    for nombre, (columnas, extra) in INDICES.items():
+        condicion_pg = 'archivado = false' + (f' AND {extra}' if extra else '')
+        condicion_sqlite = 'archivado = 0' + (f' AND {extra}' if extra else '')
+        op.create_index(
+            nombre, 'pedidos', columnas, unique=False,
+            postgresql_where=sa.text(condicion_pg),
+            sqlite_where=sa.text(condicion_sqlite)
+        )
+
+
+def downgrade():
+    for nombre in reversed(list(INDICES)):
+        op.drop_index(nombre, table_name='pedidos')
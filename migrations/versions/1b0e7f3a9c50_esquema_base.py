@@ -0,0 +1,112 @@
+"""esquema base
+
+Tablas tal como estaban antes de la primera migracion (init), para que
+`flask db upgrade` arme una base vacia con toda la cadena. En una base
+existente esta revision ya esta aplicada (es anterior a init).
+
+Revision ID: 1b0e7f3a9c50
+Revises: 
+Create Date: 2026-02-09 03:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b0e7f3a9c50'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'usuarios',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=100), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('rol', sa.String(length=20), nullable=False),
+        sa.Column('activo', sa.Boolean(), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+        sa.Column('ultima_conexion', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_usuarios_username'), ['username'], unique=True)
+        batch_op.create_index(batch_op.f('ix_usuarios_email'), ['email'], unique=True)
+
+    op.create_table(
+        'productos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=200), nullable=False),
+        sa.Column('descripcion', sa.Text(), nullable=True),
+        sa.Column('precio', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column('unidad', sa.String(length=50), nullable=True),
+        sa.Column('disponible', sa.Boolean(), nullable=False),
+        sa.Column('stock_minimo', sa.Integer(), nullable=True),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('productos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_productos_nombre'), ['nombre'], unique=True)
+
+    op.create_table(
+        'clientes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(length=200), nullable=False),
+        sa.Column('telefono', sa.String(length=50), nullable=True),
+        sa.Column('direccion', sa.String(length=300), nullable=True),
+        sa.Column('ruta', sa.String(length=50), nullable=False),
+        sa.Column('notas', sa.Text(), nullable=True),
+        sa.Column('activo', sa.Boolean(), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+        sa.Column('creado_por_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['creado_por_id'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('clientes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_clientes_nombre'), ['nombre'], unique=False)
+
+    op.create_table(
+        'pedidos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cliente_id', sa.Integer(), nullable=False),
+        sa.Column('producto_nombre', sa.String(length=200), nullable=False),
+        sa.Column('cantidad', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('unidad', sa.String(length=50), nullable=True),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('operario_id', sa.Integer(), nullable=True),
+        sa.Column('observaciones_fabrica', sa.Text(), nullable=True),
+        sa.Column('notas_vendedor', sa.Text(), nullable=True),
+        sa.Column('modificado', sa.Boolean(), nullable=False),
+        sa.Column('visto_por_fabrica', sa.Boolean(), nullable=False),
+        sa.Column('visto_por_vendedor', sa.Boolean(), nullable=False),
+        sa.Column('esperando_contestacion', sa.Boolean(), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+        sa.Column('fecha_completado', sa.DateTime(), nullable=True),
+        sa.Column('archivado', sa.Boolean(), nullable=False),
+        sa.Column('fecha_archivado', sa.DateTime(), nullable=True),
+        sa.Column('semana_archivado', sa.String(length=50), nullable=True),
+        sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id']),
+        sa.ForeignKeyConstraint(['operario_id'], ['usuarios.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pedidos_cliente_id'), ['cliente_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pedidos_estado'), ['estado'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pedidos_operario_id'), ['operario_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pedidos_fecha_creacion'), ['fecha_creacion'], unique=False)
+        batch_op.create_index(batch_op.f('idx_pedidos_archivado'), ['archivado'], unique=False)
+
+
+def downgrade():
+    op.drop_table('pedidos')
+    op.drop_table('clientes')
+    op.drop_table('productos')
+    op.drop_table('usuarios')
@@ -1,7 +1,7 @@
 """init
 
 Revision ID: 220ad3d6dc9e
-Revises: 
+Revises: 1b0e7f3a9c50
 Create Date: 2026-02-09 03:02:27.931505
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '220ad3d6dc9e'
-down_revision = None
+down_revision = '1b0e7f3a9c50'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,106 @@
+"""pedidos_archivo
+
+Tabla de pedidos archivados, separada de la tabla de pedidos activos.
+En PostgreSQL se particiona por LIST (semana_archivado), con una particion
+por semana y una particion por defecto.
+
+Revision ID: 646ebd9a9682
+Revises: 220ad3d6dc9e
+Create Date: 2026-10-17 11:20:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '646ebd9a9682'
+down_revision = '220ad3d6dc9e'
+branch_labels = None
+depends_on = None
+
+
+COLUMNAS = (
+    'id, cliente_id, producto_nombre, cantidad, unidad, estado, operario_id, '
+    'observaciones_fabrica, notas_vendedor, modificado, visto_por_fabrica, '
+    'visto_por_vendedor, esperando_contestacion, fecha_creacion, '
+    'fecha_actualizacion, fecha_completado'
+)
+
+
+def _nombre_particion(semana):
+    return 'pedidos_archivo_' + re.sub(r'[^a-z0-9]+', '_', semana.lower()).strip('_')
+
+
+def upgrade():
+    bind = op.get_bind()
+    es_postgresql = bind.dialect.name == 'postgresql'
+
+    op.create_table(
+        'pedidos_archivo',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('semana_archivado', sa.String(length=50), nullable=False),
+        sa.Column('fecha_archivado', sa.DateTime(), nullable=False),
+        sa.Column('cliente_id', sa.Integer(), nullable=False),
+        sa.Column('producto_nombre', sa.String(length=200), nullable=False),
+        sa.Column('cantidad', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('unidad', sa.String(length=50), nullable=True),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('operario_id', sa.Integer(), nullable=True),
+        sa.Column('observaciones_fabrica', sa.Text(), nullable=True),
+        sa.Column('notas_vendedor', sa.Text(), nullable=True),
+        sa.Column('modificado', sa.Boolean(), nullable=False),
+        sa.Column('visto_por_fabrica', sa.Boolean(), nullable=False),
+        sa.Column('visto_por_vendedor', sa.Boolean(), nullable=False),
+        sa.Column('esperando_contestacion', sa.Boolean(), nullable=False),
+        sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+        sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+        sa.Column('fecha_completado', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id'], ),
+        sa.ForeignKeyConstraint(['operario_id'], ['usuarios.id'], ),
+        sa.PrimaryKeyConstraint('id', 'semana_archivado'),
+        postgresql_partition_by='LIST (semana_archivado)'
+    )
+    with op.batch_alter_table('pedidos_archivo', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_pedidos_archivo_cliente_id'), ['cliente_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_pedidos_archivo_fecha_archivado'), ['fecha_archivado'], unique=False)
+
+    # Una particion por cada semana ya archivada, mas la particion por defecto
+    if es_postgresql:
+        semanas = bind.execute(sa.text(
+            "SELECT DISTINCT COALESCE(semana_archivado, 'Sin semana') FROM pedidos WHERE archivado = true"
+        )).scalars().all()
+        for semana in semanas:
+            valor = semana.replace("'", "''")
+            op.execute(
+                f'CREATE TABLE IF NOT EXISTS "{_nombre_particion(semana)}" '
+                f"PARTITION OF pedidos_archivo FOR VALUES IN ('{valor}')"
+            )
+        op.execute('CREATE TABLE IF NOT EXISTS pedidos_archivo_default PARTITION OF pedidos_archivo DEFAULT')
+
+    # Mover los pedidos ya archivados a la nueva tabla
+    op.execute(
+        f"INSERT INTO pedidos_archivo ({COLUMNAS}, fecha_archivado, semana_archivado) "
+        f"SELECT {COLUMNAS}, COALESCE(fecha_archivado, fecha_actualizacion, fecha_creacion), "
+        f"COALESCE(semana_archivado, 'Sin semana') "
+        f"FROM pedidos WHERE archivado = true"
+    )
+    op.execute("DELETE FROM pedidos WHERE archivado = true")
+
+
+def downgrade():
+    # Devolver los pedidos archivados a la tabla de pedidos
+    op.execute(
+        f"INSERT INTO pedidos ({COLUMNAS}, archivado, fecha_archivado, semana_archivado) "
+        f"SELECT {COLUMNAS}, true, fecha_archivado, semana_archivado "
+        f"FROM pedidos_archivo"
+    )
+
+    with op.batch_alter_table('pedidos_archivo', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_pedidos_archivo_fecha_archivado'))
+        batch_op.drop_index(batch_op.f('ix_pedidos_archivo_cliente_id'))
+
+    # En PostgreSQL las particiones se eliminan junto con la tabla padre
+    op.drop_table('pedidos_archivo')
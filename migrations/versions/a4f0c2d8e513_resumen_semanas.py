@@ -0,0 +1,97 @@
+"""resumen_semanas
+
+Tabla con el resumen de cada semana cerrada (pedidos por estado, ruta y
+producto, primeras y ultimas fechas), cargada desde `pedidos_archivo`.
+
+Revision ID: a4f0c2d8e513
+Revises: d91f2b7c4a63
+Create Date: 2026-10-17 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f0c2d8e513'
+down_revision = 'd91f2b7c4a63'
+branch_labels = None
+depends_on = None
+
+
+ESTADOS = {'pendiente': 'pendientes', 'completado': 'completados', 'cancelado': 'cancelados'}
+
+
+def _minimo(actual, nuevo):
+    return nuevo if actual is None or (nuevo is not None and nuevo < actual) else actual
+
+
+def _maximo(actual, nuevo):
+    return nuevo if actual is None or (nuevo is not None and nuevo > actual) else actual
+
+
+def upgrade():
+    resumen_semanas = op.create_table(
+        'resumen_semanas',
+        sa.Column('semana', sa.String(length=50), nullable=False),
+        sa.Column('total_pedidos', sa.Integer(), nullable=False),
+        sa.Column('pendientes', sa.Integer(), nullable=False),
+        sa.Column('completados', sa.Integer(), nullable=False),
+        sa.Column('cancelados', sa.Integer(), nullable=False),
+        sa.Column('por_ruta', sa.JSON(), nullable=False),
+        sa.Column('por_producto', sa.JSON(), nullable=False),
+        sa.Column('primer_cierre', sa.DateTime(), nullable=True),
+        sa.Column('ultimo_cierre', sa.DateTime(), nullable=True),
+        sa.Column('primer_pedido', sa.DateTime(), nullable=True),
+        sa.Column('ultimo_pedido', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('semana')
+    )
+    op.create_index('ix_resumen_semanas_primer_cierre', 'resumen_semanas', ['primer_cierre'], unique=False)
+
+    # Semanas ya archivadas
+    pedidos_archivo = sa.table(
+        'pedidos_archivo',
+        sa.column('id', sa.Integer), sa.column('semana_archivado', sa.String),
+        sa.column('cliente_id', sa.Integer), sa.column('estado', sa.String),
+        sa.column('producto_nombre', sa.String), sa.column('fecha_archivado', sa.DateTime),
+        sa.column('fecha_creacion', sa.DateTime)
+    )
+    clientes = sa.table('clientes', sa.column('id', sa.Integer), sa.column('ruta', sa.String))
+
+    filas = op.get_bind().execute(sa.select(
+        pedidos_archivo.c.semana_archivado, pedidos_archivo.c.estado, clientes.c.ruta,
+        pedidos_archivo.c.producto_nombre, sa.func.count(pedidos_archivo.c.id),
+        sa.func.min(pedidos_archivo.c.fecha_archivado), sa.func.max(pedidos_archivo.c.fecha_archivado),
+        sa.func.min(pedidos_archivo.c.fecha_creacion), sa.func.max(pedidos_archivo.c.fecha_creacion)
+    ).select_from(
+        pedidos_archivo.outerjoin(clientes, clientes.c.id == pedidos_archivo.c.cliente_id)
+    ).group_by(
+        pedidos_archivo.c.semana_archivado, pedidos_archivo.c.estado, clientes.c.ruta,
+        pedidos_archivo.c.producto_nombre
+    ))
+
+    resumenes = {}
+    for semana, estado, ruta, producto, total, primer_cierre, ultimo_cierre, primer_pedido, ultimo_pedido in filas:
+        resumen = resumenes.setdefault(semana, {
+            'semana': semana, 'total_pedidos': 0, 'pendientes': 0, 'completados': 0, 'cancelados': 0,
+            'por_ruta': {}, 'por_producto': {}, 'primer_cierre': None, 'ultimo_cierre': None,
+            'primer_pedido': None, 'ultimo_pedido': None
+        })
+        resumen['total_pedidos'] += total
+        if estado in ESTADOS:
+            resumen[ESTADOS[estado]] += total
+        ruta = ruta or 'Sin ruta'
+        resumen['por_ruta'][ruta] = resumen['por_ruta'].get(ruta, 0) + total
+        resumen['por_producto'][producto] = resumen['por_producto'].get(producto, 0) + total
+        resumen['primer_cierre'] = _minimo(resumen['primer_cierre'], primer_cierre)
+        resumen['ultimo_cierre'] = _maximo(resumen['ultimo_cierre'], ultimo_cierre)
+        resumen['primer_pedido'] = _minimo(resumen['primer_pedido'], primer_pedido)
+        resumen['ultimo_pedido'] = _maximo(resumen['ultimo_pedido'], ultimo_pedido)
+
+    if resumenes:
+        op.bulk_insert(resumen_semanas, list(resumenes.values()))
+
+
+def downgrade():
+    op.drop_index('ix_resumen_semanas_primer_cierre', table_name='resumen_semanas')
+    op.drop_table('resumen_semanas')
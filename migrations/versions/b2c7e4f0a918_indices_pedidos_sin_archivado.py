@@ -0,0 +1,62 @@
+"""indices pedidos sin archivado
+
+Desde que el cierre de semana mueve los pedidos a pedidos_archivo, la tabla
+pedidos solo tiene pedidos activos: la condicion `archivado = false` de los
+indices parciales no filtra nada. Se rearman sin la columna ni la condicion;
+ix_pedidos_activos_estado quedaria igual a ix_pedidos_estado y se borra.
+
+Revision ID: b2c7e4f0a918
+Revises: f3a8c6e14b07
+Create Date: 2026-10-17 23:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c7e4f0a918'
+down_revision = 'f3a8c6e14b07'
+branch_labels = None
+depends_on = None
+
+
+# nombre -> (columnas, condicion)
+INDICES = {
+    'ix_pedidos_activos_modificados': (['modificado', 'visto_por_fabrica'], None),
+    'ix_pedidos_activos_cliente_fecha': (['cliente_id', 'fecha_creacion'], None),
+    'ix_pedidos_activos_no_leidos': (['visto_por_vendedor'], 'observaciones_fabrica IS NOT NULL'),
+}
+
+# Definicion anterior (057ce523e6ee): nombre -> (columnas, condicion extra ademas de archivado = false)
+INDICES_ANTERIORES = {
+    'ix_pedidos_activos_estado': (['archivado', 'estado'], None),
+    'ix_pedidos_activos_modificados': (['archivado', 'modificado', 'visto_por_fabrica'], None),
+    'ix_pedidos_activos_cliente_fecha': (['cliente_id', 'archivado', 'fecha_creacion'], None),
+    'ix_pedidos_activos_no_leidos': (['archivado', 'visto_por_vendedor'], 'observaciones_fabrica IS NOT NULL'),
+}
+
+
+def upgrade():
+    for nombre in INDICES_ANTERIORES:
+        op.drop_index(nombre, table_name='pedidos')
+
+    for nombre, (columnas, condicion) in INDICES.items():
+        opciones = {}
+        if condicion:
+            opciones = {'postgresql_where': sa.text(condicion), 'sqlite_where': sa.text(condicion)}
+        op.create_index(nombre, 'pedidos', columnas, unique=False, **opciones)
+
+
+def downgrade():
+    for nombre in INDICES:
+        op.drop_index(nombre, table_name='pedidos')
+
+    for nombre, (columnas, extra) in INDICES_ANTERIORES.items():
+        condicion_pg = 'archivado = false' + (f' AND {extra}' if extra else '')
+        condicion_sqlite = 'archivado = 0' + (f' AND {extra}' if extra else '')
+        op.create_index(
+            nombre, 'pedidos', columnas, unique=False,
+            postgresql_where=sa.text(condicion_pg),
+            sqlite_where=sa.text(condicion_sqlite)
+        )
@@ -0,0 +1,29 @@
+"""version pedidos
+
+Columna `version` en pedidos, incrementada en cada UPDATE. Se envía en los
+eventos de Socket.IO para que los clientes descarten eventos viejos.
+
+Revision ID: b7d41c2e9f10
+Revises: 057ce523e6ee
+Create Date: 2026-10-17 14:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41c2e9f10'
+down_revision = '057ce523e6ee'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('pedidos', schema=None) as batch_op:
+        batch_op.drop_column('version')
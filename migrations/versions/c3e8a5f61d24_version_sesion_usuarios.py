@@ -0,0 +1,30 @@
+"""version sesion usuarios
+
+Columna `version_sesion` en usuarios. Aumenta al cambiar el rol, el estado
+o la contraseña, y la sesion deja de valer si no coincide (ver
+app/services/usuarios.py).
+
+Revision ID: c3e8a5f61d24
+Revises: b7d41c2e9f10
+Create Date: 2026-10-17 15:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a5f61d24'
+down_revision = 'b7d41c2e9f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version_sesion', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('usuarios', schema=None) as batch_op:
+        batch_op.drop_column('version_sesion')
@@ -0,0 +1,75 @@
+"""pedidos sin archivado
+
+Desde que el cierre de semana mueve los pedidos a pedidos_archivo, las
+columnas archivado, fecha_archivado y semana_archivado de pedidos no se usan
+(siempre false / NULL) y se borran, junto con ix_pedidos_archivado.
+
+En SQLite la tabla se rearma con AUTOINCREMENT: sin eso, cuando el cierre
+deja pedidos vacia se vuelven a dar ids ya usados, que chocan con los de
+pedidos_archivo ((id, semana_archivado) en un segundo cierre de la misma
+semana) y con los que tienen los clientes en exportaciones y caches. La
+secuencia arranca despues del mayor id de las dos tablas. En PostgreSQL el
+id ya sale de una secuencia que no retrocede.
+
+Revision ID: c6d2a8f4e7b1
+Revises: b2c7e4f0a918
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d2a8f4e7b1'
+down_revision = 'b2c7e4f0a918'
+branch_labels = None
+depends_on = None
+
+
+# Indice parcial de pedidos: el modo batch de SQLite no conserva la condicion
+INDICE_PARCIAL = ('ix_pedidos_activos_no_leidos', ['visto_por_vendedor'], 'observaciones_fabrica IS NOT NULL')
+
+
+def _rearmar_pedidos(autoincrement, cambios):
+    """Aplica los cambios a pedidos y, en SQLite, la rearma con o sin AUTOINCREMENT"""
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    nombre, columnas, condicion = INDICE_PARCIAL
+
+    if sqlite:
+        op.drop_index(nombre, table_name='pedidos')
+
+    opciones = {'recreate': 'always', 'table_kwargs': {'sqlite_autoincrement': autoincrement}} if sqlite else {}
+    with op.batch_alter_table('pedidos', schema=None, **opciones) as batch_op:
+        cambios(batch_op)
+
+    if sqlite:
+        op.create_index(nombre, 'pedidos', columnas, unique=False, sqlite_where=sa.text(condicion))
+
+
+def upgrade():
+    def cambios(batch_op):
+        batch_op.drop_index(batch_op.f('ix_pedidos_archivado'))
+        batch_op.drop_column('semana_archivado')
+        batch_op.drop_column('fecha_archivado')
+        batch_op.drop_column('archivado')
+
+    _rearmar_pedidos(True, cambios)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'pedidos'")
+        op.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'pedidos', MAX("
+            "COALESCE((SELECT MAX(id) FROM pedidos), 0), "
+            "COALESCE((SELECT MAX(id) FROM pedidos_archivo), 0))"
+        )
+
+
+def downgrade():
+    def cambios(batch_op):
+        batch_op.add_column(sa.Column('archivado', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('fecha_archivado', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('semana_archivado', sa.String(length=50), nullable=True))
+        batch_op.create_index(batch_op.f('ix_pedidos_archivado'), ['archivado'], unique=False)
+
+    _rearmar_pedidos(False, cambios)
@@ -0,0 +1,29 @@
+"""indices fecha id
+
+Índices (fecha_creacion, id) en pedidos y pedidos_archivo para la
+paginación por cursor de /fabrica/api/pedidos.
+
+Revision ID: d91f2b7c4a63
+Revises: c3e8a5f61d24
+Create Date: 2026-10-17 17:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91f2b7c4a63'
+down_revision = 'c3e8a5f61d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_pedidos_fecha_id', 'pedidos', ['fecha_creacion', 'id'], unique=False)
+    op.create_index('ix_pedidos_archivo_fecha_id', 'pedidos_archivo', ['fecha_creacion', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_pedidos_archivo_fecha_id', table_name='pedidos_archivo')
+    op.drop_index('ix_pedidos_fecha_id', table_name='pedidos')
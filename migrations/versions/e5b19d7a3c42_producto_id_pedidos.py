@@ -0,0 +1,54 @@
+"""producto_id pedidos
+
+Columna opcional `producto_id` en pedidos y en pedidos_archivo (el cierre
+de semana la copia): el producto del catalogo cuyo nombre coincide con el
+escrito. Se completa para los pedidos que ya coinciden (sin distinguir
+mayusculas ni espacios de los extremos).
+
+Revision ID: e5b19d7a3c42
+Revises: a4f0c2d8e513
+Create Date: 2026-10-17 21:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b19d7a3c42'
+down_revision = 'a4f0c2d8e513'
+branch_labels = None
+depends_on = None
+
+
+# Tablas con la columna y nombre de la clave foranea de cada una
+TABLAS = {
+    'pedidos': 'fk_pedidos_producto_id_productos',
+    'pedidos_archivo': 'fk_pedidos_archivo_producto_id_productos',
+}
+
+
+def upgrade():
+    for tabla, clave_foranea in TABLAS.items():
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('producto_id', sa.Integer(), nullable=True))
+            batch_op.create_index(f'ix_{tabla}_producto_id', ['producto_id'], unique=False)
+            batch_op.create_foreign_key(
+                clave_foranea, 'productos', ['producto_id'], ['id'], ondelete='SET NULL'
+            )
+
+        op.execute(
+            f"UPDATE {tabla} SET producto_id = ("
+            "SELECT productos.id FROM productos "
+            f"WHERE lower(productos.nombre) = lower(trim({tabla}.producto_nombre)) "
+            "ORDER BY productos.id LIMIT 1"
+            ")"
+        )
+
+
+def downgrade():
+    for tabla, clave_foranea in TABLAS.items():
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.drop_constraint(clave_foranea, type_='foreignkey')
+            batch_op.drop_index(f'ix_{tabla}_producto_id')
+            batch_op.drop_column('producto_id')
@@ -0,0 +1,54 @@
+"""busqueda clientes trgm
+
+Solo PostgreSQL: extensiones pg_trgm y unaccent, funcion inmutable
+f_unaccent y un indice GIN de trigramas sobre f_unaccent(lower(nombre))
+de clientes, para la busqueda de clientes (ver
+app/services/busqueda_clientes.py). Si no hay permisos para crear las
+extensiones la migracion no hace nada y la busqueda usa el indice en
+memoria.
+
+Revision ID: f3a8c6e14b07
+Revises: e5b19d7a3c42
+Create Date: 2026-10-17 23:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c6e14b07'
+down_revision = 'e5b19d7a3c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conexion = op.get_bind()
+    if conexion.dialect.name != 'postgresql':
+        return
+
+    try:
+        with conexion.begin_nested():
+            conexion.execute(sa.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            conexion.execute(sa.text('CREATE EXTENSION IF NOT EXISTS unaccent'))
+            # unaccent() no es IMMUTABLE: se envuelve para poder indexarla
+            conexion.execute(sa.text(
+                'CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text '
+                'LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT '
+                "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+            ))
+            conexion.execute(sa.text(
+                'CREATE INDEX IF NOT EXISTS ix_clientes_nombre_trgm ON clientes '
+                'USING gin (f_unaccent(lower(nombre)) gin_trgm_ops)'
+            ))
+    except sa.exc.DBAPIError:
+        pass  # Sin permisos para crear extensiones
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('DROP INDEX IF EXISTS ix_clientes_nombre_trgm')
+    op.execute('DROP FUNCTION IF EXISTS f_unaccent(text)')
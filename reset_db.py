@@ -11,6 +11,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
+from app.services.esquema import preparar_esquema
 
 
 def reset_database():
@@ -44,7 +45,7 @@ def reset_database():
             print("OK - Tablas eliminadas")
             
             # Recrear todas las tablas
-            db.create_all()
+            preparar_esquema()  # Crea el esquema con las migraciones
             print("OK - Tablas recreadas")
             
             print("\n" + "=" * 60)
@@ -5,6 +5,14 @@ Ejecutar con: python run.py
 """
 
 import os
+from config import Config
+
+# Con cola de mensajes, Kombu y Redis necesitan los sockets parcheados por eventlet
+# (gunicorn con worker_class='eventlet' ya lo hace solo)
+if Config.SOCKETIO_MESSAGE_QUEUE:
+    import eventlet
+    eventlet.monkey_patch()
+
 from app import create_app, socketio
 
 # Determinar entorno (desarrollo o producción)
@@ -12,7 +20,12 @@ config_name = os.getenv('FLASK_ENV', 'development')
 app = create_app(config_name)
 
 if __name__ == '__main__':
-    # En desarrollo
+    # En desarrollo la base se prepara sola (en produccion: flask preparar-base)
+    if config_name == 'development':
+        from app.services.esquema import preparar_esquema
+        with app.app_context():
+            preparar_esquema()
+    
     socketio.run(
         app,
         host='0.0.0.0',
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures de las pruebas: app con una base SQLite en memoria.
+"""
+
+import os
+
+# La configuracion lee DATABASE_URL al importarse
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.models.cliente import Cliente
+from app.models.usuario import Usuario
+
+
+def _vaciar_caches():
+    """Las caches en memoria son del proceso y cada prueba arranca con una base nueva"""
+    from app.services import busqueda_clientes, cache_semanas, contadores, demanda, productos, tablero
+    contadores._cache = None
+    cache_semanas._cache = None
+    productos._estado.update(indice=None, vence=0.0, construyendo=None)
+    demanda._estado.update(lineas=None, vence=0.0)
+    busqueda_clientes._estado.update(indice=None, vence=0.0, trigramas_en_base=False, trigramas_vence=0.0)
+    tablero._estado.update(actual=None, clientes=set(), todo=False)
+
+
+@pytest.fixture
+def app():
+    """App de prueba con el esquema creado en una base en memoria"""
+    app = create_app('development')
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        _vaciar_caches()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def contar_consultas(app):
+    """
+    Cuenta las sentencias que llegan a la base:
+
+        with contar_consultas() as consultas:
+            ...
+        consultas['total']
+    """
+    class Contador:
+        def __enter__(self):
+            self.consultas = {'total': 0}
+            event.listen(db.engine, 'before_cursor_execute', self._contar)
+            return self.consultas
+
+        def __exit__(self, *args):
+            event.remove(db.engine, 'before_cursor_execute', self._contar)
+
+        def _contar(self, *args, **kwargs):
+            self.consultas['total'] += 1
+
+    return Contador
+
+
+@pytest.fixture
+def usuarios(app):
+    """Un vendedor y un operario"""
+    vendedor = Usuario(nombre='Vendedor', username='vendedor', email='v@ejemplo.com', rol='vendedor')
+    operario = Usuario(nombre='Operario', username='operario', email='o@ejemplo.com', rol='operario')
+    vendedor.set_password('clave')
+    operario.set_password('clave')
+    db.session.add_all([vendedor, operario])
+    db.session.commit()
+    return vendedor, operario
+
+
+@pytest.fixture
+def cliente(usuarios):
+    """Un cliente del vendedor, en Ruta 14"""
+    cliente = Cliente(nombre='Cliente', ruta='Ruta 14', creado_por_id=usuarios[0].id)
+    db.session.add(cliente)
+    db.session.commit()
+    return cliente
+
+
+@pytest.fixture
+def iniciar_sesion(app):
+    """Cliente HTTP con la sesion iniciada: iniciar_sesion('vendedor') o iniciar_sesion('operario')"""
+    def iniciar(username):
+        cliente_http = app.test_client()
+        respuesta = cliente_http.post('/auth/login', data={'username': username, 'password': 'clave'})
+        assert respuesta.status_code == 302
+        return cliente_http
+    return iniciar
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Busqueda de clientes con el indice en memoria (SQLite): coincidencias sin
+acentos ni mayusculas, en orden, y el indice al dia con los cambios de
+clientes que se confirman (los de un rollback se descartan).
+"""
+
+import pytest
+from app import db
+from app.models.cliente import Cliente
+from app.services import busqueda_clientes
+from app.services.busqueda_clientes import buscar_clientes, construir_indice
+
+
+@pytest.fixture
+def clientes(usuarios):
+    """Clientes activos y uno inactivo, con el indice ya armado"""
+    creado_por_id = usuarios[0].id
+    db.session.add_all([
+        Cliente(nombre='Panadería San Martín', ruta='Ruta 14', telefono='111', creado_por_id=creado_por_id),
+        Cliente(nombre='Almacen Don Martin', ruta='Ruta 12', creado_por_id=creado_por_id),
+        Cliente(nombre='Kiosco La Esquina', ruta='Ruta 14', creado_por_id=creado_por_id),
+        Cliente(nombre='Martina Inactiva', ruta='Ruta 14', activo=False, creado_por_id=creado_por_id),
+    ])
+    db.session.commit()
+    buscar_clientes('martin')
+    return creado_por_id
+
+
+def _nombres(texto):
+    return [cliente['nombre'] for cliente in buscar_clientes(texto)]
+
+
+def _coincide_con_la_base():
+    """El indice mantenido tiene los mismos clientes que uno armado desde la base"""
+    indice = busqueda_clientes._estado['indice']
+    assert indice is not None
+    assert indice.clientes == construir_indice().clientes
+
+
+def test_usa_el_indice_en_memoria(clientes, contar_consultas):
+    with contar_consultas() as consultas:
+        buscar_clientes('esquina')
+    assert consultas['total'] == 0
+
+
+def test_coincidencias_en_orden(clientes):
+    # Primero el que empieza con el texto, despues por prefijo de palabra y al final el resto
+    assert _nombres('martin') == ['Almacen Don Martin', 'Panadería San Martín']
+    assert _nombres('MARTÍN  san') == ['Panadería San Martín']
+    assert _nombres('pana') == ['Panadería San Martín']
+    assert _nombres('artin') == ['Almacen Don Martin', 'Panadería San Martín']
+    assert _nombres('qui') == ['Kiosco La Esquina']
+    assert _nombres('   ') == []
+
+
+def test_alta_y_edicion(clientes):
+    db.session.add(Cliente(nombre='Martín Fierro', ruta='Ruta 12', creado_por_id=clientes))
+    Cliente.query.filter_by(nombre='Kiosco La Esquina').one().nombre = 'Kiosco Martincito'
+    db.session.commit()
+
+    assert _nombres('martin') == ['Martín Fierro', 'Almacen Don Martin', 'Kiosco Martincito', 'Panadería San Martín']
+    assert _nombres('esquina') == []
+    _coincide_con_la_base()
+
+
+def test_baja_e_inactivo(clientes):
+    db.session.delete(Cliente.query.filter_by(nombre='Almacen Don Martin').one())
+    Cliente.query.filter_by(nombre='Kiosco La Esquina').one().activo = False
+    Cliente.query.filter_by(nombre='Martina Inactiva').one().activo = True
+    db.session.commit()
+
+    assert _nombres('martin') == ['Martina Inactiva', 'Panadería San Martín']
+    assert _nombres('kiosco') == []
+    _coincide_con_la_base()
+
+
+def test_rollback(clientes):
+    cliente = Cliente.query.filter_by(nombre='Kiosco La Esquina').one()
+    cliente.nombre = 'Otro nombre'
+    db.session.add(Cliente(nombre='Martín Fierro', ruta='Ruta 12', creado_por_id=clientes))
+    db.session.flush()
+    db.session.rollback()
+
+    # La transaccion siguiente no arrastra los cambios descartados
+    Cliente.query.filter_by(nombre='Kiosco La Esquina').one().telefono = '222'
+    db.session.commit()
+
+    assert _nombres('martin') == ['Almacen Don Martin', 'Panadería San Martín']
+    assert buscar_clientes('esquina')[0]['telefono'] == '222'
+    _coincide_con_la_base()
+
+
+def test_invalidar(clientes):
+    indice = busqueda_clientes._estado['indice']
+    busqueda_clientes.invalidar_busqueda_clientes()
+    db.session.commit()
+
+    assert busqueda_clientes._estado['indice'] is None
+    assert _nombres('esquina') == ['Kiosco La Esquina']
+    assert busqueda_clientes._estado['indice'] is not indice
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Cierre de semana: un cierre repetido no archiva nada, y los pedidos cargados
+despues de un cierre se archivan en un segundo cierre de la misma semana.
+"""
+
+from app import db
+from app.models.pedido import Pedido
+from app.models.pedido_archivado import PedidoArchivado
+from app.models.resumen_semana import ResumenSemana
+from app.services.semanas import cerrar_semana
+
+
+def _agregar_pedidos(cliente, cantidad):
+    db.session.add_all([
+        Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=1, unidad='kg', estado='pendiente')
+        for _ in range(cantidad)
+    ])
+    db.session.commit()
+
+
+def test_sin_pedidos_no_es_duplicado(cliente):
+    resultado = cerrar_semana()
+    assert resultado['total_archivados'] == 0
+    assert not resultado['duplicado']
+
+
+def test_cierre_repetido(cliente):
+    _agregar_pedidos(cliente, 2)
+
+    primero = cerrar_semana()
+    assert primero['total_archivados'] == 2
+    assert not primero['duplicado']
+
+    segundo = cerrar_semana()
+    assert segundo['total_archivados'] == 0
+    assert segundo['duplicado']
+    assert PedidoArchivado.query.count() == 2
+
+
+def test_pedidos_nuevos_despues_del_cierre(cliente):
+    _agregar_pedidos(cliente, 2)
+    primero = cerrar_semana()
+    archivados = {p.id for p in PedidoArchivado.query}
+
+    # Los ids nuevos no repiten los archivados aunque pedidos quede vacia
+    _agregar_pedidos(cliente, 3)
+    nuevos = {p.id for p in Pedido.query}
+    assert not nuevos & archivados
+
+    segundo = cerrar_semana()
+    assert segundo['semana'] == primero['semana']
+    assert segundo['total_archivados'] == 3
+    assert not segundo['duplicado']
+    assert Pedido.query.count() == 0
+    assert PedidoArchivado.query.filter_by(semana_archivado=segundo['semana']).count() == 5
+    assert db.session.get(ResumenSemana, segundo['semana']).total_pedidos == 5
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de contadores de los dashboards: los cambios de cada flush se acumulan
+como diferencias por clave, se aplican al confirmar y se descartan con
+rollback. Despues de cada cambio la cache coincide con la base.
+"""
+
+import pytest
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services import contadores
+from app.services.dashboard import (
+    _calcular_contadores_de_ruta, _columnas_contadores, _fila_a_contadores,
+    contadores_de_cliente, contadores_de_ruta, obtener_totales
+)
+
+
+@pytest.fixture
+def cache(cliente):
+    """Cache vacia, con dos pedidos del cliente y los contadores ya calculados"""
+    contadores.obtener_cache().limpiar()
+    db.session.add_all([
+        Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=1, unidad='kg', estado='pendiente'),
+        Pedido(cliente_id=cliente.id, producto_nombre='Torta', cantidad=2, unidad='kg', estado='completado'),
+    ])
+    db.session.commit()
+    _calentar(cliente)
+    yield contadores.obtener_cache()
+    contadores.obtener_cache().limpiar()
+
+
+def _calentar(cliente):
+    obtener_totales()
+    contadores_de_cliente(cliente.id)
+    contadores_de_ruta(cliente.ruta)
+    contadores_de_ruta(cliente.ruta, solo_clientes_activos=True)
+
+
+def _en_base(clave):
+    """Contadores de la clave calculados desde la base"""
+    if clave == contadores.clave_global():
+        return _fila_a_contadores(db.session.query(*_columnas_contadores()).one())
+    tipo, _, valor = clave.partition(':')
+    if tipo == 'cliente':
+        return _fila_a_contadores(
+            db.session.query(*_columnas_contadores()).filter(Pedido.cliente_id == int(valor)).one()
+        )
+    return _calcular_contadores_de_ruta(valor, solo_clientes_activos=tipo == 'ruta-activos')
+
+
+def _claves(cliente):
+    return [
+        contadores.clave_global(), contadores.clave_cliente(cliente.id),
+        *contadores.claves_de_ruta(cliente.ruta)
+    ]
+
+
+def _coincide_con_la_base(cache, claves):
+    """Las claves que siguen en la cache tienen lo mismo que la base"""
+    for clave in claves:
+        valores = cache.leer(clave)
+        if valores is not None:
+            assert valores == _en_base(clave), clave
+
+
+def test_commit_aplica_los_cambios(cache, cliente, contar_consultas):
+    cliente_id = cliente.id
+    pedido = Pedido.query.filter_by(estado='pendiente').one()
+    pedido.estado = 'completado'
+    db.session.add(Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=3, unidad='kg',
+                          estado='pendiente', observaciones_fabrica='Sin stock'))
+    db.session.commit()
+
+    # Global y cliente se actualizan en el lugar: se leen sin ir a la base
+    with contar_consultas() as consultas:
+        totales = obtener_totales()
+        del_cliente = contadores_de_cliente(cliente_id)
+    assert consultas['total'] == 0
+    assert totales == del_cliente == _en_base(contadores.clave_global())
+    assert totales['completados'] == 2 and totales['no_leidos'] == 1
+
+    _coincide_con_la_base(cache, _claves(cliente))
+
+
+def test_rollback_descarta_los_cambios(cache, cliente):
+    antes = {clave: cache.leer(clave) for clave in _claves(cliente)}
+
+    pedido = Pedido.query.filter_by(estado='pendiente').one()
+    pedido.estado = 'cancelado'
+    db.session.add(Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=1, unidad='kg', estado='pendiente'))
+    db.session.flush()
+    db.session.rollback()
+
+    # La transaccion siguiente no arrastra los cambios descartados
+    cliente.nombre = 'Cliente renombrado'
+    db.session.commit()
+
+    assert {clave: cache.leer(clave) for clave in _claves(cliente)} == antes
+    _coincide_con_la_base(cache, _claves(cliente))
+
+
+def test_diferencias_por_clave_en_cada_flush(cache, cliente, usuarios):
+    otro = Cliente(nombre='Otro', ruta='Ruta 12', creado_por_id=usuarios[0].id)
+    db.session.add(otro)
+    db.session.commit()
+    contadores_de_cliente(otro.id)
+
+    pedido = Pedido.query.filter_by(estado='pendiente').one()
+    pedido.estado = 'completado'
+    db.session.flush()
+
+    diferencias = contadores._pendientes()['diferencias']
+    for clave in [contadores.clave_global(), contadores.clave_cliente(cliente.id), *contadores.claves_de_ruta(cliente.ruta)]:
+        assert diferencias[clave]['pendientes'] == -1
+        assert diferencias[clave]['completados'] == 1
+        assert diferencias[clave]['total'] == 0
+
+    # Un segundo flush se acumula; pasar el pedido a otro cliente lo resta de uno y lo suma al otro
+    pedido.cliente_id = otro.id
+    db.session.flush()
+    assert diferencias[contadores.clave_global()]['total'] == 0
+    assert diferencias[contadores.clave_cliente(cliente.id)]['total'] == -1
+    assert diferencias[contadores.clave_cliente(cliente.id)]['completados'] == 0
+    assert diferencias[contadores.clave_cliente(otro.id)]['completados'] == 1
+    assert set(contadores.claves_de_ruta(cliente.ruta)) <= contadores._pendientes()['invalidar']
+
+    db.session.commit()
+    _coincide_con_la_base(cache, _claves(cliente) + _claves(otro))
+    assert cache.leer(contadores.clave_cliente(otro.id))['total'] == 1
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Demanda de produccion en memoria: los cambios de cada transaccion se aplican
+al confirmar y se descartan con rollback. Despues de cada cambio la demanda
+coincide con la que se calcula desde la base.
+"""
+
+import pytest
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services import demanda
+from app.services.demanda import calcular_desde_base, obtener_demanda
+from app.utils import normalizar
+
+
+@pytest.fixture
+def pedidos(cliente, usuarios):
+    """Pedidos de dos clientes en rutas distintas, con la demanda ya calculada"""
+    otro = Cliente(nombre='Otro', ruta='Ruta 12', creado_por_id=usuarios[0].id)
+    db.session.add(otro)
+    db.session.flush()
+    db.session.add_all([
+        Pedido(cliente_id=cliente.id, producto_nombre='Pan dulce', cantidad=2, unidad='kg', estado='pendiente'),
+        Pedido(cliente_id=cliente.id, producto_nombre='Torta', cantidad=1, unidad='unidades', estado='pendiente'),
+        Pedido(cliente_id=otro.id, producto_nombre='Pan dulce', cantidad=3, unidad='kg', estado='pendiente'),
+        Pedido(cliente_id=otro.id, producto_nombre='Torta', cantidad=5, unidad='unidades', estado='completado'),
+    ])
+    db.session.commit()
+    obtener_demanda()
+    return cliente, otro
+
+
+def _desde_base(ruta=None, por_ruta=False):
+    """Demanda recien calculada desde la base, sin tocar la de memoria"""
+    lineas = demanda._estado['lineas']
+    demanda._estado['lineas'] = calcular_desde_base()
+    try:
+        return obtener_demanda(ruta=ruta, por_ruta=por_ruta)
+    finally:
+        demanda._estado['lineas'] = lineas
+
+
+def _coincide_con_la_base():
+    assert demanda._estado['lineas'] is not None
+    for argumentos in ({}, {'por_ruta': True}, {'ruta': 'Ruta 14'}, {'ruta': 'Ruta 12'}):
+        assert obtener_demanda(**argumentos) == _desde_base(**argumentos), argumentos
+
+
+def _cantidad(producto, unidad='kg'):
+    for linea in obtener_demanda():
+        if linea['producto'] == producto and linea['unidad'] == unidad:
+            return linea['cantidad']
+    return 0
+
+
+def test_alta(pedidos):
+    cliente, _ = pedidos
+    db.session.add(Pedido(cliente_id=cliente.id, producto_nombre='Pan dulce', cantidad=4, unidad='kg', estado='pendiente'))
+    db.session.add(Pedido(cliente_id=cliente.id, producto_nombre='Medialunas', cantidad=12, unidad='unidades', estado='pendiente'))
+    db.session.commit()
+
+    assert _cantidad('Pan dulce') == 9
+    assert _cantidad('Medialunas', 'unidades') == 12
+    _coincide_con_la_base()
+
+
+def test_edicion(pedidos):
+    cliente, _ = pedidos
+    pedido = Pedido.query.filter_by(cliente_id=cliente.id, producto_nombre='Pan dulce').one()
+    pedido.cantidad = 7
+    pedido.unidad = 'unidades'
+    db.session.commit()
+
+    assert _cantidad('Pan dulce') == 3
+    assert _cantidad('Pan dulce', 'unidades') == 7
+    _coincide_con_la_base()
+
+
+def test_cambio_de_estado(pedidos):
+    _, otro = pedidos
+    Pedido.query.filter_by(cliente_id=otro.id, producto_nombre='Pan dulce').one().estado = 'completado'
+    Pedido.query.filter_by(cliente_id=otro.id, producto_nombre='Torta').one().estado = 'pendiente'
+    db.session.commit()
+
+    assert _cantidad('Pan dulce') == 2
+    assert _cantidad('Torta', 'unidades') == 6
+    _coincide_con_la_base()
+
+
+def test_eliminacion(pedidos):
+    cliente, _ = pedidos
+    db.session.delete(Pedido.query.filter_by(cliente_id=cliente.id, producto_nombre='Torta').one())
+    db.session.commit()
+
+    assert _cantidad('Torta', 'unidades') == 0
+    _coincide_con_la_base()
+
+
+def test_cambio_de_ruta_del_cliente(pedidos):
+    _, otro = pedidos
+    otro.ruta = 'Ruta 14'
+    db.session.commit()
+
+    assert obtener_demanda(ruta='Ruta 12') == []
+    assert obtener_demanda(ruta='Ruta 14') == obtener_demanda()
+    _coincide_con_la_base()
+
+
+def test_rollback(pedidos):
+    cliente, _ = pedidos
+    antes = obtener_demanda(por_ruta=True)
+
+    Pedido.query.filter_by(cliente_id=cliente.id, producto_nombre='Pan dulce').one().estado = 'cancelado'
+    db.session.add(Pedido(cliente_id=cliente.id, producto_nombre='Torta', cantidad=9, unidad='unidades', estado='pendiente'))
+    db.session.flush()
+    db.session.rollback()
+
+    # La transaccion siguiente no arrastra los cambios descartados
+    cliente.nombre = 'Cliente renombrado'
+    db.session.commit()
+
+    assert obtener_demanda(por_ruta=True) == antes
+    _coincide_con_la_base()
+
+
+def test_normalizar():
+    assert normalizar('Pán  Dulce ') == normalizar('pan dulce') == 'pan dulce'
+    assert normalizar(None) == ''
+
+
+def test_junta_las_variantes_del_nombre(pedidos):
+    cliente, otro = pedidos
+    db.session.add_all([
+        Pedido(cliente_id=cliente.id, producto_nombre='pan  Dulce', cantidad=1, unidad='KG', estado='pendiente'),
+        Pedido(cliente_id=otro.id, producto_nombre='Pán dulce', cantidad=1, unidad='kg', estado='pendiente'),
+    ])
+    db.session.commit()
+
+    lineas = [linea for linea in obtener_demanda() if linea['unidad'] == 'kg']
+    assert lineas == [{'producto': 'Pan dulce', 'unidad': 'kg', 'cantidad': 7.0, 'pedidos': 4}]
+    _coincide_con_la_base()
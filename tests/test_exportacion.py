@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Nombre del archivo exportado: se arma con los filtros ya interpretados y el
+encabezado Content-Disposition va citado, sin el texto de la URL tal cual.
+"""
+
+import pytest
+from werkzeug.datastructures import MultiDict
+from app.services.exportacion import nombre_archivo
+
+
+@pytest.mark.parametrize('args, esperado', [
+    ({}, 'pedidos.csv'),
+    ({'semana': 'Semana 2026-3O'}, 'pedidos_Semana_2026-3O.csv'),
+    ({'semana': '../"; x=1'}, 'pedidos_x1.csv'),
+    ({'archivado': '1', 'desde': '2026-10-01', 'hasta': '2026-10-07T18:30'},
+     'pedidos_archivados_desde-2026-10-01_hasta-2026-10-07T18-30-00.csv'),
+])
+def test_nombre_archivo(args, esperado):
+    assert nombre_archivo('csv', MultiDict(args)) == esperado
+
+
+def test_encabezado_de_descarga(usuarios, iniciar_sesion):
+    cliente_http = iniciar_sesion('vendedor')
+    respuesta = cliente_http.get('/ventas/exportar/pedidos?semana=a"b%0d%0aSet-Cookie:%20x=1')
+    assert respuesta.status_code == 200
+    assert respuesta.headers['Content-Disposition'] == 'attachment; filename=pedidos_ab_Set-Cookie_x1.csv'
+    assert 'Set-Cookie' not in respuesta.headers
+
+    respuesta = cliente_http.get('/ventas/exportar/pedidos?desde=ayer')
+    assert respuesta.status_code == 400
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Importacion de CSV: las filas validas se insertan por lotes (un INSERT con
+executemany por lote fuera de PostgreSQL) y las filas con errores se
+informan con su numero de linea sin frenar el resto del archivo.
+"""
+
+import io
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.models.producto import Producto
+from app.services.importacion import importar_csv
+
+
+CSV_PEDIDOS = (
+    'cliente;producto_nombre;cantidad;unidad\n'
+    'Cliente;Pan lactal;2,5;kg\n'
+    'Cliente;Facturas;abc;\n'
+    'Nadie;Pan;1;kg\n'
+    '\n'
+    'Cliente;Medialunas;12;\n'
+    'Cliente;pan LACTAL ;1;kg\n'
+)
+
+
+@pytest.fixture
+def inserts():
+    """INSERT INTO pedidos/clientes ejecutados (uno por executemany)"""
+    sentencias = []
+
+    def anotar(conn, cursor, sentencia, parametros, contexto, executemany):
+        if sentencia.startswith(('INSERT INTO pedidos', 'INSERT INTO clientes')):
+            sentencias.append((sentencia, executemany))
+
+    event.listen(db.engine, 'before_cursor_execute', anotar)
+    yield sentencias
+    event.remove(db.engine, 'before_cursor_execute', anotar)
+
+
+def test_pedidos_por_lotes_con_errores_por_fila(cliente, inserts):
+    db.session.add(Producto(nombre='Pan lactal'))
+    db.session.commit()
+
+    resultado = importar_csv('pedidos', io.StringIO(CSV_PEDIDOS), tamano_lote=2)
+
+    assert resultado['leidas'] == 5
+    assert resultado['importadas'] == 3
+    assert resultado['metodo'] == 'executemany'
+    assert [(e['linea'], e['errores'][0].split(':')[0]) for e in resultado['errores']] == [
+        (3, 'cantidad'), (4, 'cliente')
+    ]
+    # 3 filas en lotes de 2: un executemany y un INSERT de una fila
+    assert [executemany for _, executemany in inserts] == [True, False]
+
+    pedidos = Pedido.query.order_by(Pedido.id).all()
+    assert [(p.producto_nombre, float(p.cantidad), p.unidad) for p in pedidos] == [
+        ('Pan lactal', 2.5, 'kg'), ('Medialunas', 12.0, 'unidades'), ('pan LACTAL', 1.0, 'kg')
+    ]
+    # Los valores por defecto del modelo se completan en el lote
+    assert all(p.estado == 'pendiente' and p.version == 1 and p.fecha_creacion for p in pedidos)
+    producto_id = Producto.query.one().id
+    assert [p.producto_id for p in pedidos] == [producto_id, None, producto_id]
+
+
+def test_clientes(usuarios, inserts):
+    archivo = io.StringIO('nombre,ruta,telefono\nAlmacen,Ruta 14,123\n,Ruta 12,\nKiosco,Ruta 99,\n')
+    resultado = importar_csv('clientes', archivo, creado_por_id=usuarios[0].id)
+
+    assert resultado['importadas'] == 1
+    assert [e['linea'] for e in resultado['errores']] == [3, 4]
+    assert len(inserts) == 1
+    assert [(c.nombre, c.ruta, c.activo) for c in Cliente.query] == [('Almacen', 'Ruta 14', True)]
+
+
+def test_faltan_columnas(cliente):
+    with pytest.raises(ValueError, match='cantidad'):
+        importar_csv('pedidos', io.StringIO('cliente,producto_nombre\nCliente,Pan\n'))
+    assert Pedido.query.count() == 0
+
+
+def test_simular_no_inserta(cliente, inserts):
+    resultado = importar_csv('pedidos', io.StringIO(CSV_PEDIDOS), simular=True)
+    assert resultado['importadas'] == 3
+    assert not inserts
+    assert Pedido.query.count() == 0
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+/fabrica/api/pedidos pagina por cursor sobre (fecha_creacion, id): recorre
+todos los pedidos una sola vez aunque haya fechas repetidas o lleguen
+pedidos nuevos entre paginas, y las paginas siguientes filtran por la
+posicion del cursor en vez de saltear filas.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.pedido import Pedido
+
+
+@pytest.fixture
+def pedidos(cliente):
+    """Diez pedidos; de a dos comparten fecha_creacion"""
+    base = datetime(2026, 10, 1, 12, 0)
+    db.session.add_all([
+        Pedido(cliente_id=cliente.id, producto_nombre=f'Pan {i}', cantidad=1, unidad='kg',
+               estado='pendiente', fecha_creacion=base + timedelta(hours=i // 2))
+        for i in range(10)
+    ])
+    db.session.commit()
+    return Pedido.query.order_by(Pedido.fecha_creacion.desc(), Pedido.id.desc()).all()
+
+
+def _recorrer(cliente_http, url, siguiente=None):
+    """Pide todas las paginas desde el cursor; retorna las respuestas"""
+    paginas = []
+    while True:
+        respuesta = cliente_http.get(url + (f'&cursor={siguiente}' if siguiente else ''))
+        assert respuesta.status_code == 200
+        paginas.append(respuesta.get_json())
+        siguiente = paginas[-1]['siguiente']
+        if not siguiente:
+            return paginas
+
+
+def test_recorre_todos_una_vez(usuarios, pedidos, iniciar_sesion):
+    paginas = _recorrer(iniciar_sesion('operario'), '/fabrica/api/pedidos?limite=3')
+
+    assert [len(p['pedidos']) for p in paginas] == [3, 3, 3, 1]
+    assert [d['id'] for p in paginas for d in p['pedidos']] == [p.id for p in pedidos]
+    # El total solo viene en la primera pagina
+    assert paginas[0]['total'] == 10
+    assert all('total' not in p for p in paginas[1:])
+
+
+def test_pedido_nuevo_entre_paginas(usuarios, cliente, pedidos, iniciar_sesion):
+    cliente_http = iniciar_sesion('operario')
+    primera = cliente_http.get('/fabrica/api/pedidos?limite=4').get_json()
+
+    db.session.add(Pedido(cliente_id=cliente.id, producto_nombre='Nuevo', cantidad=1, unidad='kg', estado='pendiente'))
+    db.session.commit()
+
+    resto = _recorrer(cliente_http, '/fabrica/api/pedidos?limite=4', primera['siguiente'])
+    ids = [d['id'] for p in [primera] + resto for d in p['pedidos']]
+    assert ids == [p.id for p in pedidos]
+
+
+def test_filtra_por_el_cursor(usuarios, pedidos, iniciar_sesion):
+    cliente_http = iniciar_sesion('operario')
+    siguiente = cliente_http.get('/fabrica/api/pedidos?limite=3').get_json()['siguiente']
+
+    sentencias = []
+
+    def anotar(conn, cursor, sentencia, parametros, *args):
+        if 'FROM pedidos' in sentencia:
+            sentencias.append((sentencia, parametros))
+
+    event.listen(db.engine, 'before_cursor_execute', anotar)
+    try:
+        respuesta = cliente_http.get(f'/fabrica/api/pedidos?limite=3&cursor={siguiente}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', anotar)
+
+    assert respuesta.status_code == 200
+    # Una sola consulta (sin COUNT), por posicion; SQLite siempre agrega OFFSET 0
+    [(sentencia, parametros)] = sentencias
+    assert '(pedidos.fecha_creacion, pedidos.id) < (?, ?)' in sentencia
+    assert 'OFFSET' not in sentencia or parametros[-1] == 0
+
+
+@pytest.mark.parametrize('parametros', ['cursor=basura', 'modificado=quizas', 'campos=id,clave', 'desde=ayer'])
+def test_parametros_invalidos(usuarios, pedidos, iniciar_sesion, parametros):
+    respuesta = iniciar_sesion('operario').get(f'/fabrica/api/pedidos?{parametros}')
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['success'] is False
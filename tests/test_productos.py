@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Indice de productos: sin indice armado, los ids del catalogo de un pedido
+de varias lineas o de un lote de importacion se buscan con una sola
+consulta, sin armar el indice en la carga de pedidos. Los cambios
+confirmados mientras se reconstruye el indice se cuentan una sola vez.
+"""
+
+import io
+import time
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.pedido import Pedido
+from app.models.producto import Producto
+from app.services import productos
+from app.services.importacion import importar_csv
+
+
+@pytest.fixture
+def catalogo(app):
+    db.session.add_all([Producto(nombre='Pan lactal'), Producto(nombre='Budín inglés'), Producto(nombre='Facturas')])
+    db.session.commit()
+    return {p.nombre: p.id for p in Producto.query}
+
+
+@pytest.fixture
+def consultas_catalogo():
+    """SELECT sobre productos ejecutados"""
+    sentencias = []
+
+    def anotar(conn, cursor, sentencia, *args):
+        if sentencia.startswith('SELECT') and 'FROM productos' in sentencia:
+            sentencias.append(sentencia)
+
+    event.listen(db.engine, 'before_cursor_execute', anotar)
+    yield sentencias
+    event.remove(db.engine, 'before_cursor_execute', anotar)
+
+
+def test_sin_indice_una_consulta(catalogo, consultas_catalogo):
+    ids = productos.productos_de_nombres(['pan LACTAL ', 'budin ingles', 'Torta'])
+
+    assert ids == {'pan LACTAL ': catalogo['Pan lactal'], 'budin ingles': catalogo['Budín inglés'], 'Torta': None}
+    assert len(consultas_catalogo) == 1
+    # La carga de pedidos no arma el indice
+    assert productos._estado['indice'] is None and productos._estado['construyendo'] is None
+
+
+def test_con_indice_no_consulta(catalogo, consultas_catalogo):
+    productos.sugerir_productos('')
+    consultas_catalogo.clear()
+
+    assert productos.producto_del_nombre('FACTURAS') == catalogo['Facturas']
+    assert not consultas_catalogo
+
+
+def test_pedido_de_varias_lineas(catalogo, cliente, iniciar_sesion, consultas_catalogo):
+    cliente_http = iniciar_sesion('vendedor')
+    respuesta = cliente_http.post('/ventas/pedido/nuevo', data={
+        'cliente_id': cliente.id,
+        'productos[]': ['Pan lactal', 'facturas', 'Torta'],
+        'cantidades[]': ['1', '2', '3'],
+        'unidades[]': ['kg', 'docenas', 'unidades'],
+    })
+
+    assert respuesta.status_code == 302
+    assert len(consultas_catalogo) == 1
+    assert [(p.producto_nombre, p.producto_id) for p in Pedido.query.order_by(Pedido.id)] == [
+        ('Pan lactal', catalogo['Pan lactal']), ('facturas', catalogo['Facturas']), ('Torta', None)
+    ]
+
+
+def test_importacion_una_consulta_por_lote(catalogo, cliente, consultas_catalogo):
+    filas = ''.join(f'Cliente,{nombre},1\n' for nombre in ['pan lactal', 'Facturas', 'Torta'] * 2)
+    resultado = importar_csv('pedidos', io.StringIO('cliente,producto_nombre,cantidad\n' + filas), tamano_lote=4)
+
+    assert resultado['importadas'] == 6
+    assert len(consultas_catalogo) == 2
+    assert [p.producto_id for p in Pedido.query.order_by(Pedido.id)] == [
+        catalogo['Pan lactal'], catalogo['Facturas'], None
+    ] * 2
+
+
+def _agregar_pan(cliente):
+    db.session.add(Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=1, unidad='kg', estado='pendiente'))
+
+
+def _usos_pan():
+    return productos._estado['indice'].entradas['pan']['usos']
+
+
+@pytest.fixture
+def indice(cliente):
+    """Indice armado con un pedido de Pan"""
+    _agregar_pan(cliente)
+    db.session.commit()
+    productos.sugerir_productos('')
+    assert _usos_pan() == 1
+
+
+def test_reconstruccion_ya_ve_lo_confirmado_antes(indice, cliente):
+    productos._estado['construyendo'] = []
+    _agregar_pan(cliente)
+    db.session.commit()
+
+    productos._instalar(productos._construir(), 300)
+    assert _usos_pan() == 2
+    assert productos._estado['vence'] > time.monotonic()
+
+
+def test_reconstruccion_aplica_lo_confirmado_despues(indice, cliente):
+    productos._estado['construyendo'] = []
+    construido = productos._construir()
+    _agregar_pan(cliente)
+    db.session.commit()
+
+    productos._instalar(construido, 300)
+    assert _usos_pan() == 2
+    assert productos._estado['vence'] > time.monotonic()
+
+
+def test_reconstruccion_cruzada_vence(indice, cliente):
+    productos._estado['construyendo'] = []
+    _agregar_pan(cliente)
+    db.session.flush()
+    construido = productos._construir()
+    db.session.commit()
+
+    # No se sabe si la lectura vio el pedido: no se aplica y el indice vence
+    productos._instalar(construido, 300)
+    assert _usos_pan() == 2
+    assert productos._estado['vence'] == 0.0
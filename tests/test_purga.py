@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Purga de pedidos archivados antiguos: borra por lotes acotados y resta
+cada lote del resumen de su semana.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.pedido_archivado import PedidoArchivado
+from app.models.resumen_semana import ResumenSemana
+from app.services.purga import purgar_pedidos_antiguos
+from app.services.semanas import sumar_cierre_al_resumen
+
+
+@pytest.fixture
+def archivo(cliente):
+    """
+    Agrega pedidos archivados, como un cierre (con su resumen): 7 en dos
+    semanas viejas y 2 en una reciente. Retorna una funcion que agrega mas
+    (semana, dias desde el cierre, cantidad, estado).
+    """
+    siguiente = iter(range(1, 1000))
+
+    def agregar(semana, dias, cantidad, estado='pendiente'):
+        fecha = datetime.utcnow() - timedelta(days=dias)
+        db.session.add_all([
+            PedidoArchivado(
+                id=next(siguiente), cliente_id=cliente.id, producto_nombre='Pan', cantidad=1,
+                unidad='kg', estado=estado, fecha_creacion=fecha, semana_archivado=semana,
+                fecha_archivado=fecha
+            )
+            for _ in range(cantidad)
+        ])
+        db.session.flush()
+        sumar_cierre_al_resumen(semana, fecha)
+        db.session.commit()
+
+    agregar('Semana vieja 1', 400, 4)
+    agregar('Semana vieja 2', 390, 3)
+    agregar('Semana reciente', 2, 2)
+    return agregar
+
+
+def test_borra_por_lotes(app, archivo):
+    deletes = []
+
+    def contar(conn, cursor, sentencia, *args):
+        if sentencia.startswith('DELETE FROM pedidos_archivo'):
+            deletes.append(sentencia)
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        resultado = purgar_pedidos_antiguos(dias_retencion=30, tamano_lote=3)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
+
+    assert resultado['semanas'] == {'Semana vieja 1': 4, 'Semana vieja 2': 3}
+    assert resultado['total_eliminados'] == 7
+    assert len(deletes) == 3  # 3 + 3 + 1
+    assert {p.semana_archivado for p in PedidoArchivado.query} == {'Semana reciente'}
+
+
+def test_simular_no_borra(app, archivo):
+    resultado = purgar_pedidos_antiguos(dias_retencion=30, simular=True)
+    assert resultado['total'] == 7
+    assert resultado['total_eliminados'] == 0
+    assert PedidoArchivado.query.count() == 9
+
+
+def _totales_por_semana():
+    return {r.semana: (r.total_pedidos, r.pendientes, r.completados) for r in ResumenSemana.query}
+
+
+def test_resta_del_resumen(app, archivo):
+    # Semana con un cierre viejo y otro reciente: queda solo el reciente
+    archivo('Semana mixta', 400, 2, estado='completado')
+    archivo('Semana mixta', 5, 1)
+
+    purgar_pedidos_antiguos(dias_retencion=30, tamano_lote=3)
+
+    assert _totales_por_semana() == {'Semana reciente': (2, 2, 0), 'Semana mixta': (1, 1, 0)}
+    mixta = db.session.get(ResumenSemana, 'Semana mixta')
+    assert mixta.por_ruta == {'Ruta 14': 1}
+    assert mixta.por_producto == {'Pan': 1}
+
+
+def test_lote_fallido_deja_el_resumen_al_dia(app, archivo):
+    deletes = []
+
+    def fallar_en_el_segundo(conn, cursor, sentencia, *args):
+        if sentencia.startswith('DELETE FROM pedidos_archivo'):
+            deletes.append(sentencia)
+            if len(deletes) == 2:
+                raise RuntimeError('corte')
+
+    event.listen(db.engine, 'before_cursor_execute', fallar_en_el_segundo)
+    try:
+        with pytest.raises(RuntimeError):
+            purgar_pedidos_antiguos(dias_retencion=30, tamano_lote=3)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', fallar_en_el_segundo)
+
+    # El primer lote se confirmo con su resta; el segundo no borro ni resto nada
+    restantes = {}
+    for pedido in PedidoArchivado.query:
+        restantes[pedido.semana_archivado] = restantes.get(pedido.semana_archivado, 0) + 1
+    assert sum(restantes.values()) == 6
+    assert {semana: total for semana, (total, _, _) in _totales_por_semana().items()} == restantes
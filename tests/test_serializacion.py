@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+La serializacion en lote usa la misma cantidad de consultas para cualquier
+cantidad de pedidos o clientes.
+"""
+
+import pytest
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services.serializacion import serializar_clientes, serializar_pedidos
+
+
+def _agregar_clientes(usuarios, cantidad):
+    """Agrega `cantidad` clientes con dos pedidos cada uno (uno con operario)"""
+    vendedor, operario = usuarios
+    for i in range(cantidad):
+        cliente = Cliente(nombre=f'Cliente {i}', ruta='Ruta 14', creado_por_id=vendedor.id)
+        db.session.add(cliente)
+        db.session.flush()
+        db.session.add_all([
+            Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=1, unidad='kg', estado='pendiente'),
+            Pedido(cliente_id=cliente.id, producto_nombre='Torta', cantidad=2, unidad='unidades',
+                   estado='completado', operario_id=operario.id),
+        ])
+    db.session.commit()
+
+
+def _consultas_al_serializar(contar_consultas, serializar, modelo):
+    """Consultas de serializar() sobre todos los objetos del modelo, ya cargados"""
+    objetos = modelo.query.order_by(modelo.id).all()
+    with contar_consultas() as consultas:
+        datos = serializar(objetos)
+    assert len(datos) == len(objetos)
+    return consultas['total']
+
+
+@pytest.mark.parametrize('serializar, modelo', [
+    (serializar_pedidos, Pedido),
+    (serializar_clientes, Cliente),
+])
+def test_consultas_constantes(usuarios, contar_consultas, serializar, modelo):
+    _agregar_clientes(usuarios, 5)
+    con_pocos = _consultas_al_serializar(contar_consultas, serializar, modelo)
+
+    _agregar_clientes(usuarios, 45)
+    con_muchos = _consultas_al_serializar(contar_consultas, serializar, modelo)
+
+    assert con_pocos == con_muchos
+
+
+def test_contadores_de_clientes(usuarios):
+    _agregar_clientes(usuarios, 3)
+    datos = serializar_clientes(Cliente.query.all())
+    assert {(d['total_pedidos'], d['pedidos_pendientes'], d['pedidos_completados']) for d in datos} == {(2, 1, 1)}
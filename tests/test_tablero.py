@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Tablero en memoria: un navegador con la version vigente recibe 304, un
+cambio de estado genera una version (y un ETag) nueva que solo vuelve a
+leer la tarjeta de ese cliente, y un rollback no cambia nada.
+"""
+
+import pytest
+from app import db
+from app.models.cliente import Cliente
+from app.models.pedido import Pedido
+from app.services import tablero
+
+
+def _sesion_operario(iniciar_sesion):
+    """Operario con la sesion iniciada, ya sin el mensaje de bienvenida (una pagina con mensajes no lleva ETag)"""
+    cliente_http = iniciar_sesion('operario')
+    cliente_http.get('/fabrica/dashboard')
+    return cliente_http
+
+
+@pytest.fixture
+def clientes(usuarios):
+    """Dos clientes con un pedido pendiente cada uno"""
+    creados = [
+        Cliente(nombre=f'Cliente {i}', ruta='Ruta 14', creado_por_id=usuarios[0].id) for i in range(2)
+    ]
+    db.session.add_all(creados)
+    db.session.flush()
+    db.session.add_all([
+        Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=1, unidad='kg', estado='pendiente')
+        for cliente in creados
+    ])
+    db.session.commit()
+    return creados
+
+
+def test_sin_cambios_304(clientes, iniciar_sesion):
+    cliente_http = _sesion_operario(iniciar_sesion)
+    primera = cliente_http.get('/fabrica/dashboard')
+    assert primera.status_code == 200
+    etag = primera.headers['ETag']
+
+    segunda = cliente_http.get('/fabrica/dashboard', headers={'If-None-Match': etag})
+    assert segunda.status_code == 304
+    assert segunda.headers['ETag'] == etag
+    assert not segunda.data
+
+
+def test_cambio_de_estado_nuevo_etag(clientes, iniciar_sesion):
+    cliente_http = _sesion_operario(iniciar_sesion)
+    etag = cliente_http.get('/fabrica/dashboard').headers['ETag']
+    anterior = tablero.obtener_tablero()
+    pedido = Pedido.query.filter_by(cliente_id=clientes[0].id).one()
+
+    respuesta = cliente_http.post(f'/fabrica/pedido/{pedido.id}/actualizar-estado-rapido', json={'estado': 'completado'})
+    assert respuesta.status_code == 200
+
+    despues = cliente_http.get('/fabrica/dashboard', headers={'If-None-Match': etag})
+    assert despues.status_code == 200
+    assert despues.headers['ETag'] != etag
+
+    actual = tablero.obtener_tablero()
+    assert actual.version > anterior.version
+    assert actual.vista()['totales']['completados'] == 1
+    # Solo se volvio a leer la tarjeta del cliente del pedido
+    assert actual.clientes[clientes[1].id] is anterior.clientes[clientes[1].id]
+    assert actual.clientes[clientes[0].id] is not anterior.clientes[clientes[0].id]
+
+
+def test_rollback_no_cambia_el_tablero(clientes):
+    anterior = tablero.obtener_tablero()
+
+    pedido = Pedido.query.filter_by(cliente_id=clientes[0].id).one()
+    pedido.estado = 'cancelado'
+    db.session.flush()
+    db.session.rollback()
+
+    assert not tablero._estado['clientes'] and not tablero._estado['todo']
+    assert tablero.obtener_tablero() is anterior
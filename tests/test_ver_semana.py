@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Pagina de una semana archivada: el navegador revalida cada carga, con la
+pagina guardada recibe 304 sin que se vuelva a generar, y un nuevo cierre
+de la semana cambia el ETag.
+"""
+
+from urllib.parse import quote
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.pedido import Pedido
+from app.services import cache_semanas
+from app.services.semanas import cerrar_semana
+
+
+def _agregar_pedidos(cliente, cantidad):
+    db.session.add_all([
+        Pedido(cliente_id=cliente.id, producto_nombre='Pan', cantidad=1, unidad='kg', estado='pendiente')
+        for _ in range(cantidad)
+    ])
+    db.session.commit()
+
+
+@pytest.fixture(params=['memoria', 'disco'])
+def semana(request, app, cliente, tmp_path):
+    """Semana cerrada con dos pedidos, con la cache en memoria o en disco; retorna la url de su pagina"""
+    if request.param == 'disco':
+        app.config['CACHE_SEMANAS_DIR'] = str(tmp_path)
+    cache_semanas._cache = None
+    _agregar_pedidos(cliente, 2)
+    return '/ventas/ver-semana/' + quote(cerrar_semana()['semana'])
+
+
+@pytest.fixture
+def cliente_http(iniciar_sesion):
+    """Vendedor con la sesion iniciada, ya sin el mensaje de bienvenida (una pagina con mensajes no lleva ETag)"""
+    cliente_http = iniciar_sesion('vendedor')
+    cliente_http.get('/ventas/historial-semanas')
+    return cliente_http
+
+
+def _lecturas_del_archivo(cliente_http, url, **kwargs):
+    """(respuesta, consultas a pedidos_archivo que hizo)"""
+    lecturas = []
+
+    def contar(conn, cursor, sentencia, *args):
+        if 'pedidos_archivo' in sentencia:
+            lecturas.append(sentencia)
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        respuesta = cliente_http.get(url, **kwargs)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
+    return respuesta, len(lecturas)
+
+
+def test_revalida_y_responde_304_sin_generar(semana, cliente_http):
+    primera, lecturas = _lecturas_del_archivo(cliente_http, semana)
+    assert primera.status_code == 200
+    assert lecturas > 0
+    assert primera.headers['Cache-Control'] == 'private, no-cache'
+    etag = primera.headers['ETag']
+
+    segunda, lecturas = _lecturas_del_archivo(cliente_http, semana, headers={'If-None-Match': etag})
+    assert segunda.status_code == 304
+    assert segunda.headers['ETag'] == etag
+    assert segunda.headers['Cache-Control'] == 'private, no-cache'
+    assert lecturas == 0
+
+
+def test_nuevo_cierre_cambia_el_etag(semana, cliente_http, cliente):
+    primera = cliente_http.get(semana)
+    etag = primera.headers['ETag']
+
+    _agregar_pedidos(cliente, 1)
+    cerrar_semana()
+
+    respuesta = cliente_http.get(semana, headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+    assert respuesta.get_data(as_text=True).count('Pan') == primera.get_data(as_text=True).count('Pan') + 1
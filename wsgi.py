@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+Punto de entrada WSGI para gunicorn (ver gunicorn.conf.py).
+Ejecutar con: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+from app import create_app
+
+app = create_app(os.getenv('FLASK_ENV', 'production'))